@@ -0,0 +1,298 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import create_map_data
+
+# optimizer_core is served to the browser from the frontend's public folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "eve-frontier-map", "public"))
+import optimizer_core  # noqa: E402
+
+DB_FILE = os.path.join("eve-frontier-map", "public", "map_data.db")
+RESULTS_FILE = "benchmark_results.json"
+RESULTS_VERSION = 1
+
+BUBBLE_SIZES = (50, 200, 1000, 5000)
+SEED = 1
+ITERATIVE_PASSES = 5
+TIME_PER_PASS = 0.5
+# Synthetic bubbles: one cluster per this many systems, spread over a cube this wide (ly)
+SYSTEMS_PER_CLUSTER = 50
+SYNTHETIC_EXTENT = 200.0
+CLUSTER_SPREAD = 6.0
+# A route is "within x%" once its distance is at most (1 + x / 100) times the best distance of the run
+QUALITY_LEVELS = (5, 1, 0.1)
+
+# Relative slowdowns (times) and lengthenings (distances) beyond which compare flags a regression.
+# Annealed distances depend on how many moves fit in the time budget, so they get more slack.
+TIME_THRESHOLD = 0.10
+DISTANCE_THRESHOLD = 0.01
+ANNEAL_DISTANCE_THRESHOLD = 0.05
+# Slowdowns smaller than this (seconds) are timer noise, whatever their relative size
+TIME_NOISE = 0.01
+# The baseline route is timed this many times (cold caches each time) and the fastest run kept
+BASELINE_REPEATS = 5
+
+# create_map_data functions timed as the stages of a database build
+PIPELINE_STAGES = (
+    'source_entries', 'compute_source_hashes', 'create_database_schema', 'insert_map_rows',
+    'create_indexes_v2', 'create_jump_neighbours', 'record_source_hashes',
+    'build_spatial_index', 'export_map_bundle', 'export_gate_hops', 'export_tiles',
+)
+
+
+def map_bubble(db_file, size, seed):
+    """
+    The `size` visible systems of map_data.db nearest to a seeded random system,
+    as ({system id: {'x', 'y', 'z'}}, start id). None if the map is smaller.
+    """
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, position_x, position_y, position_z FROM systems
+        WHERE hidden = 0 ORDER BY CAST(id AS INTEGER)
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    if len(rows) < size:
+        return None
+    origin = random.Random(seed).choice(rows)
+    rows.sort(key=lambda row: math.dist(row[1:], origin[1:]))
+    systems = {str(row[0]): {'x': row[1], 'y': row[2], 'z': row[3]} for row in rows[:size]}
+    return systems, str(origin[0])
+
+
+def synthetic_bubble(size, seed):
+    """
+    A clustered point set of `size` systems (Gaussian clusters inside a cube),
+    as ({name: {'x', 'y', 'z'}}, start name).
+    """
+    rng = random.Random(seed * 1_000_003 + size)
+    centres = [tuple(rng.uniform(0, SYNTHETIC_EXTENT) for _ in range(3))
+               for _ in range(max(1, size // SYSTEMS_PER_CLUSTER))]
+    systems = {}
+    for i in range(size):
+        centre = rng.choice(centres)
+        x, y, z = (rng.gauss(value, CLUSTER_SPREAD) for value in centre)
+        systems[f"S{i}"] = {'x': x, 'y': y, 'z': z}
+    return systems, "S0"
+
+
+def bubbles(sizes, seed, db_file=DB_FILE):
+    """Yields (name, systems, start) for every benchmark bubble: map bubbles when map_data.db exists, then synthetic ones."""
+    for size in sizes:
+        bubble = map_bubble(db_file, size, seed) if os.path.exists(db_file) else None
+        if bubble is not None:
+            yield (f"map-{size}",) + bubble
+        yield (f"clustered-{size}",) + synthetic_bubble(size, seed)
+
+
+def time_to_quality(curve, best):
+    """Seconds until the curve first came within each QUALITY_LEVELS percentage of `best`."""
+    reached = {}
+    for level in QUALITY_LEVELS:
+        target = best * (1 + level / 100)
+        reached[f"{level}%"] = next((elapsed for elapsed, distance in curve if distance <= target), None)
+    return reached
+
+
+def benchmark_optimizer(systems, start, passes=ITERATIVE_PASSES, time_per_pass=TIME_PER_PASS, seed=SEED):
+    """
+    Times calculate_baseline_route and `passes` calls of run_iterative_pass on
+    one bubble, from a cold coordinate store cache and a seeded random state.
+    The curve holds (elapsed seconds, best distance) after the baseline and after every pass.
+    """
+    names = list(systems)
+    baseline_time = math.inf
+    for _ in range(BASELINE_REPEATS):
+        optimizer_core._coord_store_cache.clear()
+        started = time.perf_counter()
+        result = optimizer_core.calculate_baseline_route(names, systems, start)
+        baseline_time = min(baseline_time, time.perf_counter() - started)
+        if 'error' in result:
+            raise RuntimeError(f"calculate_baseline_route failed: {result['error']}")
+    path, best = result['path'], result['distance']
+    random.seed(seed)
+    started = time.perf_counter() - baseline_time
+    baseline_distance = best
+    curve = [(baseline_time, best)]
+
+    pass_times = []
+    for _ in range(passes):
+        pass_started = time.perf_counter()
+        result = optimizer_core.run_iterative_pass(path, systems, time_per_pass)
+        pass_times.append(time.perf_counter() - pass_started)
+        if 'error' in result:
+            raise RuntimeError(f"run_iterative_pass failed: {result['error']}")
+        if result['distance'] < best:
+            path, best = result['path'], result['distance']
+        curve.append((time.perf_counter() - started, best))
+
+    return {
+        'systems': len(systems),
+        'baseline_time_s': baseline_time,
+        'baseline_distance': baseline_distance,
+        'pass_overhead_s': max(0.0, sum(pass_times) / len(pass_times) - time_per_pass) if pass_times else 0.0,
+        'final_distance': best,
+        'improvement': 1 - best / baseline_distance if baseline_distance else 0.0,
+        'time_to_quality_s': time_to_quality(curve, best),
+        'curve': [[round(elapsed, 4), distance] for elapsed, distance in curve],
+    }
+
+
+def benchmark_pipeline(jump_ranges=None, schema_version=create_map_data.SCHEMA_VERSION, with_tiles=True):
+    """
+    Times a full create_map_data build, stage by stage, in a scratch directory
+    linked to the source files of the current directory (map_data.db is not touched).
+    Each PIPELINE_STAGES function is wrapped with a timer for the duration of the build.
+    """
+    missing = [path for path in create_map_data.SOURCE_FILES if not os.path.exists(path)]
+    if missing:
+        print(f"Skipping pipeline benchmark, missing source file - {', '.join(missing)}")
+        return None
+
+    stages = dict.fromkeys(PIPELINE_STAGES, 0.0)
+    originals = {name: getattr(create_map_data, name) for name in PIPELINE_STAGES}
+
+    def timed(name, function):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stages[name] += time.perf_counter() - started
+        return wrapper
+
+    source_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        for path in create_map_data.SOURCE_FILES:
+            os.symlink(os.path.join(source_dir, path), os.path.join(scratch, path))
+        for name, function in originals.items():
+            setattr(create_map_data, name, timed(name, function))
+        os.chdir(scratch)
+        try:
+            started = time.perf_counter()
+            create_map_data.create_map_data(jump_ranges=jump_ranges, schema_version=schema_version,
+                                            with_tiles=with_tiles)
+            total = time.perf_counter() - started
+        finally:
+            os.chdir(source_dir)
+            for name, function in originals.items():
+                setattr(create_map_data, name, function)
+
+    stages = {name: seconds for name, seconds in stages.items() if seconds}
+    stages['other'] = max(0.0, total - sum(stages.values()))
+    return {'total_s': total, 'stages_s': stages}
+
+
+def metrics(results):
+    """Flattens results into {metric name: value} for compare; names end in _s (seconds) or distance."""
+    flat = {}
+    for bubble, run in results.get('optimizer', {}).items():
+        for key in ('baseline_time_s', 'pass_overhead_s', 'baseline_distance', 'final_distance'):
+            flat[f"optimizer/{bubble}/{key}"] = run[key]
+    pipeline = results.get('pipeline')
+    if pipeline:
+        flat['pipeline/total_s'] = pipeline['total_s']
+        for stage, seconds in pipeline['stages_s'].items():
+            flat[f"pipeline/{stage}_s"] = seconds
+    return flat
+
+
+def compare(results, baseline, time_threshold=TIME_THRESHOLD, distance_threshold=DISTANCE_THRESHOLD):
+    """
+    Prints every metric next to its baseline value and returns the regressions:
+    metrics more than the threshold above the baseline (all metrics are lower-is-better).
+    Timings must also be TIME_NOISE slower to count.
+    """
+    current, previous = metrics(results), metrics(baseline)
+    regressions = []
+    print(f"{'metric':56} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(current.keys() & previous.keys()):
+        old, new = previous[name], current[name]
+        if name.endswith('_s'):
+            threshold = time_threshold
+            significant = new - old > TIME_NOISE
+        else:
+            threshold = ANNEAL_DISTANCE_THRESHOLD if name.endswith('final_distance') else distance_threshold
+            significant = True
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > threshold and significant:
+            regressions.append((name, old, new, change))
+            flag = "  REGRESSION"
+        print(f"{name:56} {old:12.4f} {new:12.4f} {change:+7.1%}{flag}")
+    for name in sorted(previous.keys() - current.keys()):
+        print(f"{name:56} missing from this run")
+    return regressions
+
+
+def run_benchmarks(sizes=BUBBLE_SIZES, passes=ITERATIVE_PASSES, time_per_pass=TIME_PER_PASS, seed=SEED,
+                   with_optimizer=True, with_pipeline=True, jump_ranges=None, db_file=DB_FILE):
+    results = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'processor': platform.processor(), 'cpus': os.cpu_count(),
+                    'numpy': optimizer_core.np is not None},
+        'settings': {'sizes': list(sizes), 'passes': passes, 'time_per_pass': time_per_pass, 'seed': seed},
+    }
+    if with_optimizer:
+        results['optimizer'] = {}
+        for name, systems, start in bubbles(sizes, seed, db_file):
+            print(f"Optimizer: {name}...")
+            run = benchmark_optimizer(systems, start, passes, time_per_pass, seed)
+            results['optimizer'][name] = run
+            print(f"  baseline {run['baseline_distance']:.2f} ly in {run['baseline_time_s']:.3f}s, "
+                  f"after {passes} passes {run['final_distance']:.2f} ly ({run['improvement']:.1%} shorter)")
+    if with_pipeline:
+        print("Pipeline: full database build...")
+        results['pipeline'] = benchmark_pipeline(jump_ranges)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the route optimizer and the map data pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(BUBBLE_SIZES), help="Bubble sizes (systems)")
+    parser.add_argument("--passes", type=int, default=ITERATIVE_PASSES, help="run_iterative_pass calls per bubble")
+    parser.add_argument("--time-per-pass", type=float, default=TIME_PER_PASS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--no-optimizer", action="store_true", help="Skip the optimizer benchmarks")
+    parser.add_argument("--no-pipeline", action="store_true", help="Skip the database build benchmark")
+    parser.add_argument("--jump-ranges", type=float, nargs="*", default=None,
+                        help="Include the jump_neighbours stage with these ranges")
+    parser.add_argument("--db", default=DB_FILE, help="Database the map bubbles are drawn from")
+    parser.add_argument("--output", default=RESULTS_FILE, help="Write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a stored results file")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--distance-threshold", type=float, default=DISTANCE_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.jump_ranges == []:
+        args.jump_ranges = list(create_map_data.JUMP_RANGE_THRESHOLDS)
+    results = run_benchmarks(args.sizes, args.passes, args.time_per_pass, args.seed,
+                             not args.no_optimizer, not args.no_pipeline, args.jump_ranges, args.db)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.time_threshold, args.distance_threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.compare}")
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,24 @@
+import argparse
+import hashlib
 import json
 import os
 import sqlite3
 import sys
+from bisect import bisect_left
+from itertools import islice
+
+from gate_hops import export_gate_hops
+from json_stream import iter_json_object
+from map_bundle import export_map_bundle
+from map_tiles import export_tiles
+from spatial_index import SpatialIndex, build_spatial_index
+
+# Standard jump ranges (ly) that the optional jump_neighbours stage precomputes.
+JUMP_RANGE_THRESHOLDS = (20, 40, 60, 80, 100)
+
+# Schema written by default. Version 2 is the query-optimised layout of
+# create_database_schema_v2; the version is recorded in PRAGMA user_version.
+SCHEMA_VERSION = 1
 
 # Custom adapter for large integers
 def adapt_integer(i):
@@ -16,8 +33,11 @@ def rot_rx_minus_90(x, y, z):
     """Z-up -> Y-up: (x, y, z) -> (x, z, -y)"""
     return (x, z, -y)
 
-def create_database_schema(cursor):
+def create_database_schema(cursor, schema_version=SCHEMA_VERSION):
     """Creates the database schema."""
+    if schema_version == 2:
+        create_database_schema_v2(cursor)
+        return
     print("Creating database schema...")
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS regions (
@@ -73,6 +93,17 @@ def create_database_schema(cursor):
             FOREIGN KEY(destination_system_id) REFERENCES systems(id)
         )
     """)
+    # One row per directed gate. Databases written before this index existed may
+    # hold duplicates from reruns; keep the first copy of each.
+    cursor.execute("""
+        DELETE FROM stargates WHERE id NOT IN (
+            SELECT MIN(id) FROM stargates GROUP BY source_system_id, destination_system_id
+        )
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS stargates_by_link
+        ON stargates (source_system_id, destination_system_id)
+    """)
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS labels (
             id TEXT PRIMARY KEY,
@@ -83,7 +114,8 @@ def create_database_schema(cursor):
             position_y REAL,
             position_z REAL,
             font_size INTEGER,
-            show_on_zoom BOOLEAN
+            show_on_zoom BOOLEAN,
+            min_zoom REAL
         )
     """)
     cursor.execute("""
@@ -96,183 +128,770 @@ def create_database_schema(cursor):
             position_y REAL,
             position_z REAL,
             font_size INTEGER,
-            show_on_zoom BOOLEAN
+            show_on_zoom BOOLEAN,
+            min_zoom REAL
         )
     """)
+    add_label_min_zoom(cursor)
     print("Database schema created successfully.")
 
-def create_map_data():
+def add_label_min_zoom(cursor):
     """
-    Consolidate & transform JSON sources into a single SQLite database for the frontend.
-    Applies Rx(-90°) around X to convert Z-up -> Y-up.
+    Appends the min_zoom column (see process_labels) to label tables created
+    before it existed. NULL means the label has no declutter level.
     """
-    print("Starting map data creation process...")
+    for table_name in ('labels', 'region_labels'):
+        columns = [row[1] for row in cursor.execute(f"PRAGMA main.table_info({table_name})")]
+        if columns and 'min_zoom' not in columns:
+            cursor.execute(f"ALTER TABLE main.{table_name} ADD COLUMN min_zoom REAL")
 
-    # Define file paths
-    output_dir = "eve-frontier-map/public"
-    db_file = os.path.join(output_dir, "map_data.db")
+def create_database_schema_v2(cursor):
+    """
+    Creates the query-optimised (version 2) schema.
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    - Integer primary keys for regions, constellations and systems. Column order
+      is unchanged, so positional `SELECT *` readers keep working.
+    - Stargates are stored as integer pairs. stargate_links holds the directed
+      gates, deduplicated. gate_edges holds each undirected link once, with
+      system_a < system_b. Both are WITHOUT ROWID tables keyed by the pair.
+    - A `stargates` view rebuilds the old (id, name, source, destination) rows
+      for existing readers.
+    - Label tables keep their TEXT ids but drop the separate rowid b-tree.
 
-    # Connect to SQLite database (or create it)
-    conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
+    Secondary indexes are created after the load by create_indexes_v2.
+    """
+    print("Creating database schema (version 2)...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS regions (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            center_x REAL,
+            center_y REAL,
+            center_z REAL,
+            hidden BOOLEAN,
+            nebulas TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS constellations (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            region_id INTEGER,
+            center_x REAL,
+            center_y REAL,
+            center_z REAL,
+            lines TEXT,
+            hidden BOOLEAN,
+            FOREIGN KEY(region_id) REFERENCES regions(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS systems (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            constellation_id INTEGER,
+            region_id INTEGER,
+            center_x REAL,
+            center_y REAL,
+            center_z REAL,
+            position_x REAL,
+            position_y REAL,
+            position_z REAL,
+            security_class TEXT,
+            security_status REAL,
+            star_class TEXT,
+            hidden BOOLEAN,
+            FOREIGN KEY(constellation_id) REFERENCES constellations(id),
+            FOREIGN KEY(region_id) REFERENCES regions(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stargate_links (
+            source_system_id INTEGER NOT NULL,
+            destination_system_id INTEGER NOT NULL,
+            PRIMARY KEY (source_system_id, destination_system_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS gate_edges (
+            system_a INTEGER NOT NULL,
+            system_b INTEGER NOT NULL,
+            PRIMARY KEY (system_a, system_b)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS stargates AS
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY source_system_id, destination_system_id) AS id,
+            'Stargate ' || source_system_id || ' -> ' || destination_system_id AS name,
+            source_system_id,
+            destination_system_id
+        FROM stargate_links
+    """)
+    for table_name in ('labels', 'region_labels'):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id TEXT PRIMARY KEY,
+                text TEXT,
+                type TEXT,
+                parent_id TEXT,
+                position_x REAL,
+                position_y REAL,
+                position_z REAL,
+                font_size INTEGER,
+                show_on_zoom BOOLEAN,
+                min_zoom REAL
+            ) WITHOUT ROWID
+        """)
+    add_label_min_zoom(cursor)
+    cursor.execute("PRAGMA user_version = 2")
+    print("Database schema created successfully.")
 
-    # Create database schema
-    create_database_schema(cursor)
+def create_indexes_v2(cursor):
+    """
+    Secondary indexes for the version 2 schema, built once the tables are loaded.
+    systems_by_region is covering for "systems in region / constellation" (the
+    rowid id rides along in every index entry).
+    """
+    print("Creating indexes...")
+    cursor.execute("CREATE INDEX IF NOT EXISTS systems_by_region ON systems (region_id, constellation_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS systems_by_constellation ON systems (constellation_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS constellations_by_region ON constellations (region_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS stargate_links_by_destination ON stargate_links (destination_system_id, source_system_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS gate_edges_by_b ON gate_edges (system_b, system_a)")
+    cursor.execute("ANALYZE")
 
-    # --- 1. Load JSON files ---
-    print("Loading source JSON files...")
-    try:
-        with open('stellar_systems.json', 'r') as f:
-            stellar_systems = json.load(f)
-        with open('stellar_regions.json', 'r') as f:
-            stellar_regions = json.load(f)
-        with open('stellar_constellations.json', 'r') as f:
-            stellar_constellations = json.load(f)
-        with open('labels.json', 'r') as f:
-            labels = json.load(f)
-    except FileNotFoundError as e:
-        print(f"Error: Missing source file - {e}. Please ensure all required JSON files are present.")
-        return
+def create_jump_neighbours(cursor, thresholds=JUMP_RANGE_THRESHOLDS):
+    """
+    Precomputes every pair of visible systems within the largest jump range threshold.
 
-    # --- 2. Process and insert data into tables ---
-    print("Processing and inserting data into the database...")
+    Each directed pair is stored once with its distance and `range_class`, the
+    index of the smallest threshold that covers it, rather than once per
+    threshold. The table is clustered on (source_id, distance), so "all systems
+    within R ly of S" is a single range scan:
+        SELECT target_id, distance FROM jump_neighbours WHERE source_id = ? AND distance <= ?
+    Pairs are found through a spatial grid with cells as wide as the largest
+    threshold, so the build grows with the number of pairs, not systems squared.
+    """
+    thresholds = sorted(thresholds)
+    max_range = thresholds[-1]
+    print(f"Precomputing jump neighbours up to {max_range} ly...")
+
+    cursor.execute("DROP TABLE IF EXISTS jump_neighbours")
+    cursor.execute("DROP TABLE IF EXISTS jump_range_thresholds")
+    cursor.execute("""
+        CREATE TABLE jump_range_thresholds (
+            range_class INTEGER PRIMARY KEY,
+            max_distance REAL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE jump_neighbours (
+            source_id INTEGER NOT NULL,
+            distance REAL NOT NULL,
+            target_id INTEGER NOT NULL,
+            range_class INTEGER NOT NULL,
+            PRIMARY KEY (source_id, distance, target_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.executemany("INSERT INTO jump_range_thresholds (range_class, max_distance) VALUES (?, ?)",
+                       enumerate(thresholds))
+
+    cursor.execute("SELECT id, position_x, position_y, position_z FROM systems WHERE hidden = 0")
+    rows = [(int(system_id), x, y, z) for system_id, x, y, z in cursor.fetchall()]
+    index = SpatialIndex([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows],
+                         [row[3] for row in rows], cell_size=max_range)
 
-    # Regions
-    for region_id, region_data in stellar_regions.items():
+    def pair_rows():
+        for system_id, x, y, z in sorted(rows):
+            for distance, other_id in index.query_radius((x, y, z), max_range):
+                if other_id != system_id:
+                    yield system_id, distance, other_id, bisect_left(thresholds, distance)
+
+    cursor.executemany("""
+        INSERT INTO jump_neighbours (source_id, distance, target_id, range_class)
+        VALUES (?, ?, ?, ?)
+    """, pair_rows())
+    cursor.execute("SELECT COUNT(*) FROM jump_neighbours")
+    print(f"Stored {cursor.fetchone()[0]} jump neighbour pairs.")
+
+# Regions (and their constellations and systems) flagged hidden: not visible in-game.
+HIDDEN_REGIONS = {
+    '14000001', '14000002', '14000003', '14000004', '14000005',
+    '12000001', '12000002', '12000003', '12000004', '12000005',
+    '10000004'
+}
+
+# 1 ly in meters
+SCALE_FACTOR = 9_460_730_472_580_800
+
+# Loader-friendly settings for a full rebuild into a fresh file: no rollback
+# journal, no fsyncs and a large page cache. Only safe because a failed build
+# is simply thrown away.
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -262144",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA locking_mode = EXCLUSIVE",
+)
+
+# JSON sources, in the order create_map_data reads them.
+SOURCE_FILES = ('stellar_systems.json', 'stellar_regions.json', 'stellar_constellations.json', 'labels.json')
+
+# Tables generated from each JSON source (those missing from the schema in use are skipped).
+SOURCE_TABLES = {
+    'stellar_regions.json': ('regions',),
+    'stellar_constellations.json': ('constellations',),
+    'stellar_systems.json': ('systems', 'stargates', 'stargate_links', 'gate_edges'),
+    'labels.json': ('region_labels', 'labels'),
+}
+
+# Row identity used when diffing a table in an incremental build (default: id).
+TABLE_KEYS = {
+    'stargates': ('source_system_id', 'destination_system_id'),
+    'stargate_links': ('source_system_id', 'destination_system_id'),
+    'gate_edges': ('system_a', 'system_b'),
+}
+
+# Source entries per executemany batch when one source feeds several tables.
+INSERT_BATCH_SIZE = 2000
+
+def load_system_name_overrides(cursor):
+    """Returns the system_names overrides as an {id: name} dict (empty if the table does not exist)."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'system_names'")
+    if cursor.fetchone() is None:
+        return {}
+    cursor.execute("SELECT id, name FROM system_names")
+    return {str(system_id): name for system_id, name in cursor.fetchall()}
+
+def region_rows(region_entries):
+    for region_id, region_data in region_entries:
         if not isinstance(region_data, dict):
             continue
-        cursor.execute("""
-            INSERT OR REPLACE INTO regions (id, name, center_x, center_y, center_z, hidden, nebulas)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
+        center = region_data.get('center', [None, None, None])
+        yield (
             region_id,
             region_data.get('name'),
-            region_data.get('center', [None, None, None])[0],
-            region_data.get('center', [None, None, None])[1],
-            region_data.get('center', [None, None, None])[2],
-            False,
+            center[0], center[1], center[2],
+            region_id in HIDDEN_REGIONS,
             json.dumps(region_data.get('nebulas'))
-        ))
+        )
 
-    # Constellations
-    for const_id, const_data in stellar_constellations.items():
+def constellation_rows(constellation_entries):
+    for const_id, const_data in constellation_entries:
         if not isinstance(const_data, dict):
             continue
-        cursor.execute("""
-            INSERT OR REPLACE INTO constellations (id, name, region_id, center_x, center_y, center_z, lines, hidden)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        center = const_data.get('center', [None, None, None])
+        region_id = str(const_data.get('regionId'))
+        yield (
             const_id,
             const_data.get('name'),
-            str(const_data.get('regionId')),
-            const_data.get('center', [None, None, None])[0],
-            const_data.get('center', [None, None, None])[1],
-            const_data.get('center', [None, None, None])[2],
+            region_id,
+            center[0], center[1], center[2],
             json.dumps(const_data.get('lines')),
-            False
-        ))
+            region_id in HIDDEN_REGIONS
+        )
 
-    # Systems and Stargates
-    scale_factor = 9_460_730_472_580_800  # 1 ly in meters
-    for system_id, system_data in stellar_systems.items():
+def system_rows(system_entries, system_names):
+    for system_id, system_data in system_entries:
         if not isinstance(system_data, dict):
             continue
         cx, cy, cz = system_data.get('center', [0, 0, 0])
-        sx, sy, sz = cx / scale_factor, cy / scale_factor, cz / scale_factor
+        sx, sy, sz = cx / SCALE_FACTOR, cy / SCALE_FACTOR, cz / SCALE_FACTOR
         X, Y, Z = rot_rx_minus_90(sx, sy, sz)
-
-        # Get system name from system_names table
-        cursor.execute("SELECT name FROM system_names WHERE id = ?", (system_id,))
-        result = cursor.fetchone()
-        system_name = result[0] if result else system_data.get('name')
-
-        cursor.execute("""
-            INSERT OR REPLACE INTO systems (id, name, constellation_id, region_id, center_x, center_y, center_z, position_x, position_y, position_z, security_class, security_status, star_class, hidden)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        region_id = str(system_data.get('regionId'))
+        yield (
             system_id,
-            system_name,
+            system_names.get(system_id, system_data.get('name')),
             str(system_data.get('constellationId')),
-            str(system_data.get('regionId')),
+            region_id,
             cx, cy, cz,
             X, Y, Z,
             system_data.get('securityClass'),
             system_data.get('securityStatus'),
             system_data.get('starClass'),
-            False
-        ))
-
-        if 'navigation' in system_data and 'neighbours' in system_data['navigation'] and system_data['navigation']['neighbours']:
-            for destination_id in system_data['navigation']['neighbours']:
-                cursor.execute("""
-                    INSERT INTO stargates (name, source_system_id, destination_system_id)
-                    VALUES (?, ?, ?)
-                """, (
-                    f"Stargate {system_id} -> {destination_id}",
-                    system_id,
-                    destination_id
-                ))
-
-    # Labels
-    for label_id, label_data in labels.items():
+            region_id in HIDDEN_REGIONS
+        )
+
+def stargate_rows(system_entries):
+    for system_id, system_data in system_entries:
+        if not isinstance(system_data, dict):
+            continue
+        for destination_id in (system_data.get('navigation') or {}).get('neighbours') or ():
+            yield (
+                f"Stargate {system_id} -> {destination_id}",
+                system_id,
+                destination_id
+            )
+
+def label_rows(label_entries, label_types):
+    for label_id, label_data in label_entries:
         if not isinstance(label_data, dict):
             continue
-        
         label_type = label_data.get('type')
-        table_name = ''
-        if label_type == 'region':
-            table_name = 'region_labels'
-        elif label_type == 'constellation' or label_type == 'system':
-            table_name = 'labels'
-        else:
+        if label_type not in label_types:
             continue
 
         pos = label_data.get('position', [None, None, None])
         font_size = label_data.get('font_size')
         show_on_zoom = label_data.get('showOnZoom')
-        
+        min_zoom = label_data.get('min_zoom')
+
         # Rotate labels to match the new coordinate system
         if pos and len(pos) == 3 and all(p is not None for p in pos):
             rotated_pos = rot_rx_minus_90(pos[0], pos[1], pos[2])
         else:
             rotated_pos = (None, None, None)
 
-        cursor.execute(f"""
-            INSERT OR REPLACE INTO {table_name} (id, text, type, parent_id, position_x, position_y, position_z, font_size, show_on_zoom)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        yield (
             label_id,
             label_data.get('text'),
             label_type,
             str(label_data.get('parent_id')),
             rotated_pos[0], rotated_pos[1], rotated_pos[2],
             int(font_size) if font_size is not None else None,
-            bool(show_on_zoom) if show_on_zoom is not None else None
-        ))
+            bool(show_on_zoom) if show_on_zoom is not None else None,
+            min_zoom
+        )
+
+def batched(entries, size=INSERT_BATCH_SIZE):
+    """Yields lists of up to `size` consecutive entries."""
+    iterator = iter(entries)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def insert_map_rows(cursor, region_entries, constellation_entries, system_entries, label_entries, system_names,
+                    schema_version=SCHEMA_VERSION, prefix=""):
+    """
+    Inserts every table's rows from (id, data) entry iterables.
+
+    Each source is consumed exactly once: systems feed both the systems and the
+    stargate tables, and labels feed both label tables, one batch of entries at
+    a time. The entries may therefore come straight from a streaming parser.
+    `prefix` is prepended to every table name (used to fill staging tables).
+    """
+    cursor.executemany(f"""
+        INSERT OR REPLACE INTO {prefix}regions (id, name, center_x, center_y, center_z, hidden, nebulas)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, region_rows(region_entries))
+
+    cursor.executemany(f"""
+        INSERT OR REPLACE INTO {prefix}constellations (id, name, region_id, center_x, center_y, center_z, lines, hidden)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, constellation_rows(constellation_entries))
+
+    for batch in batched(system_entries):
+        cursor.executemany(f"""
+            INSERT OR REPLACE INTO {prefix}systems (id, name, constellation_id, region_id, center_x, center_y, center_z, position_x, position_y, position_z, security_class, security_status, star_class, hidden)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, system_rows(batch, system_names))
+        if schema_version == 2:
+            cursor.executemany(f"""
+                INSERT OR IGNORE INTO {prefix}stargate_links (source_system_id, destination_system_id)
+                VALUES (?, ?)
+            """, (row[1:] for row in stargate_rows(batch)))
+        else:
+            cursor.executemany(f"""
+                INSERT OR IGNORE INTO {prefix}stargates (name, source_system_id, destination_system_id)
+                VALUES (?, ?, ?)
+            """, stargate_rows(batch))
+
+    if schema_version == 2:
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO {prefix}gate_edges (system_a, system_b)
+            SELECT MIN(source_system_id, destination_system_id), MAX(source_system_id, destination_system_id)
+            FROM {prefix}stargate_links
+            WHERE source_system_id != destination_system_id
+        """)
+
+    for batch in batched(label_entries):
+        for table_name, label_types in (('region_labels', ('region',)), ('labels', ('constellation', 'system'))):
+            cursor.executemany(f"""
+                INSERT OR REPLACE INTO {prefix}{table_name} (id, text, type, parent_id, position_x, position_y, position_z, font_size, show_on_zoom, min_zoom)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, label_rows(batch, label_types))
+
+def source_entries(path, streaming=False):
+    """Returns the (id, data) entries of a JSON source, parsed incrementally or loaded whole."""
+    if streaming:
+        return iter_json_object(path)
+    with open(path, 'r') as f:
+        return json.load(f).items()
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def compute_source_hashes(system_names):
+    """Content hashes of every input: the JSON sources plus the system_names overrides."""
+    hashes = {path: file_sha256(path) for path in SOURCE_FILES}
+    hashes['system_names'] = hashlib.sha256(json.dumps(sorted(system_names.items())).encode()).hexdigest()
+    return hashes
+
+def load_source_hashes(cursor):
+    """Returns the {source: sha256} recorded by the last build (empty if there is none)."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'source_hashes'")
+    if cursor.fetchone() is None:
+        return {}
+    cursor.execute("SELECT source, sha256 FROM source_hashes")
+    return dict(cursor.fetchall())
+
+def record_source_hashes(cursor, hashes):
+    cursor.execute("CREATE TABLE IF NOT EXISTS source_hashes (source TEXT PRIMARY KEY, sha256 TEXT)")
+    cursor.executemany("INSERT OR REPLACE INTO source_hashes (source, sha256) VALUES (?, ?)", hashes.items())
+
+def sync_table(cursor, table_name):
+    """
+    Brings `table_name` in line with temp.staging_<table_name> through a row-level diff:
+    deletes rows whose key is gone, and upserts rows that are new or differ.
+    Returns (inserted, updated, deleted).
+    """
+    staging = f"temp.staging_{table_name}"
+    columns = [row[1] for row in cursor.execute(f"PRAGMA main.table_info({table_name})")
+               if not (table_name == 'stargates' and row[1] == 'id')]
+    column_list = ", ".join(columns)
+    keys = ", ".join(TABLE_KEYS.get(table_name, ('id',)))
+
+    cursor.execute(f"DELETE FROM main.{table_name} WHERE ({keys}) NOT IN (SELECT {keys} FROM {staging})")
+    deleted = cursor.rowcount
+    cursor.execute(f"SELECT COUNT(*) FROM {staging} WHERE ({keys}) NOT IN (SELECT {keys} FROM main.{table_name})")
+    inserted = cursor.fetchone()[0]
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO main.{table_name} ({column_list})
+        SELECT {column_list} FROM {staging}
+        EXCEPT
+        SELECT {column_list} FROM main.{table_name}
+    """)
+    return inserted, cursor.rowcount - inserted, deleted
+
+def update_map_data(cursor, changed_sources, system_names, schema_version=SCHEMA_VERSION, streaming=False):
+    """
+    Incremental rebuild: regenerates only the tables fed by `changed_sources`
+    and applies them as row-level diffs, leaving every other table untouched.
+
+    The regenerated rows go through insert_map_rows into empty temp staging
+    copies of the tables (unchanged sources contribute no entries), and each
+    affected table is then synced against its staging copy.
+    """
+    add_label_min_zoom(cursor)
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {name for (name,) in cursor.fetchall()}
+    tables = [table for tables in SOURCE_TABLES.values() for table in tables if table in existing]
+    for table_name in tables:
+        cursor.execute(f"DROP TABLE IF EXISTS temp.staging_{table_name}")
+        cursor.execute(f"CREATE TEMP TABLE staging_{table_name} AS SELECT * FROM main.{table_name} WHERE 0")
+
+    entries = {path: source_entries(path, streaming) if path in changed_sources else () for path in SOURCE_FILES}
+    insert_map_rows(cursor, entries['stellar_regions.json'], entries['stellar_constellations.json'],
+                    entries['stellar_systems.json'], entries['labels.json'], system_names,
+                    schema_version, prefix="temp.staging_")
+
+    for path in changed_sources:
+        for table_name in SOURCE_TABLES[path]:
+            if table_name in existing:
+                inserted, updated, deleted = sync_table(cursor, table_name)
+                print(f"  {table_name}: {inserted} inserted, {updated} updated, {deleted} deleted")
+    for table_name in tables:
+        cursor.execute(f"DROP TABLE temp.staging_{table_name}")
+
+def stored_jump_ranges(cursor):
+    """Returns the thresholds of an existing jump_neighbours table, or None if there is none."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'jump_range_thresholds'")
+    if cursor.fetchone() is None:
+        return None
+    cursor.execute("SELECT max_distance FROM jump_range_thresholds ORDER BY range_class")
+    return [row[0] for row in cursor.fetchall()]
+
+def api_location_columns(location):
+    """center_* and position_* values for a world API location (meters, Z-up)."""
+    location = location or {}
+    cx, cy, cz = location.get('x', 0), location.get('y', 0), location.get('z', 0)
+    return (cx, cy, cz) + rot_rx_minus_90(cx / SCALE_FACTOR, cy / SCALE_FACTOR, cz / SCALE_FACTOR)
+
+def apply_system_delta(cursor, delta, system_names):
+    """
+    Applies a solar system delta from get_systems --sync to the systems table.
 
-    # --- 3. Filtering logic ---
-    print("Applying filtering logic...")
-    ignored_regions = [
-        '14000001', '14000002', '14000003', '14000004', '14000005',
-        '12000001', '12000002', '12000003', '12000004', '12000005',
-        '10000004'
-    ]
+    Added systems are inserted, removed ones are deleted together with their
+    stargates, and changed ones get only the columns behind their changed
+    fields updated (name, constellationId, regionId, location); other API fields
+    have no column and are ignored. Returns True if any system position changed.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tables = {name for (name,) in cursor.fetchall()}
+
+    added = []
+    for system in delta['added']:
+        location = system.get('location') or {}
+        added.append((str(system['id']), {
+            'name': system.get('name'),
+            'constellationId': system.get('constellationId'),
+            'regionId': system.get('regionId'),
+            'center': [location.get('x', 0), location.get('y', 0), location.get('z', 0)],
+        }))
+    cursor.executemany("""
+        INSERT OR REPLACE INTO systems (id, name, constellation_id, region_id, center_x, center_y, center_z, position_x, position_y, position_z, security_class, security_status, star_class, hidden)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, system_rows(added, system_names))
+
+    removed = [(str(system_id),) for system_id in delta['removed']]
+    cursor.executemany("DELETE FROM systems WHERE id = ?", removed)
+    for table_name, columns in (('stargates', ('source_system_id', 'destination_system_id')),
+                                ('stargate_links', ('source_system_id', 'destination_system_id')),
+                                ('gate_edges', ('system_a', 'system_b'))):
+        if table_name in tables:
+            cursor.executemany(f"DELETE FROM {table_name} WHERE {columns[0]} = ?1 OR {columns[1]} = ?1", removed)
+
+    moved = bool(added or removed)
+    for change in delta['changed']:
+        system_id = str(change['id'])
+        fields = change['fields']
+        if 'name' in fields and system_id not in system_names:
+            cursor.execute("UPDATE systems SET name = ? WHERE id = ?", (fields['name']['new'], system_id))
+        if 'constellationId' in fields:
+            cursor.execute("UPDATE systems SET constellation_id = ? WHERE id = ?",
+                           (str(fields['constellationId']['new']), system_id))
+        if 'regionId' in fields:
+            region_id = str(fields['regionId']['new'])
+            cursor.execute("UPDATE systems SET region_id = ?, hidden = ? WHERE id = ?",
+                           (region_id, region_id in HIDDEN_REGIONS, system_id))
+        if 'location' in fields:
+            cursor.execute("""
+                UPDATE systems SET center_x = ?, center_y = ?, center_z = ?, position_x = ?, position_y = ?, position_z = ?
+                WHERE id = ?
+            """, api_location_columns(fields['location']['new']) + (system_id,))
+            moved = True
+    return moved
+
+def apply_map_delta(delta_file, with_spatial_index=True, with_bundle=True, with_tiles=False, with_gate_hops=True):
+    """Applies a get_systems --sync delta file to the existing map_data.db in place."""
+    output_dir = "eve-frontier-map/public"
+    db_file = os.path.join(output_dir, "map_data.db")
+    with open(delta_file, 'r', encoding='utf-8') as f:
+        delta = json.load(f)
+    print(f"Applying {len(delta['added'])} added, {len(delta['removed'])} removed and "
+          f"{len(delta['changed'])} changed systems to {db_file}...")
+
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    moved = apply_system_delta(cursor, delta, load_system_name_overrides(cursor))
+    jump_ranges = stored_jump_ranges(cursor) if moved else None
+    if jump_ranges:
+        create_jump_neighbours(cursor, jump_ranges)
+    conn.commit()
+    conn.close()
 
-    for region_id in ignored_regions:
-        cursor.execute("UPDATE regions SET hidden = ? WHERE id = ?", (True, region_id))
-        cursor.execute("UPDATE systems SET hidden = ? WHERE region_id = ?", (True, region_id))
-        cursor.execute("UPDATE constellations SET hidden = ? WHERE region_id = ?", (True, region_id))
+    if with_spatial_index and moved:
+        build_spatial_index(db_file, os.path.join(output_dir, "system_index.bin"))
+    if with_bundle:
+        export_map_bundle(db_file, os.path.join(output_dir, "map_bundle.bin"))
+    if with_gate_hops:
+        export_gate_hops(db_file, os.path.join(output_dir, "gate_hops.bin"))
+    if with_tiles:
+        export_tiles(db_file, os.path.join(output_dir, "tiles"))
+    print("Delta applied successfully!")
 
+def create_map_data(with_spatial_index=True, jump_ranges=None, bulk_load=True, schema_version=SCHEMA_VERSION,
+                    streaming=False, incremental=False, with_bundle=True, with_tiles=False, with_gate_hops=True):
+    """
+    Consolidate & transform JSON sources into a single SQLite database for the frontend.
+    Applies Rx(-90°) around X to convert Z-up -> Y-up.
+    With `with_spatial_index`, also writes the system spatial index sidecar file.
+    With `with_bundle`, also exports the binary map bundle (see map_bundle).
+    With `with_gate_hops`, also writes the gate hop distance tables (see gate_hops).
+    With `with_tiles`, also exports the octree level-of-detail tiles (see map_tiles).
+    With `jump_ranges` (ly thresholds), also precomputes the jump_neighbours table.
+
+    With `bulk_load` (the default) the database is regenerated from scratch into
+    a temporary file, in one transaction under BULK_LOAD_PRAGMAS, and then
+    swapped in. Otherwise rows are upserted into the existing database.
+    `schema_version` selects the table layout (see create_database_schema_v2).
+    With `streaming`, the sources are parsed entry by entry (json_stream) and
+    fed straight into the inserts instead of being loaded whole with json.load.
+
+    Every build records a sha256 per input in the source_hashes table. With
+    `incremental`, only the tables whose inputs changed since then are rebuilt,
+    as row-level diffs (see update_map_data); if nothing changed the database
+    file is not written at all. Without recorded hashes it falls back to a full build.
+    """
+    print("Starting map data creation process...")
+
+    # Define file paths
+    output_dir = "eve-frontier-map/public"
+    db_file = os.path.join(output_dir, "map_data.db")
+    index_file = os.path.join(output_dir, "system_index.bin")
+    bundle_file = os.path.join(output_dir, "map_bundle.bin")
+    hops_file = os.path.join(output_dir, "gate_hops.bin")
+    tiles_dir = os.path.join(output_dir, "tiles")
 
-    # --- 4. Save final file ---
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    missing = [path for path in SOURCE_FILES if not os.path.exists(path)]
+    if missing:
+        print(f"Error: Missing source file - {', '.join(missing)}. Please ensure all required JSON files are present.")
+        return
+
+    # System name overrides live in the existing database; read them once up front
+    system_names = {}
+    stored_hashes = {}
+    existing_version = None
+    if os.path.exists(db_file):
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+        system_names = load_system_name_overrides(cursor)
+        stored_hashes = load_source_hashes(cursor)
+        cursor.execute("PRAGMA user_version")
+        existing_version = cursor.fetchone()[0] or 1
+        conn.close()
+        if not bulk_load and not incremental and existing_version != schema_version:
+            print(f"Error: map_data.db uses schema version {existing_version}; "
+                  f"a full rebuild is needed to write version {schema_version}.")
+            return
+
+    hashes = compute_source_hashes(system_names)
+    if incremental and stored_hashes and existing_version == schema_version:
+        changed_sources = [path for path in SOURCE_FILES if stored_hashes.get(path) != hashes[path]]
+        if stored_hashes.get('system_names') != hashes['system_names'] and 'stellar_systems.json' not in changed_sources:
+            changed_sources.append('stellar_systems.json')
+        print(f"Changed sources: {', '.join(changed_sources) or 'none'}")
+        if not changed_sources and not jump_ranges:
+            print("map_data.db is up to date.")
+            if with_spatial_index and not os.path.exists(index_file):
+                build_spatial_index(db_file, index_file)
+            if with_bundle and not os.path.exists(bundle_file):
+                export_map_bundle(db_file, bundle_file)
+            if with_gate_hops and not os.path.exists(hops_file):
+                export_gate_hops(db_file, hops_file)
+            if with_tiles and not os.path.exists(tiles_dir):
+                export_tiles(db_file, tiles_dir)
+            return
+
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+        update_map_data(cursor, changed_sources, system_names, schema_version, streaming)
+        # Jump neighbours follow system positions: refresh them with the stored thresholds
+        if not jump_ranges and 'stellar_systems.json' in changed_sources:
+            jump_ranges = stored_jump_ranges(cursor)
+        if jump_ranges:
+            create_jump_neighbours(cursor, jump_ranges)
+        record_source_hashes(cursor, {source: sha for source, sha in hashes.items()
+                                      if stored_hashes.get(source) != sha})
+        print(f"Saving the updated map_data.db to {db_file}")
+        conn.commit()
+        conn.close()
+
+        if with_spatial_index and ('stellar_systems.json' in changed_sources or not os.path.exists(index_file)):
+            build_spatial_index(db_file, index_file)
+        # The bundle holds everything but the labels
+        if with_bundle and (set(changed_sources) - {'labels.json'} or not os.path.exists(bundle_file)):
+            export_map_bundle(db_file, bundle_file)
+        if with_gate_hops and ('stellar_systems.json' in changed_sources or not os.path.exists(hops_file)):
+            export_gate_hops(db_file, hops_file)
+        if with_tiles:
+            export_tiles(db_file, tiles_dir)
+        print("Map data update completed successfully!")
+        return
+    if incremental:
+        print("No matching recorded build; running a full build.")
+        bulk_load = True
+
+    build_file = db_file + ".tmp" if bulk_load else db_file
+
+    # --- 1. Load JSON files ---
+    if streaming:
+        # Entries are parsed one at a time while they are inserted in step 2
+        print("Streaming source JSON files...")
+    else:
+        print("Loading source JSON files...")
+    system_entries, region_entries, constellation_entries, label_entries = (
+        source_entries(path, streaming) for path in SOURCE_FILES)
+
+    # Connect to SQLite database (or create it)
+    if bulk_load and os.path.exists(build_file):
+        os.remove(build_file)
+    conn = sqlite3.connect(build_file)
+    cursor = conn.cursor()
+    if bulk_load:
+        for pragma in BULK_LOAD_PRAGMAS:
+            cursor.execute(pragma)
+
+    # Create database schema
+    create_database_schema(cursor, schema_version)
+    if bulk_load and system_names:
+        cursor.execute("CREATE TABLE system_names (id TEXT PRIMARY KEY, name TEXT)")
+        cursor.executemany("INSERT INTO system_names (id, name) VALUES (?, ?)", system_names.items())
+
+    # --- 2. Process and insert data into tables ---
+    # Hidden flags for HIDDEN_REGIONS are set as the rows are generated
+    print("Processing and inserting data into the database...")
+    insert_map_rows(cursor, region_entries, constellation_entries, system_entries, label_entries, system_names,
+                    schema_version)
+    if schema_version == 2:
+        create_indexes_v2(cursor)
+
+    if jump_ranges:
+        create_jump_neighbours(cursor, jump_ranges)
+    record_source_hashes(cursor, hashes)
+
+    # --- 3. Save final file ---
     print(f"Saving the final map_data.db to {db_file}")
     conn.commit()
+    # Close the cursor first: a connection with live statements outlives close()
+    # and would keep holding the bulk load's exclusive lock
+    cursor.close()
     conn.close()
+    if bulk_load:
+        os.replace(build_file, db_file)
+
+    if with_spatial_index:
+        build_spatial_index(db_file, index_file)
+    if with_bundle:
+        export_map_bundle(db_file, bundle_file)
+    if with_gate_hops:
+        export_gate_hops(db_file, hops_file)
+    if with_tiles:
+        export_tiles(db_file, tiles_dir)
 
     print("Map data creation process completed successfully!")
 
 if __name__ == "__main__":
-    create_map_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build map_data.db from the stellar JSON sources.")
+    parser.add_argument("--no-spatial-index", action="store_true", help="Skip writing system_index.bin")
+    parser.add_argument("--no-bundle", action="store_true", help="Skip writing map_bundle.bin")
+    parser.add_argument("--no-gate-hops", action="store_true", help="Skip writing gate_hops.bin")
+    parser.add_argument("--tiles", action="store_true", help="Also export octree level-of-detail tiles")
+    parser.add_argument("--schema-version", type=int, choices=(1, 2), default=SCHEMA_VERSION,
+                        help="Table layout to write (2 = integer keys, indexes, deduplicated gates)")
+    parser.add_argument("--no-bulk-load", action="store_true",
+                        help="Upsert into the existing database instead of regenerating it")
+    parser.add_argument("--jump-ranges", type=float, nargs="*", default=None,
+                        help=f"Precompute jump neighbours for these ranges in ly "
+                             f"(no values: {', '.join(map(str, JUMP_RANGE_THRESHOLDS))})")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Parse the JSON sources incrementally instead of loading them whole")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only rebuild the tables whose source files changed since the last build")
+    parser.add_argument("--apply-delta", metavar="DELTA_FILE",
+                        help="Apply a get_systems --sync delta to the existing database instead of building")
+    args = parser.parse_args()
+
+    jump_ranges = args.jump_ranges
+    if jump_ranges is not None and not jump_ranges:
+        jump_ranges = JUMP_RANGE_THRESHOLDS
+    if args.apply_delta:
+        apply_map_delta(args.apply_delta, with_spatial_index=not args.no_spatial_index,
+                        with_bundle=not args.no_bundle, with_tiles=args.tiles,
+                        with_gate_hops=not args.no_gate_hops)
+    else:
+        create_map_data(with_spatial_index=not args.no_spatial_index, jump_ranges=jump_ranges,
+                        bulk_load=not args.no_bulk_load, schema_version=args.schema_version,
+                        streaming=args.streaming, incremental=args.incremental, with_bundle=not args.no_bundle,
+                        with_tiles=args.tiles, with_gate_hops=not args.no_gate_hops)
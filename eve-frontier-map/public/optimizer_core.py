@@ -1,6 +1,50 @@
 import math
 import random
 import time
+from array import array
+from collections import OrderedDict, deque
+
+try:
+    import numpy as np
+except ImportError:  # Pyodide only ships numpy when it is explicitly loaded
+    np = None
+
+# Number of annealing proposals evaluated between clock checks.
+ANNEAL_BATCH_SIZE = 256
+
+# Bubbles up to this many systems get a precomputed pairwise distance matrix.
+DISTANCE_MATRIX_MAX_SYSTEMS = 1500
+
+# Number of coordinate stores kept for reuse by later passes over the same bubble.
+COORD_STORE_CACHE_SIZE = 4
+
+# Candidate neighbours per system considered by the 2-opt and Or-opt sweeps.
+NEIGHBOUR_LIST_SIZE = 8
+
+# Longest run of consecutive systems an Or-opt move relocates.
+OR_OPT_MAX_SEGMENT = 3
+
+# Variable-depth (Lin-Kernighan style) moves: longest chain of 2-opt steps, and
+# how many first-step candidates are tried before giving up on a system.
+LK_MAX_DEPTH = 5
+LK_BREADTH = 3
+
+# Search modes of run_iterative_pass and step: simulated annealing, or
+# deterministic 2-opt/Or-opt plus variable-depth local search.
+OPTIMIZER_MODES = ('anneal', 'local_search')
+
+# Average number of systems per cell of the spatial grid.
+GRID_SYSTEMS_PER_CELL = 2
+
+# Annealing schedule: starting temperature as a fraction of the average leg, and per-proposal cooling.
+INITIAL_TEMPERATURE_FACTOR = 0.25
+COOLING_RATE = 0.985
+
+# Seconds between the samples of an annealing telemetry trace.
+TELEMETRY_SAMPLE_INTERVAL = 0.05
+
+# Annealing move types, in the order used by the telemetry counters.
+MOVE_TYPES = ('two_opt', 'relocate')
 
 # This script contains the core computational logic for the route optimizer,
 # adapted to run in the browser via Pyodide.
@@ -20,96 +64,938 @@ def calculate_total_distance(path, systems_data):
         total_dist += calculate_distance(systems_data[path[i]], systems_data[path[i+1]])
     return total_dist
 
+def _to_py(value):
+    """Converts a Pyodide proxy to a Python object; plain Python values pass through."""
+    return value.to_py() if hasattr(value, 'to_py') else value
+
+# --- Coordinate Store ---
+
+class CoordStore:
+    """
+    Systems of one bubble mapped to integer indices, with their coordinates held
+    in contiguous float arrays. The algorithms work on indices and call `dist`.
+    """
+
+    def __init__(self, names, xs, ys, zs, matrix_max_systems=None):
+        if matrix_max_systems is None:
+            matrix_max_systems = DISTANCE_MATRIX_MAX_SYSTEMS
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.size = len(names)
+        self.xs, self.ys, self.zs = xs, ys, zs
+        self.matrix = _build_distance_matrix(xs, ys, zs) if self.size <= matrix_max_systems else None
+        self._neighbour_lists = None
+
+        if self.matrix is not None:
+            rows = self.matrix
+
+            def dist(i, j):
+                return rows[i][j]
+        else:
+            def dist(i, j):
+                return math.sqrt((xs[i] - xs[j])**2 + (ys[i] - ys[j])**2 + (zs[i] - zs[j])**2)
+        self.dist = dist
+
+    def to_indices(self, path):
+        index = self.index
+        return [index[name] for name in path]
+
+    def to_names(self, path):
+        names = self.names
+        return [names[i] for i in path]
+
+    def path_length(self, path):
+        """Total distance of an ordered path of indices."""
+        dist = self.dist
+        return sum((dist(path[k], path[k + 1]) for k in range(len(path) - 1)), 0.0)
+
+    def neighbour_lists(self):
+        """Candidate neighbour lists of every system (see build_neighbour_lists), built on first use."""
+        if self._neighbour_lists is None:
+            self._neighbour_lists = build_neighbour_lists(self)
+        return self._neighbour_lists
+
+def _build_distance_matrix(xs, ys, zs):
+    """Returns the pairwise distances as one contiguous array('d') row per system."""
+    n = len(xs)
+    if np is not None and n > 0:
+        squared = np.zeros((n, n))
+        for axis_values in (xs, ys, zs):
+            axis = np.frombuffer(axis_values, dtype=np.float64)
+            delta = axis[:, None] - axis[None, :]
+            squared += delta * delta
+        matrix = np.sqrt(squared)
+        rows = []
+        for i in range(n):
+            row = array('d')
+            row.frombytes(matrix[i].tobytes())
+            rows.append(row)
+        return rows
+
+    rows = [array('d', bytes(8 * n)) for _ in range(n)]
+    for i in range(n):
+        xi, yi, zi = xs[i], ys[i], zs[i]
+        row_i = rows[i]
+        for j in range(i + 1, n):
+            d = math.sqrt((xi - xs[j])**2 + (yi - ys[j])**2 + (zi - zs[j])**2)
+            row_i[j] = d
+            rows[j][i] = d
+    return rows
+
+def build_coord_store(system_names, systems_data, matrix_max_systems=None):
+    """Builds a CoordStore for the given systems from a name -> {x, y, z} mapping."""
+    names = list(dict.fromkeys(system_names))
+    xs = array('d', (systems_data[name]['x'] for name in names))
+    ys = array('d', (systems_data[name]['y'] for name in names))
+    zs = array('d', (systems_data[name]['z'] for name in names))
+    return CoordStore(names, xs, ys, zs, matrix_max_systems)
+
+def get_coord_store(system_names, systems_data_js):
+    """
+    Returns the cached CoordStore for this set of systems, building it on a miss.
+    The systems dict is only converted from its JS proxy when a store has to be built.
+    """
+    key = frozenset(system_names)
+    store = _coord_store_cache.get(key)
+    if store is not None:
+        _coord_store_cache.move_to_end(key)
+        return store
+
+    store = build_coord_store(system_names, _to_py(systems_data_js))
+    _coord_store_cache[key] = store
+    while len(_coord_store_cache) > COORD_STORE_CACHE_SIZE:
+        _coord_store_cache.popitem(last=False)
+    return store
+
+_coord_store_cache = OrderedDict()
+
+# --- Spatial Grid ---
+
+class SpatialGrid:
+    """Uniform grid bucketing store indices by position, for nearest-neighbour searches."""
+
+    def __init__(self, store, indices=None):
+        if indices is None:
+            indices = range(store.size)
+        indices = list(indices)
+        self.store = store
+        self.count = len(indices)
+        if indices:
+            lows, extents = [], []
+            for axis in (store.xs, store.ys, store.zs):
+                values = [axis[i] for i in indices]
+                lows.append(min(values))
+                extents.append(max(values) - lows[-1])
+            self.origin = tuple(lows)
+        else:
+            self.origin, extents = (0.0, 0.0, 0.0), [0.0, 0.0, 0.0]
+        # Size cells from the occupied volume so flat bubbles do not end up with a handful of crowded cells
+        largest = max(extents)
+        if largest > 0:
+            volume = 1.0
+            for extent in extents:
+                volume *= max(extent, largest * 1e-3)
+            self.cell_size = min(largest, (volume * GRID_SYSTEMS_PER_CELL / len(indices)) ** (1 / 3))
+        else:
+            self.cell_size = 1.0
+        self.max_shell = int(largest // self.cell_size) + 1
+        self.cells = {}
+        for i in indices:
+            self.cells.setdefault(self.cell_of(i), set()).add(i)
+
+    def cell_of(self, i):
+        store, size = self.store, self.cell_size
+        ox, oy, oz = self.origin
+        return (int((store.xs[i] - ox) // size), int((store.ys[i] - oy) // size), int((store.zs[i] - oz) // size))
+
+    def remove(self, i):
+        self.cells[self.cell_of(i)].discard(i)
+        self.count -= 1
+
+    def nearest(self, i, k=1):
+        """
+        Returns up to k indices nearest to system i (excluding i itself), closest first.
+        Searches shells of cells outwards and stops once no unseen cell can hold a closer system.
+        """
+        store, size = self.store, self.cell_size
+        dist = store.dist
+        cells = self.cells
+        cx, cy, cz = self.cell_of(i)
+        ox, oy, oz = self.origin
+        # Distance from system i to the nearest face of its own cell
+        margin = size
+        for value, low, cell in ((store.xs[i], ox, cx), (store.ys[i], oy, cy), (store.zs[i], oz, cz)):
+            offset = value - low - cell * size
+            margin = min(margin, offset, size - offset)
+        found = []
+        visited_cells = 0
+        for r in range(self.max_shell + 1):
+            for dx in range(-r, r + 1):
+                for dy in range(-r, r + 1):
+                    # Only the surface of the shell; its interior was searched already
+                    if abs(dx) == r or abs(dy) == r:
+                        dzs = range(-r, r + 1)
+                    else:
+                        dzs = (-r, r) if r else (0,)
+                    for dz in dzs:
+                        visited_cells += 1
+                        bucket = cells.get((cx + dx, cy + dy, cz + dz))
+                        if bucket:
+                            found.extend((dist(i, j), j) for j in bucket if j != i)
+            if len(found) >= k:
+                found.sort()
+                del found[k:]
+                if found[-1][0] <= r * size + margin:
+                    return [j for _, j in found]
+            # Mostly empty cells around here: a scan of the remaining systems is cheaper
+            if visited_cells > self.count:
+                found = [(dist(i, j), j) for bucket in cells.values() for j in bucket if j != i]
+                break
+        found.sort()
+        del found[k:]
+        return [j for _, j in found]
+
+def build_neighbour_lists(store, k=NEIGHBOUR_LIST_SIZE, grid=None):
+    """Returns, for every store index, the indices of its k nearest systems."""
+    if grid is None:
+        grid = SpatialGrid(store)
+    return [grid.nearest(i, k) for i in range(store.size)]
+
+def nearest_neighbour_path(store, start, grid=None):
+    """Greedy nearest-neighbour construction using a spatial grid of unvisited systems."""
+    if grid is None:
+        grid = SpatialGrid(store)
+    grid.remove(start)
+    path = [start]
+    current = start
+    while grid.count:
+        nearest = grid.nearest(current)[0]
+        grid.remove(nearest)
+        path.append(nearest)
+        current = nearest
+    return path
+
+def improve_path(store, path, neighbours):
+    """
+    2-opt and Or-opt local search over candidate neighbour lists, keeping path[0] fixed.
+
+    Systems whose surroundings changed sit in a work queue (the inverse of a
+    don't-look bit); each one is swept with first-improvement moves and
+    dropped once no move around it helps, so the search never restarts.
+    """
+    dist = store.dist
+    path = list(path)
+    last = len(path) - 1
+    if last < 2:
+        return path
+    pos = [0] * store.size
+    for p_i, node in enumerate(path):
+        pos[node] = p_i
+    queue = deque(path)
+    queued = set(path)
+    eps = 1e-9 * store.path_length(path) / last
+
+    def activate(*nodes):
+        for node in nodes:
+            if node is not None and node not in queued:
+                queued.add(node)
+                queue.append(node)
+
+    def reverse(lo, hi):
+        path[lo:hi + 1] = path[hi:lo - 1 if lo else None:-1]
+        for p_i in range(lo, hi + 1):
+            pos[path[p_i]] = p_i
+
+    def try_two_opt(a):
+        for c in neighbours[a]:
+            i, j = pos[a], pos[c]
+            lo, hi = (i, j) if i < j else (j, i)
+            if hi - lo < 2:
+                continue
+            u, v = path[lo], path[hi]
+            d_uv = dist(u, v)
+            # Reconnect through the successors: reverse path[lo + 1 .. hi]
+            u_next = path[lo + 1]
+            delta = d_uv - dist(u, u_next)
+            if hi < last:
+                v_next = path[hi + 1]
+                delta += dist(u_next, v_next) - dist(v, v_next)
+            else:
+                v_next = None
+            if delta < -eps:
+                reverse(lo + 1, hi)
+                activate(u, v, u_next, v_next)
+                return True
+            # Reconnect through the predecessors: reverse path[lo .. hi - 1]
+            if lo >= 1:
+                u_prev, v_prev = path[lo - 1], path[hi - 1]
+                delta = d_uv + dist(u_prev, v_prev) - dist(u_prev, u) - dist(v_prev, v)
+                if delta < -eps:
+                    reverse(lo, hi - 1)
+                    activate(u, v, u_prev, v_prev)
+                    return True
+        return False
+
+    def try_or_opt(a):
+        p_a = pos[a]
+        for seg_len in range(1, OR_OPT_MAX_SEGMENT + 1):
+            for s in ((p_a,) if seg_len == 1 else (p_a, p_a - seg_len + 1)):
+                e = s + seg_len - 1
+                if s < 1 or e > last:
+                    continue
+                first, tail = path[s], path[e]
+                prev = path[s - 1]
+                nxt = path[e + 1] if e < last else None
+                removal_gain = dist(prev, first)
+                if nxt is not None:
+                    removal_gain += dist(tail, nxt) - dist(prev, nxt)
+                # Re-attach the segment so that one of its ends sits next to a candidate neighbour
+                for end_is_first, end, other in ((True, first, tail), (False, tail, first)):
+                    for c in neighbours[end]:
+                        d_end = dist(end, c)
+                        if d_end >= removal_gain:
+                            break
+                        p_c = pos[c]
+                        if s <= p_c <= e:
+                            continue
+                        # Between path[p_c - 1] and c, or between c and path[p_c + 1]
+                        for q in (p_c - 1, p_c):
+                            if q < 0 or s - 1 <= q <= e:
+                                continue
+                            if q == p_c:
+                                w = path[q + 1] if q < last else None
+                            else:
+                                w = path[q]
+                            added = d_end
+                            if w is not None:
+                                added += dist(other, w) - dist(c, w)
+                            if added - removal_gain < -eps:
+                                segment = path[s:e + 1]
+                                # Orientation: `end` must face c
+                                if (q == p_c) != end_is_first:
+                                    segment.reverse()
+                                if q < s:
+                                    path[q + 1:e + 1] = segment + path[q + 1:s]
+                                    lo, hi = q + 1, e
+                                else:
+                                    path[s:q + 1] = path[e + 1:q + 1] + segment
+                                    lo, hi = s, q
+                                for p_i in range(lo, hi + 1):
+                                    pos[path[p_i]] = p_i
+                                activate(prev, nxt, first, tail, c, w)
+                                return True
+        return False
+
+    while queue:
+        a = queue.popleft()
+        queued.discard(a)
+        if try_two_opt(a) or try_or_opt(a):
+            activate(a)
+    return path
+
+def lk_improve(store, path, neighbours, deadline=None, max_depth=LK_MAX_DEPTH, breadth=LK_BREADTH):
+    """
+    Variable-depth (Lin-Kernighan style) local search over a path of store
+    indices, keeping path[0] fixed. Returns (path, improved).
+
+    The path is closed into a cycle through a dummy node that is free to link
+    to the path's end and pinned to path[0]. From a system t1 and a tour
+    neighbour t2, a chain of up to `max_depth` 2-opt steps is grown: each step
+    links t2 to a candidate neighbour t3 and breaks the edge that keeps the
+    tour a single cycle, while the running gain stays positive. The chain is
+    cut back to its most profitable step, or undone entirely if no step paid
+    off. Systems are revisited through a work queue, as in improve_path.
+    """
+    base_dist = store.dist
+    path = list(path)
+    n = len(path)
+    if n < 4:
+        return path, False
+    start = path[0]
+    dummy = max(path) + 1
+    # Never worth breaking: keeps the dummy next to the start of the path
+    pinned = -1e30 * (1.0 + store.path_length(path))
+
+    def dist(a, b):
+        if a == dummy or b == dummy:
+            return pinned if a == start or b == start else 0.0
+        return base_dist(a, b)
+
+    tour = path + [dummy]
+    size = n + 1
+    pos = [0] * (dummy + 1)
+    for p, node in enumerate(tour):
+        pos[node] = p
+    eps = 1e-9 * store.path_length(path) / (n - 1)
+
+    def reverse(i, j):
+        """
+        Reverses tour[i..j] (cyclic), or its complement when that is shorter:
+        both give the same cycle. Returns the span actually reversed.
+        """
+        length = (j - i) % size + 1
+        if 2 * length > size:
+            i, j, length = (j + 1) % size, (i - 1) % size, size - length
+        if i <= j:
+            tour[i:j + 1] = tour[j:i - 1 if i else None:-1]
+            for p in range(i, j + 1):
+                pos[tour[p]] = p
+            return i, j
+        a, b = i, j
+        for _ in range(length // 2):
+            tour[a], tour[b] = tour[b], tour[a]
+            pos[tour[a]] = a
+            pos[tour[b]] = b
+            a = a + 1 if a + 1 < size else 0
+            b = b - 1 if b else size - 1
+        return i, j
+
+    def two_opt_step(t1, t2, t3):
+        """Replaces edges (t1, t2) and (t3, t4) with (t2, t3) and (t4, t1); returns (t4, span) or None."""
+        if pos[t2] == (pos[t1] + 1) % size:
+            t4 = tour[pos[t3] - 1]
+            if t3 == t1 or t4 == t2:
+                return None
+            return t4, reverse(pos[t2], pos[t4])
+        t4 = tour[(pos[t3] + 1) % size]
+        if t3 == t1 or t4 == t2:
+            return None
+        return t4, reverse(pos[t4], pos[t2])
+
+    def successors(t1, t2):
+        if pos[t2] == (pos[t1] + 1) % size:
+            return lambda t3: tour[pos[t3] - 1]
+        return lambda t3: tour[(pos[t3] + 1) % size]
+
+    def candidates(t1, t2, gain):
+        """(lookahead, t3) pairs for the next step from t2, best first."""
+        other_end = successors(t1, t2)
+        options = []
+        for t3 in neighbours[t2] if t2 != dummy else ():
+            g1 = gain - dist(t2, t3)
+            if g1 <= eps:
+                break
+            if t3 == t1:
+                continue
+            t4 = other_end(t3)
+            if t4 == t2:
+                continue
+            options.append((g1 + dist(t3, t4), t3))
+        if t2 != start and t2 != dummy and gain > eps:
+            # Making t2 an end of the path costs nothing
+            t4 = other_end(dummy)
+            if t4 != t2 and t4 != start and gain - dist(t4, t1) > eps:
+                options.append((gain + dist(dummy, t4), dummy))
+        options.sort(reverse=True)
+        return options
+
+    def can_extend(t1, head, gain):
+        """Whether any step could follow from `head` with a positive gain (checked before applying the current one)."""
+        if head == dummy:
+            return False
+        near = neighbours[head]
+        if near and gain - dist(head, near[0]) > eps:
+            return True
+        if head != start:
+            end = tour[(pos[dummy] + 1) % size]
+            if end == start:
+                end = tour[pos[dummy] - 1]
+            return gain - dist(end, t1) > eps
+        return False
+
+    def try_chain(t1, t2):
+        gain = dist(t1, t2)
+        if gain <= eps:
+            return None
+        for _, first in candidates(t1, t2, gain)[:breadth]:
+            spans, touched = [], [t1, t2]
+            best_gain, best_steps = eps, 0
+            g, head, t3 = gain, t2, first
+            while True:
+                t4 = successors(t1, head)(t3)
+                if t3 == t1 or t4 == head:
+                    break
+                g1 = g - dist(head, t3)
+                g_next = g1 + dist(t3, t4)
+                closed = g_next - dist(t4, t1)
+                deeper = len(spans) + 1 < max_depth and can_extend(t1, t4, g_next)
+                # Reversing is the expensive part: only apply a step that pays off or leads somewhere
+                if closed <= best_gain and not deeper:
+                    break
+                spans.append(two_opt_step(t1, head, t3)[1])
+                touched.extend((t3, t4))
+                if closed > best_gain:
+                    best_gain, best_steps = closed, len(spans)
+                if not deeper:
+                    break
+                g, head = g_next, t4
+                options = candidates(t1, head, g)
+                if not options:
+                    break
+                t3 = options[0][1]
+            for span in reversed(spans[best_steps:]):
+                reverse(*span)
+            if best_steps:
+                return touched[:2 + 2 * best_steps]
+        return None
+
+    improved = False
+    queue = deque(path)
+    queued = set(path)
+    while queue:
+        if deadline is not None and time.time() >= deadline:
+            break
+        t1 = queue.popleft()
+        queued.discard(t1)
+        for t2 in (tour[(pos[t1] + 1) % size], tour[pos[t1] - 1]):
+            touched = try_chain(t1, t2)
+            if touched:
+                improved = True
+                for node in touched + [t1]:
+                    if node != dummy and node not in queued:
+                        queued.add(node)
+                        queue.append(node)
+                break
+
+    at = pos[dummy]
+    path = tour[at + 1:] + tour[:at]
+    if path[0] != start:
+        path.reverse()
+    return path, improved
+
+def local_search_path(store, path, deadline=None):
+    """
+    Deterministic local search: alternates improve_path (2-opt and Or-opt)
+    with lk_improve until neither helps or `deadline` (a time.time() value) passes.
+    """
+    neighbours = store.neighbour_lists()
+    path = improve_path(store, path, neighbours)
+    while deadline is None or time.time() < deadline:
+        path, improved = lk_improve(store, path, neighbours, deadline)
+        if not improved:
+            break
+        path = improve_path(store, path, neighbours)
+    return path
+
+def build_baseline_path(store, start):
+    """Nearest-neighbour construction followed by neighbour-list 2-opt and Or-opt."""
+    grid = SpatialGrid(store)
+    neighbours = build_neighbour_lists(store, grid=grid)
+    path = nearest_neighbour_path(store, start, grid)
+    return improve_path(store, path, neighbours)
+
 def calculate_baseline_route(systems_in_radius_js, systems_data_js, start_system_name):
     """A dedicated function for the fast initial route calculation."""
     try:
-        systems_in_radius = systems_in_radius_js.to_py()
-        systems_data = systems_data_js.to_py()
-        
-        # 1. Nearest Neighbor
-        unvisited = set(systems_in_radius)
-        unvisited.remove(start_system_name)
-        nn_path = [start_system_name]
-        current_system = start_system_name
-        while unvisited:
-            nearest = min(unvisited, key=lambda sys: calculate_distance(systems_data[current_system], systems_data[sys]))
-            nn_path.append(nearest)
-            unvisited.remove(nearest)
-            current_system = nearest
-        
-        # 2. 2-Opt Refinement
-        best_path = nn_path
-        path_len = len(best_path)
-        improved = True
-        while improved:
-            improved = False
-            for i in range(1, path_len - 1):
-                for j in range(i + 1, path_len):
-                    current_dist = calculate_distance(systems_data[best_path[i-1]], systems_data[best_path[i]]) + \
-                                   calculate_distance(systems_data[best_path[j-1]], systems_data[best_path[j]])
-                    new_dist = calculate_distance(systems_data[best_path[i-1]], systems_data[best_path[j-1]]) + \
-                               calculate_distance(systems_data[best_path[i]], systems_data[best_path[j]])
-                    if new_dist < current_dist:
-                        best_path[i:j] = best_path[i:j][::-1]
-                        improved = True
-                        break
-                if improved:
-                    break
-        
-        best_dist = calculate_total_distance(best_path, systems_data)
-        return {'path': best_path, 'distance': best_dist}
+        systems_in_radius = _to_py(systems_in_radius_js)
+        store = get_coord_store(systems_in_radius, systems_data_js)
+        best_path = build_baseline_path(store, store.index[start_system_name])
+        best_dist = store.path_length(best_path)
+        return {'path': store.to_names(best_path), 'distance': best_dist}
     except Exception as e:
         return {'error': str(e)}
 
 
-def run_iterative_pass(current_best_path_js, systems_data_js, time_per_pass):
-    """Runs a single, time-limited deep search pass."""
+def run_iterative_pass(current_best_path_js, systems_data_js, time_per_pass, with_telemetry=False,
+                       telemetry_callback=None, mode='anneal'):
+    """
+    Runs a single, time-limited deep search pass.
+    `mode` (see OPTIMIZER_MODES) picks annealing or local_search_path.
+    With `with_telemetry` (or a `telemetry_callback`), the result also carries
+    the pass's AnnealTelemetry as a dict, and the callback receives that dict
+    at every trace sample (annealing only).
+    """
     try:
-        current_best_path = current_best_path_js.to_py()
-        systems_data = systems_data_js.to_py()
-
-        random.seed()
-
-        local_path = list(current_best_path)
-        path_len = len(local_path)
-
-        if path_len > 4:
-            for _ in range(3):
-                i, j = sorted(random.sample(range(1, path_len), 2))
-                local_path[i:j] = local_path[i:j][::-1]
-        
-        start_time = time.time()
-        best_path = local_path
-        best_dist = calculate_total_distance(best_path, systems_data)
-
-        avg_dist = best_dist / (path_len - 1) if path_len > 1 else 1.0
-        temperature = avg_dist * 0.25 # Start with a quarter of the average distance
-        cooling_rate = 0.985
-
-        while time.time() - start_time < time_per_pass:
-            new_path = list(best_path)
-
-            # 2-opt move
-            if random.random() < 0.5 and path_len > 3:
-                i, j = sorted(random.sample(range(1, path_len), 2))
-                new_path[i:j+1] = new_path[i:j+1][::-1]
-            # Relocate move
-            else:
-                if path_len > 2:
-                    idx_to_move = random.randint(1, path_len - 1)
-                    system_to_move = new_path.pop(idx_to_move)
-                    insert_pos = random.randint(1, len(new_path))
-                    new_path.insert(insert_pos, system_to_move)
-
-            new_dist = calculate_total_distance(new_path, systems_data)
-
-            cost_diff = new_dist - best_dist
-            if cost_diff < 0 or (temperature > 1e-8 and random.random() < math.exp(-cost_diff / temperature)):
-                best_path = new_path
-                best_dist = new_dist
-            
+        current_best_path = _to_py(current_best_path_js)
+        store = get_coord_store(current_best_path, systems_data_js)
+        telemetry = _make_telemetry(with_telemetry, telemetry_callback) if mode == 'anneal' else None
+        path, best_dist = search_path(store, store.to_indices(current_best_path), time_per_pass, mode,
+                                      telemetry=telemetry)
+        result = {'path': store.to_names(path), 'distance': best_dist}
+        if telemetry is not None:
+            result['telemetry'] = telemetry.to_dict()
+        return result
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def search_path(store, path, time_per_pass, mode='anneal', rng=random, telemetry=None):
+    """Runs one pass of the given OPTIMIZER_MODES search; returns (path, distance)."""
+    if mode == 'anneal':
+        return anneal_path(store, path, time_per_pass, rng, telemetry)
+    if mode == 'local_search':
+        path = local_search_path(store, path, time.time() + time_per_pass)
+        return path, store.path_length(path)
+    raise ValueError(f"Unknown optimizer mode: {mode}")
+
+
+def _make_telemetry(with_telemetry, telemetry_callback):
+    """An AnnealTelemetry whose callback receives plain dicts, or None when telemetry is off."""
+    if not with_telemetry and telemetry_callback is None:
+        return None
+    callback = None
+    if telemetry_callback is not None:
+        def callback(telemetry):
+            telemetry_callback(telemetry.to_dict())
+    return AnnealTelemetry(callback)
+
+
+class AnnealTelemetry:
+    """
+    Counters and trace of one annealing run, filled in by anneal_path.
+
+    Per move type (MOVE_TYPES): proposals, accepted moves, and how many of those
+    were improving or uphill. The trace holds (elapsed s, current distance, best
+    distance, temperature, acceptance rate since the previous sample) every
+    `sample_interval` seconds. Wall time is split between generating proposals,
+    scoring them and applying accepted moves. `callback(telemetry)` is called
+    after every trace sample.
+    """
+
+    def __init__(self, callback=None, sample_interval=TELEMETRY_SAMPLE_INTERVAL):
+        self.callback = callback
+        self.sample_interval = sample_interval
+        self.proposals = [0] * len(MOVE_TYPES)
+        self.accepted = [0] * len(MOVE_TYPES)
+        self.improving = [0] * len(MOVE_TYPES)
+        self.uphill = [0] * len(MOVE_TYPES)
+        self.generation_time = 0.0
+        self.scoring_time = 0.0
+        self.apply_time = 0.0
+        self.elapsed = 0.0
+        self.initial_temperature = None
+        self.final_temperature = None
+        self.initial_distance = None
+        self.best_distance = None
+        self.trace = []
+
+    def sample(self, elapsed, current_dist, best_dist, temperature, window_proposals, window_accepted):
+        self.elapsed = elapsed
+        self.best_distance = best_dist
+        self.final_temperature = temperature
+        rate = window_accepted / window_proposals if window_proposals else 0.0
+        self.trace.append((elapsed, current_dist, best_dist, temperature, rate))
+        if self.callback is not None:
+            self.callback(self)
+
+    @property
+    def total_proposals(self):
+        return sum(self.proposals)
+
+    @property
+    def proposals_per_second(self):
+        return self.total_proposals / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def acceptance_rate(self):
+        return sum(self.accepted) / self.total_proposals if self.total_proposals else 0.0
+
+    def to_dict(self):
+        return {
+            'elapsed': self.elapsed,
+            'proposals': self.total_proposals,
+            'proposals_per_second': self.proposals_per_second,
+            'acceptance_rate': self.acceptance_rate,
+            'moves': {
+                name: {'proposals': self.proposals[m], 'accepted': self.accepted[m],
+                       'improving': self.improving[m], 'uphill': self.uphill[m]}
+                for m, name in enumerate(MOVE_TYPES)
+            },
+            'time_split': {'generation': self.generation_time, 'scoring': self.scoring_time,
+                           'apply': self.apply_time},
+            'initial_temperature': self.initial_temperature,
+            'final_temperature': self.final_temperature,
+            'initial_distance': self.initial_distance,
+            'best_distance': self.best_distance,
+            'trace': [list(sample) for sample in self.trace],
+        }
+
+
+def _draw_move(rand, randint, sample, positions, last):
+    """
+    Draws a random annealing move as (move type, i, j): a 2-opt move (0)
+    reverses path[i..j], a relocate move (1) takes path[i] and re-inserts it
+    after path[j]. Needs a path of at least 4 systems.
+    """
+    if rand() < 0.5:
+        i, j = sorted(sample(positions, 2))
+        return 0, i, j
+    i = randint(1, last)
+    # Any anchor except path[i - 1] and path[i], which would be a no-op
+    k = randint(0, last - 2)
+    if k >= i - 1:
+        k += 2
+    return 1, i, k
+
+
+def _move_cost(path, dist, last, move, i, j):
+    """Change in path length from a _draw_move move, from the few edges it touches."""
+    if move == 0:
+        a, b, c = path[i - 1], path[i], path[j]
+        cost_diff = dist(a, c) - dist(a, b)
+        if j < last:
+            d = path[j + 1]
+            cost_diff += dist(b, d) - dist(c, d)
+        return cost_diff
+    node = path[i]
+    prev = path[i - 1]
+    cost_diff = -dist(prev, node)
+    if i < last:
+        nxt = path[i + 1]
+        cost_diff += dist(prev, nxt) - dist(node, nxt)
+    anchor = path[j]
+    cost_diff += dist(anchor, node)
+    if j < last:
+        after = path[j + 1]
+        cost_diff += dist(node, after) - dist(anchor, after)
+    return cost_diff
+
+
+def _apply_move(path, move, i, j):
+    """Applies a _draw_move move to `path` in place."""
+    if move == 0:
+        path[i:j + 1] = path[j:i - 1:-1]
+    else:
+        node = path.pop(i)
+        path.insert(j + 1 if j < i else j, node)
+
+
+def anneal_path(store, path, time_per_pass, rng=random, telemetry=None):
+    """
+    Simulated annealing over a path of store indices, keeping path[0] fixed.
+
+    Moves are scored by the change in the few edges they touch, so a proposal
+    costs O(1) distance lookups. The path is only modified when a move is
+    accepted. Returns the best path seen and its length.
+
+    With an AnnealTelemetry, the run goes through _anneal_path_instrumented
+    instead, so the plain loop carries no instrumentation at all.
+    """
+    dist = store.dist
+    path = list(path)
+    path_len = len(path)
+
+    if path_len > 4:
+        for _ in range(3):
+            i, j = sorted(rng.sample(range(1, path_len), 2))
+            path[i:j] = path[i:j][::-1]
+    if telemetry is not None:
+        return _anneal_path_instrumented(store, path, time_per_pass, rng, telemetry)
+
+    start_time = time.time()
+    current_dist = store.path_length(path)
+    best_dist = current_dist
+    best_path = None  # Only materialised when we are about to leave the best state
+    at_best = True
+
+    avg_dist = current_dist / (path_len - 1) if path_len > 1 else 1.0
+    temperature = avg_dist * INITIAL_TEMPERATURE_FACTOR
+    cooling_rate = COOLING_RATE
+    last = path_len - 1
+    movable = path_len > 3
+    rand = rng.random
+    randint = rng.randint
+    sample = rng.sample
+    positions = range(1, path_len)
+
+    while time.time() - start_time < time_per_pass:
+        for _ in range(ANNEAL_BATCH_SIZE):
+            if movable:
+                move, i, j = _draw_move(rand, randint, sample, positions, last)
+                cost_diff = _move_cost(path, dist, last, move, i, j)
+                if cost_diff < 0 or (temperature > 1e-8 and rand() < math.exp(-cost_diff / temperature)):
+                    if at_best and cost_diff > 0:
+                        best_path = list(path)
+                        at_best = False
+                    _apply_move(path, move, i, j)
+                    current_dist += cost_diff
+                    if current_dist < best_dist:
+                        best_dist = current_dist
+                        at_best = True
             temperature *= cooling_rate
 
-        return {'path': best_path, 'distance': best_dist}
+    if not at_best:
+        path = best_path
+    # Re-sum once to shed the floating point drift of the accumulated deltas
+    return path, store.path_length(path)
+
+
+def _anneal_path_instrumented(store, path, time_per_pass, rng, telemetry):
+    """
+    The annealing loop of anneal_path (after its initial perturbation), with
+    every proposal counted and timed into `telemetry`. Same move helpers and
+    acceptance rule, so the same seed gives the same path.
+    """
+    dist = store.dist
+    path_len = len(path)
+    clock = time.perf_counter
+
+    start_time = time.time()
+    current_dist = store.path_length(path)
+    best_dist = current_dist
+    best_path = None
+    at_best = True
+
+    avg_dist = current_dist / (path_len - 1) if path_len > 1 else 1.0
+    temperature = avg_dist * INITIAL_TEMPERATURE_FACTOR
+    cooling_rate = COOLING_RATE
+    last = path_len - 1
+    movable = path_len > 3
+    rand = rng.random
+    randint = rng.randint
+    sample = rng.sample
+    positions = range(1, path_len)
+
+    proposals, accepted = telemetry.proposals, telemetry.accepted
+    improving, uphill = telemetry.improving, telemetry.uphill
+    generation_time = scoring_time = apply_time = 0.0
+    telemetry.initial_temperature = temperature
+    telemetry.initial_distance = current_dist
+    next_sample = start_time
+    window_proposals = window_accepted = 0
+
+    while True:
+        now = time.time()
+        elapsed = now - start_time
+        if now >= next_sample or elapsed >= time_per_pass:
+            telemetry.generation_time, telemetry.scoring_time, telemetry.apply_time = (
+                generation_time, scoring_time, apply_time)
+            telemetry.sample(elapsed, current_dist, best_dist, temperature, window_proposals, window_accepted)
+            window_proposals = window_accepted = 0
+            next_sample = now + telemetry.sample_interval
+        if elapsed >= time_per_pass:
+            break
+        for _ in range(ANNEAL_BATCH_SIZE):
+            if movable:
+                t0 = clock()
+                move, i, j = _draw_move(rand, randint, sample, positions, last)
+                t1 = clock()
+                cost_diff = _move_cost(path, dist, last, move, i, j)
+                take = cost_diff < 0 or (temperature > 1e-8 and rand() < math.exp(-cost_diff / temperature))
+                t2 = clock()
+                generation_time += t1 - t0
+                scoring_time += t2 - t1
+                proposals[move] += 1
+                window_proposals += 1
+                if take:
+                    accepted[move] += 1
+                    window_accepted += 1
+                    if cost_diff < 0:
+                        improving[move] += 1
+                    elif cost_diff > 0:
+                        uphill[move] += 1
+                    if at_best and cost_diff > 0:
+                        best_path = list(path)
+                        at_best = False
+                    _apply_move(path, move, i, j)
+                    current_dist += cost_diff
+                    if current_dist < best_dist:
+                        best_dist = current_dist
+                        at_best = True
+                    apply_time += clock() - t2
+            temperature *= cooling_rate
+
+    if not at_best:
+        path = best_path
+    return path, store.path_length(path)
+
+
+# --- Optimizer Sessions ---
+
+SNAPSHOT_VERSION = 1
+
+
+class OptimizerSession:
+    """
+    A bubble loaded once and optimised over many steps.
+
+    Holds the CoordStore, the best path found so far (as store indices) and
+    the random state of the search. `reported` is False while the best path
+    has changed since the caller last received it.
+    """
+
+    def __init__(self, store, path, seed=None):
+        self.store = store
+        self.best_path = list(path)
+        self.best_distance = store.path_length(self.best_path)
+        self.rng = random.Random(seed)
+        self.steps = 0
+        self.reported = False
+
+
+def create_session(coords_js, start_system_name, path_js=None, seed=None):
+    """
+    Loads a bubble's coordinates (name -> {x, y, z}) once and returns a session.
+    The session starts from `path` when given, otherwise from the baseline
+    route out of `start_system_name`.
+    """
+    coords = _to_py(coords_js)
+    store = build_coord_store(list(coords), coords)
+    if path_js is not None:
+        path = store.to_indices(_to_py(path_js))
+    else:
+        path = build_baseline_path(store, store.index[start_system_name])
+    return OptimizerSession(store, path, seed)
+
+
+def step(session, budget, with_telemetry=False, telemetry_callback=None, mode='anneal'):
+    """
+    Advances the session's search by one pass of `budget` seconds (annealing,
+    or another of OPTIMIZER_MODES).
+
+    Returns the step count and best distance, plus the best path only when it
+    changed since the previous call, so an unproductive step costs the caller
+    a few numbers rather than the whole route.
+    """
+    try:
+        store = session.store
+        telemetry = _make_telemetry(with_telemetry, telemetry_callback) if mode == 'anneal' else None
+        path, distance = search_path(store, session.best_path, budget, mode, session.rng, telemetry)
+        session.steps += 1
+        if distance < session.best_distance:
+            session.best_path, session.best_distance = path, distance
+            session.reported = False
+        result = {'step': session.steps, 'distance': session.best_distance, 'improved': not session.reported}
+        if not session.reported:
+            result['path'] = store.to_names(session.best_path)
+            session.reported = True
+        if telemetry is not None:
+            result['telemetry'] = telemetry.to_dict()
+        return result
     except Exception as e:
-        return {'error': str(e)}
\ No newline at end of file
+        return {'error': str(e)}
+
+
+def snapshot(session):
+    """Returns a JSON-serialisable checkpoint of the session: best path, distance, step count and random state."""
+    version, state, gauss = session.rng.getstate()
+    return {
+        'version': SNAPSHOT_VERSION,
+        'path': session.store.to_names(session.best_path),
+        'distance': session.best_distance,
+        'steps': session.steps,
+        'rng_state': [version, list(state), gauss],
+    }
+
+
+def restore(session, snapshot_js):
+    """
+    Rewinds (or forwards) a session to a snapshot taken of a session over the
+    same systems. The path is reported again by the next step.
+    """
+    try:
+        saved = _to_py(snapshot_js)
+        if saved.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {saved.get('version')}")
+        store = session.store
+        if len(saved['path']) != store.size or set(saved['path']) != set(store.names):
+            raise ValueError("Snapshot was taken over a different set of systems")
+        session.best_path = store.to_indices(saved['path'])
+        session.best_distance = store.path_length(session.best_path)
+        session.steps = saved['steps']
+        version, state, gauss = saved['rng_state']
+        session.rng.setstate((version, tuple(state), gauss))
+        session.reported = False
+        return {'step': session.steps, 'distance': session.best_distance}
+    except Exception as e:
+        return {'error': str(e)}
@@ -8,6 +8,19 @@ let pyodide: any = null;
 let calculateBaselineRoutePy: any = null;
 // eslint-disable-next-line @typescript-eslint/no-explicit-any
 let runIterativePassPy: any = null;
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+let createSessionPy: any = null;
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+let stepPy: any = null;
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+let snapshotPy: any = null;
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+let restorePy: any = null;
+
+// Optimizer sessions by id. Each holds its bubble's coordinates on the Python
+// side, so step messages only carry the session id and the time budget.
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+const sessions = new Map<string, any>();
 
 const METERS_PER_LY_FACTOR = 9_460_730_472_580_800;
 
@@ -23,6 +36,10 @@ async function initializePyodide() {
 
     calculateBaselineRoutePy = pyodide.globals.get('calculate_baseline_route');
     runIterativePassPy = pyodide.globals.get('run_iterative_pass');
+    createSessionPy = pyodide.globals.get('create_session');
+    stepPy = pyodide.globals.get('step');
+    snapshotPy = pyodide.globals.get('snapshot');
+    restorePy = pyodide.globals.get('restore');
 
     self.postMessage({ type: 'ready' });
 }
@@ -39,6 +56,66 @@ function reverseTransformCoordinates(position: { x: number; y: number; z: number
     return { x: x_meter, y: y_meter, z: z_meter };
 }
 
+function transformSystemsData(systemsData: { [key: string]: { position: { x: number; y: number; z: number; } } }) {
+    const transformedSystemsData: { [key: string]: { x: number; y: number; z: number } } = {};
+    for (const systemName in systemsData) {
+        const system = systemsData[systemName];
+        transformedSystemsData[systemName] = reverseTransformCoordinates(system.position);
+    }
+    return transformedSystemsData;
+}
+
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+function toResultJS(result: any) {
+    const resultJS = result.toJs({ dict_converter: Object.fromEntries });
+    result.destroy();
+    if (resultJS.error !== undefined) {
+        throw new Error(resultJS.error);
+    }
+    if (resultJS.distance !== undefined) {
+        resultJS.distance_ly = resultJS.distance / METERS_PER_LY_FACTOR;
+    }
+    return resultJS;
+}
+
+function getSession(sessionId: string) {
+    const session = sessions.get(sessionId);
+    if (!session) {
+        throw new Error(`Unknown optimizer session: ${sessionId}`);
+    }
+    return session;
+}
+
+function postError(id: unknown, error: unknown) {
+    let errorMessage = "An unknown error occurred.";
+    if (error instanceof Error) {
+        errorMessage = error.message;
+    }
+    self.postMessage({ type: 'error', id: id, error: errorMessage });
+}
+
+interface CreateSessionPayload {
+    sessionId: string;
+    systemsData: { [key: string]: { position: { x: number; y: number; z: number; } } };
+    startSystemName: string;
+    path?: string[];
+    seed?: number;
+}
+
+// Search used by iterative passes and session steps (OPTIMIZER_MODES in optimizer_core.py)
+type OptimizerMode = 'anneal' | 'local_search';
+
+interface StepPayload {
+    sessionId: string;
+    budget: number; // Seconds of search for this step
+    mode?: OptimizerMode;
+}
+
+interface RestorePayload {
+    sessionId: string;
+    snapshot: object; // As returned by the snapshot action
+}
+
 self.onmessage = async (event: MessageEvent) => {
     const { id, action, payload } = event.data;
 
@@ -49,42 +126,77 @@ self.onmessage = async (event: MessageEvent) => {
             timePerPass: number; // Assuming timePerPass is a number
             isBaseline: boolean;
             startSystemName: string;
+            mode?: OptimizerMode;
         }
-        const { path, systemsData, timePerPass, isBaseline, startSystemName } = payload as RunCalculationPayload;
+        const { path, systemsData, timePerPass, isBaseline, startSystemName, mode } = payload as RunCalculationPayload;
 
         try {
             if (!pyodide || !calculateBaselineRoutePy || !runIterativePassPy) {
                 throw new Error("Pyodide or Python functions not initialized.");
             }
 
-            const transformedSystemsData: { [key: string]: { x: number; y: number; z: number } } = {};
-            for (const systemName in systemsData) {
-                const system = systemsData[systemName];
-                transformedSystemsData[systemName] = reverseTransformCoordinates(system.position);
-            }
+            const transformedSystemsData = transformSystemsData(systemsData);
 
             let result;
             if (isBaseline) {
                 result = calculateBaselineRoutePy(path, transformedSystemsData, startSystemName);
             } else {
-                result = runIterativePassPy(path, transformedSystemsData, timePerPass);
+                result = runIterativePassPy.callKwargs(path, transformedSystemsData, timePerPass, { mode: mode ?? 'anneal' });
             }
 
-            const resultJS = result.toJs({ dict_converter: Object.fromEntries });
+            self.postMessage({ type: 'result', id: id, result: toResultJS(result) });
 
-            if (resultJS.distance !== undefined) {
-                resultJS.distance_ly = resultJS.distance / METERS_PER_LY_FACTOR;
-            }
+        } catch (error: unknown) {
+            postError(id, error);
+        }
+        return;
+    }
 
-            self.postMessage({ type: 'result', id: id, result: resultJS });
+    // Session actions: the bubble is sent and transformed once, by createSession;
+    // step only returns the route when it improved since the previous step.
+    try {
+        if (!pyodide || !createSessionPy) {
+            throw new Error("Pyodide or Python functions not initialized.");
+        }
 
-        } catch (error: unknown) {
-            let errorMessage = "An unknown error occurred.";
-            if (error instanceof Error) {
-                errorMessage = error.message;
+        if (action === 'createSession') {
+            const { sessionId, systemsData, startSystemName, path, seed } = payload as CreateSessionPayload;
+            sessions.get(sessionId)?.destroy();
+            sessions.delete(sessionId);
+            const coords = pyodide.toPy(transformSystemsData(systemsData));
+            const initialPath = path ? pyodide.toPy(path) : null;
+            try {
+                sessions.set(sessionId, createSessionPy(coords, startSystemName, initialPath, seed ?? null));
+            } finally {
+                coords.destroy();
+                initialPath?.destroy();
+            }
+            self.postMessage({ type: 'result', id: id, result: { sessionId } });
+        } else if (action === 'step') {
+            const { sessionId, budget, mode } = payload as StepPayload;
+            const resultJS = toResultJS(stepPy.callKwargs(getSession(sessionId), budget, { mode: mode ?? 'anneal' }));
+            self.postMessage({ type: 'result', id: id, result: resultJS });
+        } else if (action === 'snapshot') {
+            const { sessionId } = payload as { sessionId: string };
+            const resultJS = toResultJS(snapshotPy(getSession(sessionId)));
+            self.postMessage({ type: 'result', id: id, result: resultJS });
+        } else if (action === 'restore') {
+            const { sessionId, snapshot } = payload as RestorePayload;
+            const saved = pyodide.toPy(snapshot);
+            try {
+                const resultJS = toResultJS(restorePy(getSession(sessionId), saved));
+                self.postMessage({ type: 'result', id: id, result: resultJS });
+            } finally {
+                saved.destroy();
             }
-            self.postMessage({ type: 'error', id: id, error: errorMessage });
+        } else if (action === 'closeSession') {
+            const { sessionId } = payload as { sessionId: string };
+            sessions.get(sessionId)?.destroy();
+            sessions.delete(sessionId);
+            self.postMessage({ type: 'result', id: id, result: { sessionId } });
         }
+    } catch (error: unknown) {
+        postError(id, error);
     }
 };
 
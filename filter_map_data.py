@@ -1,16 +1,20 @@
-
+import argparse
 import json
+import os
+from collections.abc import Iterator
+
+from json_stream import iter_json_object, iter_json_sections
+
+ignored_regions = [
+    '14000001', '14000002', '14000003', '14000004', '14000005',
+    '12000001', '12000002', '12000003', '12000004', '12000005',
+    '10000004'
+]
 
 def filter_map_data():
     with open('map_data.json', 'r') as f:
         map_data = json.load(f)
 
-    ignored_regions = [
-        '14000001', '14000002', '14000003', '14000004', '14000005',
-        '12000001', '12000002', '12000003', '12000004', '12000005',
-        '10000004'
-    ]
-
     # Flag regions
     for region_id in ignored_regions:
         if region_id in map_data['regions']:
@@ -27,5 +31,52 @@ def filter_map_data():
     with open('map_data.json', 'w') as f:
         json.dump(map_data, f, indent=2)
 
+def filter_map_data_streaming(path='map_data.json'):
+    """
+    Same flags as filter_map_data, without loading map_data.json whole.
+
+    A first pass streams solar_systems to find the constellations to hide; a
+    second pass copies the file entry by entry into a temporary file, setting
+    the hidden flags on the way, which then replaces the original. Entries are
+    written one per line rather than indented.
+    """
+    hidden_constellations = {
+        str(system_data['constellation_id'])
+        for _, system_data in iter_json_object(path, 'solar_systems')
+        if str(system_data['region_id']) in ignored_regions
+    }
+    flagged = {
+        'regions': lambda entry_id, data: entry_id in ignored_regions,
+        'constellations': lambda entry_id, data: entry_id in hidden_constellations,
+        'solar_systems': lambda entry_id, data: str(data['region_id']) in ignored_regions,
+    }
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as out:
+        out.write('{')
+        for section_index, (section, value) in enumerate(iter_json_sections(path)):
+            out.write(',\n' if section_index else '\n')
+            out.write(f'{json.dumps(section)}: ')
+            if not isinstance(value, Iterator):
+                json.dump(value, out)
+                continue
+            is_hidden = flagged.get(section)
+            out.write('{')
+            for entry_index, (entry_id, data) in enumerate(value):
+                if is_hidden and is_hidden(entry_id, data):
+                    data['hidden'] = True
+                out.write(',\n' if entry_index else '\n')
+                out.write(f'{json.dumps(entry_id)}: {json.dumps(data)}')
+            out.write('\n}')
+        out.write('\n}\n')
+    os.replace(temp_path, path)
+
 if __name__ == "__main__":
-    filter_map_data()
+    parser = argparse.ArgumentParser(description="Flag the hidden regions, constellations and systems in map_data.json.")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Rewrite the file entry by entry instead of loading it whole")
+    args = parser.parse_args()
+    if args.streaming:
+        filter_map_data_streaming()
+    else:
+        filter_map_data()
@@ -0,0 +1,346 @@
+import argparse
+import heapq
+import random
+import sqlite3
+import struct
+import sys
+from array import array
+from collections import deque
+
+from sectioned_file import SectionedFile, gate_csr, pack_sections
+
+# Sidecar file written next to map_data.db
+HOPS_FILE = "eve-frontier-map/public/gate_hops.bin"
+
+HOPS_MAGIC = b"EFGH"
+HOPS_VERSION = 1
+# magic, version, system count, gate target count, component count, landmark count,
+# landmark hop entries, hop table bytes
+_HEADER = struct.Struct("<4sIIIIIII")
+
+# Components up to this many systems get a full all-pairs hop table (one byte per pair);
+# larger ones get LANDMARKS_PER_COMPONENT landmark distance columns instead.
+FULL_TABLE_MAX_SYSTEMS = 256
+LANDMARKS_PER_COMPONENT = 16
+
+NO_TABLE = 0xFFFFFFFF
+UNREACHABLE = 0xFFFF
+
+
+def _sections(systems, gate_targets, components, landmarks, landmark_entries, table_bytes):
+    """
+    The sections of a hop file, in file order, as (name, typecode, count).
+    Systems are the visible systems of map_data.db sorted by id, referred to by
+    their index in that order.
+    """
+    return (
+        ('system_ids', 'I', systems),
+        ('component', 'I', systems),               # component of each system
+        ('local_index', 'I', systems),             # position of each system in its component's members
+        ('member_offsets', 'I', components + 1),   # members of c are members[offsets[c]:offsets[c + 1]]
+        ('members', 'I', systems),
+        ('table_offsets', 'I', components),        # start of c's hop table in hop_tables, or NO_TABLE
+        ('landmark_offsets', 'I', components + 1), # landmarks of c are landmark rows offsets[c]:offsets[c + 1]
+        ('landmark_systems', 'I', landmarks),
+        ('landmark_hop_offsets', 'I', components),  # start of c's landmark rows in landmark_hops
+        ('landmark_hops', 'H', landmark_entries),  # row per landmark: hops to each member, in local_index order
+        ('gate_offsets', 'I', systems + 1),        # CSR: neighbours of i are gate_targets[offsets[i]:offsets[i + 1]]
+        ('gate_targets', 'I', gate_targets),
+        ('hop_tables', 'B', table_bytes),          # row-major size x size hops, in local_index order
+    )
+
+
+def load_gate_graph(db_file):
+    """Returns (system ids sorted, CSR gate_offsets, gate_targets) over the visible systems of map_data.db."""
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM systems WHERE hidden = 0")
+    system_ids = sorted(int(row[0]) for row in cursor.fetchall())
+    cursor.execute("SELECT source_system_id, destination_system_id FROM stargates")
+    gates = cursor.fetchall()
+    conn.close()
+
+    gate_offsets, gate_targets = gate_csr({system_id: i for i, system_id in enumerate(system_ids)}, gates)
+    return system_ids, gate_offsets, gate_targets
+
+
+def bfs_hops(gate_offsets, gate_targets, source, max_hops=None):
+    """Returns {system index: hops} for everything reachable from `source` (within `max_hops`)."""
+    hops = {source: 0}
+    frontier = deque([source])
+    while frontier:
+        node = frontier.popleft()
+        depth = hops[node] + 1
+        if max_hops is not None and depth > max_hops:
+            continue
+        for target in gate_targets[gate_offsets[node]:gate_offsets[node + 1]]:
+            if target not in hops:
+                hops[target] = depth
+                frontier.append(target)
+    return hops
+
+
+def build_gate_hops(db_file):
+    """
+    Reads map_data.db and returns the hop file as bytes.
+
+    The gate graph is split into connected components. A component of up to
+    FULL_TABLE_MAX_SYSTEMS systems stores the hop count of every pair (one BFS
+    per member). A larger one stores hop counts from LANDMARKS_PER_COMPONENT
+    landmarks, picked farthest-first, which bound any pair's distance from
+    both sides and guide exact searches (see GateHops).
+    """
+    system_ids, gate_offsets, gate_targets = load_gate_graph(db_file)
+    n = len(system_ids)
+
+    component = array('I', [NO_TABLE]) * n
+    member_offsets, members = array('I', [0]), array('I')
+    local_index = array('I', bytes(4 * n))
+    for source in range(n):
+        if component[source] != NO_TABLE:
+            continue
+        reached = sorted(bfs_hops(gate_offsets, gate_targets, source))
+        for position, node in enumerate(reached):
+            component[node] = len(member_offsets) - 1
+            local_index[node] = position
+        members.extend(reached)
+        member_offsets.append(len(members))
+    components = len(member_offsets) - 1
+
+    table_offsets = array('I')
+    hop_tables = array('B')
+    landmark_offsets, landmark_systems = array('I', [0]), array('I')
+    landmark_hop_offsets, landmark_hops = array('I'), array('H')
+    for c in range(components):
+        group = members[member_offsets[c]:member_offsets[c + 1]]
+        landmark_hop_offsets.append(len(landmark_hops))
+        if len(group) <= FULL_TABLE_MAX_SYSTEMS:
+            table_offsets.append(len(hop_tables))
+            for node in group:
+                hops = bfs_hops(gate_offsets, gate_targets, node)
+                hop_tables.extend(hops[other] for other in group)
+        else:
+            table_offsets.append(NO_TABLE)
+            # Farthest-first: each landmark is the system farthest from those chosen so far
+            nearest = {node: UNREACHABLE for node in group}
+            landmark = group[0]
+            for _ in range(min(LANDMARKS_PER_COMPONENT, len(group))):
+                hops = bfs_hops(gate_offsets, gate_targets, landmark)
+                for node in group:
+                    nearest[node] = min(nearest[node], hops[node])
+                landmark_systems.append(landmark)
+                landmark_hops.extend(min(hops[node], UNREACHABLE - 1) for node in group)
+                landmark = max(group, key=lambda node: (nearest[node], -node))
+                if nearest[landmark] == 0:
+                    break
+        landmark_offsets.append(len(landmark_systems))
+
+    columns = {
+        'system_ids': array('I', system_ids),
+        'component': component,
+        'local_index': local_index,
+        'member_offsets': member_offsets,
+        'members': members,
+        'table_offsets': table_offsets,
+        'landmark_offsets': landmark_offsets,
+        'landmark_systems': landmark_systems,
+        'landmark_hop_offsets': landmark_hop_offsets,
+        'landmark_hops': landmark_hops,
+        'gate_offsets': gate_offsets,
+        'gate_targets': gate_targets,
+        'hop_tables': hop_tables,
+    }
+    counts = (n, len(gate_targets), components, len(landmark_systems), len(landmark_hops), len(hop_tables))
+    return pack_sections(_HEADER, (HOPS_MAGIC, HOPS_VERSION, *counts), _sections(*counts), columns)
+
+
+def export_gate_hops(db_file="eve-frontier-map/public/map_data.db", hops_file=HOPS_FILE):
+    """Writes the gate hop tables for map_data.db to their sidecar file."""
+    print("Building gate hop tables...")
+    data = build_gate_hops(db_file)
+    with open(hops_file, 'wb') as f:
+        f.write(data)
+    systems, _, components, landmarks, landmark_entries, table_bytes = _HEADER.unpack_from(data)[2:]
+    print(f"Gate hops for {systems} systems in {components} components ({landmarks} landmarks, "
+          f"{table_bytes / 1e6:.2f} MB of full tables, {2 * landmark_entries / 1e6:.2f} MB of landmark rows, "
+          f"{len(data) / 1e6:.2f} MB total) saved to {hops_file}")
+
+
+class GateHops(SectionedFile):
+    """
+    Read-only view of a gate hop file, memory-mapped like MapBundle (see SectionedFile).
+
+    Pairs in a small component are answered by a table lookup. Pairs in a
+    large component have landmark bounds (estimate) and an exact answer from
+    an A* search over the gate graph that uses those bounds as its heuristic
+    (hops), which only expands systems that can lie on a shortest route.
+    """
+
+    HEADER = _HEADER
+    MAGIC = HOPS_MAGIC
+    VERSION = HOPS_VERSION
+    KIND = "gate hop file"
+    sections = staticmethod(_sections)
+
+    def __init__(self, path=HOPS_FILE):
+        super().__init__(path)
+        self.components = self.counts[2]
+
+    def component_size(self, c):
+        return self.member_offsets[c + 1] - self.member_offsets[c]
+
+    def connected(self, a, b):
+        """Whether two systems (ids) are linked by gates at all."""
+        return self.component[self.index_of(a)] == self.component[self.index_of(b)]
+
+    def _table_hops(self, c, a, b):
+        size = self.component_size(c)
+        return self.hop_tables[self.table_offsets[c] + self.local_index[a] * size + self.local_index[b]]
+
+    def _landmark_rows(self, c):
+        """Start of each landmark row of component c in landmark_hops."""
+        size = self.component_size(c)
+        start = self.landmark_hop_offsets[c]
+        return [start + k * size for k in range(self.landmark_offsets[c + 1] - self.landmark_offsets[c])]
+
+    def _bounds(self, c, a, b):
+        """(lower, upper) hop bounds between system indices a and b from the landmarks of component c."""
+        lower, upper = 0, UNREACHABLE
+        rows, local_index = self.landmark_hops, self.local_index
+        a, b = local_index[a], local_index[b]
+        for base in self._landmark_rows(c):
+            da, db = rows[base + a], rows[base + b]
+            lower = max(lower, abs(da - db))
+            upper = min(upper, da + db)
+        return lower, upper
+
+    def estimate(self, a, b):
+        """
+        (lower, upper) bounds on the gate jumps between systems a and b (ids);
+        equal when the answer is exact. None if they are not connected.
+        """
+        a, b = self.index_of(a), self.index_of(b)
+        c = self.component[a]
+        if c != self.component[b]:
+            return None
+        if self.table_offsets[c] != NO_TABLE:
+            hops = self._table_hops(c, a, b)
+            return hops, hops
+        return self._bounds(c, a, b)
+
+    def hops(self, a, b):
+        """Exact gate jumps between systems a and b (ids), or None if they are not connected."""
+        a, b = self.index_of(a), self.index_of(b)
+        c = self.component[a]
+        if c != self.component[b]:
+            return None
+        if self.table_offsets[c] != NO_TABLE:
+            return self._table_hops(c, a, b)
+        lower, upper = self._bounds(c, a, b)
+        if lower == upper:
+            return lower
+
+        # A* from a, with the landmark lower bound to b as an admissible heuristic
+        rows, local_index = self.landmark_hops, self.local_index
+        landmark_rows = self._landmark_rows(c)
+        targets = [rows[base + local_index[b]] for base in landmark_rows]
+
+        def heuristic(node):
+            node = local_index[node]
+            return max((abs(rows[base + node] - target) for base, target in zip(landmark_rows, targets)),
+                       default=0)
+
+        offsets, gate_targets = self.gate_offsets, self.gate_targets
+        best = {a: 0}
+        heap = [(lower, 0, a)]
+        while heap:
+            _, depth, node = heapq.heappop(heap)
+            if node == b:
+                return depth
+            if depth > best[node]:
+                continue
+            depth += 1
+            for target in gate_targets[offsets[node]:offsets[node + 1]]:
+                if depth < best.get(target, UNREACHABLE):
+                    best[target] = depth
+                    heapq.heappush(heap, (depth + heuristic(target), depth, target))
+        return None
+
+    def within(self, system_id, max_hops):
+        """Returns {system id: hops} for every system at most `max_hops` gate jumps from `system_id`."""
+        a = self.index_of(system_id)
+        c = self.component[a]
+        ids = self.system_ids
+        if self.table_offsets[c] != NO_TABLE:
+            size = self.component_size(c)
+            start = self.table_offsets[c] + self.local_index[a] * size
+            row = self.hop_tables[start:start + size]
+            group = self.members[self.member_offsets[c]:self.member_offsets[c + 1]]
+            return {ids[node]: hops for node, hops in zip(group, row) if hops <= max_hops}
+        reached = bfs_hops(self.gate_offsets, self.gate_targets, a, max_hops)
+        return {ids[node]: hops for node, hops in reached.items()}
+
+
+def validate_gate_hops(db_file="eve-frontier-map/public/map_data.db", hops_file=HOPS_FILE, samples=2000,
+                       seed=1):
+    """
+    Checks a hop file against plain BFS over the stargates of map_data.db.
+
+    For `samples` pairs, half of them connected, hops() must equal the BFS answer and the
+    estimate() bounds must contain it; within() is checked against a depth
+    limited BFS for a few systems. Prints how often the estimate alone was
+    exact and its mean error, and returns the number of mismatches.
+    """
+    system_ids, gate_offsets, gate_targets = load_gate_graph(db_file)
+    rng = random.Random(seed)
+    mismatches = 0
+    exact_estimates = compared = 0
+    lower_error = upper_error = 0
+    with GateHops(hops_file) as table:
+        if list(table.system_ids) != system_ids:
+            print("Hop file systems do not match map_data.db; rebuild it.")
+            return 1
+        sources = [rng.randrange(len(system_ids)) for _ in range(max(1, samples // 50))] if system_ids else []
+        for source in sources:
+            truth = bfs_hops(gate_offsets, gate_targets, source)
+            reachable = list(truth)
+            for k in range(50):
+                # Half the targets share the source's component, half are drawn from the whole map
+                target = rng.choice(reachable) if k % 2 else rng.randrange(len(system_ids))
+                expected = truth.get(target)
+                a, b = system_ids[source], system_ids[target]
+                found = table.hops(a, b)
+                bounds = table.estimate(a, b)
+                if found != expected or (expected is None) != (bounds is None) or (
+                        bounds is not None and not bounds[0] <= expected <= bounds[1]):
+                    mismatches += 1
+                    print(f"Mismatch {a} -> {b}: BFS {expected}, hops {found}, estimate {bounds}")
+                elif bounds is not None:
+                    compared += 1
+                    exact_estimates += bounds[0] == bounds[1]
+                    lower_error += expected - bounds[0]
+                    upper_error += bounds[1] - expected
+            max_hops = rng.randrange(1, 6)
+            limited = {system_ids[node]: hops for node, hops in truth.items() if hops <= max_hops}
+            if table.within(system_ids[source], max_hops) != limited:
+                mismatches += 1
+                print(f"Mismatch in systems within {max_hops} jumps of {system_ids[source]}")
+
+    if compared:
+        print(f"Checked {compared} connected pairs: estimate exact for {exact_estimates / compared:.1%}, "
+              f"mean lower bound error {lower_error / compared:.2f}, "
+              f"mean upper bound error {upper_error / compared:.2f} jumps")
+    print("Gate hop validation passed." if not mismatches else f"Gate hop validation found {mismatches} mismatches.")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or validate the gate hop tables of map_data.db.")
+    parser.add_argument("--db", default="eve-frontier-map/public/map_data.db")
+    parser.add_argument("--output", default=HOPS_FILE)
+    parser.add_argument("--validate", type=int, metavar="SAMPLES", nargs="?", const=2000,
+                        help="Validate the existing hop file against BFS instead of building it")
+    args = parser.parse_args()
+    if args.validate is not None:
+        sys.exit(1 if validate_gate_hops(args.db, args.output, args.validate) else 0)
+    export_gate_hops(args.db, args.output)
@@ -1,70 +1,374 @@
-import requests
+import argparse
 import json
+import os
+import random
+import shutil
+import sys
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
 
 # Configuration
 BASE_URL = "https://world-api-stillness.live.tech.evefrontier.com/v2/solarsystems"
 LIMIT = 1000  # Number of items to request per page
-OUTPUT_FILE = "all_solarsystems.json"
+OUTPUT_FILE = "all_solarsystems.ndjson"
+DELTA_FILE = "all_solarsystems.delta.json"
+# Per-page validators (ETag / Last-Modified) and sizes of a synced snapshot, stored next to it
+SYNC_STATE_SUFFIX = ".sync.json"
+
+WORKERS = 4  # Pages fetched concurrently
+RATE = 2.0  # Requests per second across all workers
+RETRIES = 5  # Attempts per page after the first
+BACKOFF = 1.0  # Seconds before the first retry, doubled on each further retry
+MAX_BACKOFF = 30.0
+TIMEOUT = 30.0  # Seconds per request
+
+# Status codes worth retrying; any other HTTP error fails the page immediately
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class PageFetcher:
+    """
+    Fetches pages of the world API through per-thread pooled sessions, sharing
+    one rate limiter, and retries transient failures with exponential backoff.
+    """
 
-def fetch_all_solar_systems():
+    def __init__(self, base_url=BASE_URL, limit=LIMIT, workers=WORKERS, rate=RATE,
+                 retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT):
+        self.base_url = base_url
+        self.limit = limit
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, capacity=max(1, workers))
+        self._local = threading.local()
+
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers['accept'] = 'application/json'
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def fetch_page(self, offset):
+        """Returns the parsed JSON body of the page at `offset`."""
+        return self.request_page(offset).json()
+
+    def request_page(self, offset, headers=None):
+        """GETs the page at `offset`, with retries; returns the response (a 304 included)."""
+        params = {'limit': self.limit, 'offset': offset}
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            retry_after = None
+            try:
+                response = self.session().get(self.base_url, params=params, headers=headers, timeout=self.timeout)
+                if response.status_code in RETRY_STATUSES:
+                    retry_after = response.headers.get('Retry-After')
+                    raise requests.exceptions.HTTPError(f"{response.status_code} for offset {offset}",
+                                                        response=response)
+                response.raise_for_status()
+                if response.status_code != 304:
+                    response.json()  # A truncated body is retried like any transient failure
+                return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.HTTPError, ValueError) as e:
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                if (status is not None and status not in RETRY_STATUSES) or attempt == self.retries:
+                    raise
+                delay = min(MAX_BACKOFF, self.backoff * 2**attempt) * random.uniform(0.5, 1.0)
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                print(f"Offset {offset}: {e}; retrying in {delay:.1f}s ({attempt + 1}/{self.retries})")
+                time.sleep(delay)
+
+
+def page_file(checkpoint_dir, offset):
+    return os.path.join(checkpoint_dir, f"offset-{offset:08d}.ndjson")
+
+
+def save_page(checkpoint_dir, offset, systems):
+    """Writes one page as NDJSON, atomically, so a page file on disk is always complete."""
+    path = page_file(checkpoint_dir, offset)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        for system in systems:
+            f.write(json.dumps(system, ensure_ascii=False))
+            f.write('\n')
+    os.replace(path + '.tmp', path)
+
+
+def load_checkpoint(checkpoint_dir, limit):
+    """Returns {offset: system count} for the pages already saved by an earlier run."""
+    pages = {}
+    for name in os.listdir(checkpoint_dir):
+        if name.startswith('offset-') and name.endswith('.ndjson'):
+            offset = int(name[len('offset-'):-len('.ndjson')])
+            if offset % limit == 0:
+                with open(os.path.join(checkpoint_dir, name), 'rb') as f:
+                    pages[offset] = sum(1 for _ in f)
+    return pages
+
+
+def fetch_all_solar_systems(output_file=OUTPUT_FILE, fetcher=None, keep_checkpoint=False):
     """
-    Fetches all solar systems from the API using pagination and saves them to a JSON file.
+    Fetches all solar systems from the API and writes them to `output_file` as NDJSON,
+    one system per line.
+
+    Pages are fetched concurrently (see PageFetcher) and each page is saved to
+    the checkpoint directory `<output_file>.pages` as soon as it arrives. An
+    interrupted or failed run can simply be rerun: pages already on disk are
+    not fetched again. The end of the data is the first page shorter than the
+    page size (or the total reported in the response metadata, if any).
+    Returns the number of systems written, or None if some pages failed.
     """
-    all_systems = []
-    offset = 0
-    
+    fetcher = fetcher or PageFetcher()
+    limit = fetcher.limit
+    checkpoint_dir = output_file + '.pages'
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    pages = load_checkpoint(checkpoint_dir, limit)
+    if pages:
+        print(f"Resuming: {len(pages)} pages already fetched.")
+    # End offset: the first page known to be short (nothing exists at or past it)
+    end = min((offset for offset, count in pages.items() if count < limit), default=None)
+    failed = {}
+
     print("Starting to fetch solar systems...")
+    with ThreadPoolExecutor(max_workers=fetcher.workers) as executor:
+        in_flight = {}
+        next_offset = 0
+
+        def submit_more():
+            nonlocal next_offset
+            while len(in_flight) < fetcher.workers and (end is None or next_offset < end):
+                offset = next_offset
+                next_offset += limit
+                if offset not in pages:
+                    in_flight[executor.submit(fetcher.fetch_page, offset)] = offset
+
+        submit_more()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                offset = in_flight.pop(future)
+                try:
+                    data = future.result()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    print(f"An error occurred at offset {offset}: {e}")
+                    failed[offset] = e
+                    continue
+                systems = data.get('data', [])
+                save_page(checkpoint_dir, offset, systems)
+                pages[offset] = len(systems)
+                print(f"Fetched {len(systems)} systems at offset {offset}")
+                total = (data.get('metadata') or {}).get('total')
+                if len(systems) < limit:
+                    end = offset if end is None else min(end, offset)
+                if isinstance(total, int):
+                    total_end = -(-total // limit) * limit
+                    end = total_end if end is None else min(end, total_end)
+            # Stop early on failures; the saved pages are kept for the next run
+            if not failed:
+                submit_more()
+
+    if failed or end is None or any(offset not in pages for offset in range(0, end, limit)):
+        print(f"{len(failed)} pages failed; rerun to resume from the {len(pages)} pages saved in '{checkpoint_dir}'.")
+        return None
+
+    # Concatenate the pages in offset order into the final file
+    count = 0
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'wb') as out:
+        for offset in range(0, end + 1, limit):
+            path = page_file(checkpoint_dir, offset)
+            if offset in pages and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+                count += pages[offset]
+    os.replace(tmp_file, output_file)
+    if not keep_checkpoint:
+        shutil.rmtree(checkpoint_dir)
+
+    print(f"\nFinished fetching. Total solar systems found: {count}")
+    print(f"All solar systems have been successfully saved to '{output_file}'")
+    return count
+
+
+def read_snapshot_pages(snapshot_file, pages):
+    """Splits an NDJSON snapshot back into its pages, following the recorded page sizes."""
+    result = {}
+    with open(snapshot_file, 'r', encoding='utf-8') as f:
+        for page in pages:
+            result[page['offset']] = [json.loads(next(f)) for _ in range(page['count'])]
+    return result
+
+
+def diff_systems(old_systems, new_systems):
+    """
+    Per-system diff keyed by id: systems added (full records), removed (ids) and
+    changed, with {'old', 'new'} values for every field that differs.
+    """
+    old = {system['id']: system for system in old_systems}
+    new = {system['id']: system for system in new_systems}
+    changed = []
+    for system_id in sorted(new.keys() & old.keys()):
+        before, after = old[system_id], new[system_id]
+        if before != after:
+            fields = {field: {'old': before.get(field), 'new': after.get(field)}
+                      for field in sorted(before.keys() | after.keys()) if before.get(field) != after.get(field)}
+            changed.append({'id': system_id, 'fields': fields})
+    return {
+        'added': [new[system_id] for system_id in sorted(new.keys() - old.keys())],
+        'removed': sorted(old.keys() - new.keys()),
+        'changed': changed,
+    }
+
 
-    while True:
-        # Construct the full URL with query parameters
-        params = {'limit': LIMIT, 'offset': offset}
-        
-        try:
-            # Make the GET request
-            print(f"Fetching {LIMIT} systems with offset {offset}...")
-            response = requests.get(BASE_URL, params=params, headers={'accept': 'application/json'})
-            
-            # Check for a successful response
-            response.raise_for_status()  # This will raise an exception for HTTP error codes (4xx or 5xx)
-            
-            # Parse the JSON response
-            data = response.json()
-            
-            # Get the list of systems from the 'data' key
-            systems_on_page = data.get('data', [])
-            
-            # If the page is empty, we've reached the end
-            if not systems_on_page:
-                print("No more systems returned. Reached the end.")
-                break
-            
-            # Add the fetched systems to our main list
-            all_systems.extend(systems_on_page)
-            
-            # Prepare for the next page
-            offset += LIMIT
-            
-            # Be polite to the server and wait a moment before the next request
-            time.sleep(0.5)
-
-        except requests.exceptions.RequestException as e:
-            print(f"An error occurred: {e}")
-            break
-            
-    if all_systems:
-        print(f"\nFinished fetching. Total solar systems found: {len(all_systems)}")
-        
-        # Write the collated data to a single JSON file
-        try:
-            with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-                # The final file will be an array of solar system objects
-                json.dump(all_systems, f, indent=2, ensure_ascii=False)
-            print(f"All solar systems have been successfully saved to '{OUTPUT_FILE}'")
-        except IOError as e:
-            print(f"Could not write to file '{OUTPUT_FILE}': {e}")
+def sync_solar_systems(snapshot_file=OUTPUT_FILE, delta_file=DELTA_FILE, fetcher=None):
+    """
+    Refreshes the NDJSON snapshot written by an earlier sync and writes only what changed.
+
+    Every known page is re-requested conditionally (If-None-Match /
+    If-Modified-Since with the validators recorded for it). A 304 keeps the
+    page from the previous snapshot, so only pages the server reports as changed
+    are downloaded and diffed. Pages past the old end are fetched until a short
+    page. The per-system diff of the changed pages goes to `delta_file` (see
+    diff_systems); create_map_data --apply-delta applies it to map_data.db. The
+    snapshot itself is only rewritten when the content of some page changed.
+
+    The first sync (no state file yet) downloads every page and reports every
+    system as added. Returns the delta, or None if a request failed, in which
+    case nothing is written.
+    """
+    fetcher = fetcher or PageFetcher()
+    limit = fetcher.limit
+    state_file = snapshot_file + SYNC_STATE_SUFFIX
+    known = {}
+    if os.path.exists(state_file) and os.path.exists(snapshot_file):
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+        if state.get('limit') == limit:
+            known = {page['offset']: page for page in state['pages']}
+        else:
+            print("Page size differs from the previous sync; fetching everything again.")
+    old_pages = read_snapshot_pages(snapshot_file, known.values()) if known else {}
+
+    def fetch(offset):
+        page = known.get(offset, {})
+        headers = {}
+        if page.get('etag'):
+            headers['If-None-Match'] = page['etag']
+        if page.get('last_modified'):
+            headers['If-Modified-Since'] = page['last_modified']
+        response = fetcher.request_page(offset, headers)
+        if response.status_code == 304:
+            return None, page
+        systems = response.json().get('data', [])
+        return systems, {'offset': offset, 'count': len(systems),
+                         'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+
+    print("Syncing solar systems...")
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=fetcher.workers) as executor:
+            offsets = sorted(known) or [0]
+            for offset, result in zip(offsets, executor.map(fetch, offsets)):
+                results[offset] = result
+        # The data may have grown past the last known page
+        offset = max(results)
+        while results[offset][1]['count'] == limit:
+            offset += limit
+            results[offset] = fetch(offset)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"An error occurred: {e}. The previous snapshot is unchanged.")
+        return None
+
+    # Keep pages up to the first short one; anything past it has disappeared
+    offsets = sorted(results)
+    last = next((offset for offset in offsets if results[offset][1]['count'] < limit), offsets[-1])
+    pages = {offset: results[offset] for offset in offsets if offset <= last}
+    # A page counts as changed if it was downloaded (servers without validators always send it) and differs
+    changed = sorted(offset for offset, (systems, _) in results.items()
+                     if (systems is not None and systems != old_pages.get(offset)) or offset > last)
+    dropped = sorted(old_pages.keys() - results.keys())
+    print(f"{len(results)} pages checked, {len(changed)} changed.")
+
+    old_systems = [system for offset in changed + dropped for system in old_pages.get(offset, ())]
+    new_systems = [system for offset in changed if offset in pages for system in pages[offset][0]]
+    delta = diff_systems(old_systems, new_systems)
+    print(f"Delta: {len(delta['added'])} added, {len(delta['removed'])} removed, {len(delta['changed'])} changed.")
+
+    with open(delta_file, 'w', encoding='utf-8') as f:
+        json.dump(delta, f, ensure_ascii=False)
+    if changed or dropped:
+        tmp_file = snapshot_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for offset in sorted(pages):
+                systems = pages[offset][0]
+                for system in old_pages[offset] if systems is None else systems:
+                    f.write(json.dumps(system, ensure_ascii=False))
+                    f.write('\n')
+        os.replace(tmp_file, snapshot_file)
+    # Validators can change without the content changing, so the (small) state is always refreshed
+    with open(state_file, 'w') as f:
+        json.dump({'limit': limit, 'pages': [pages[offset][1] for offset in sorted(pages)]}, f)
+    print(f"Delta saved to '{delta_file}'")
+    return delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch every solar system from the world API as NDJSON.")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--limit", type=int, default=LIMIT, help="Systems per page")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Pages fetched concurrently")
+    parser.add_argument("--rate", type=float, default=RATE, help="Maximum requests per second")
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    parser.add_argument("--keep-checkpoint", action="store_true", help="Keep the per-page files after a full run")
+    parser.add_argument("--sync", action="store_true",
+                        help="Refresh the existing snapshot with conditional requests and write only the delta")
+    parser.add_argument("--delta", default=DELTA_FILE, help="Delta file written by --sync")
+    args = parser.parse_args()
+
+    fetcher = PageFetcher(args.base_url, args.limit, args.workers, args.rate, args.retries)
+    if args.sync:
+        result = sync_solar_systems(args.output, args.delta, fetcher)
     else:
-        print("No solar systems were fetched.")
+        result = fetch_all_solar_systems(args.output, fetcher, args.keep_checkpoint)
+    if result is None:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    fetch_all_solar_systems()
\ No newline at end of file
+    main()
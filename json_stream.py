@@ -0,0 +1,245 @@
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+# Characters read from the source file per refill.
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# An object key up to and including the colon, with the raw key text captured
+_MEMBER_KEY = re.compile(r'[ \t\n\r]*"((?:[^"\\]|\\.)*)"[ \t\n\r]*:[ \t\n\r]*')
+# The separator after an object member
+_SEPARATOR = re.compile(r'[ \t\n\r]*([,}])')
+# Inside a value being skipped: the next structural character or string opener
+_STRUCTURE = re.compile(r'[{}\[\]"]')
+# Inside a string being skipped: the next quote or escape
+_STRING_END = re.compile(r'["\\]')
+
+
+class _JsonReader:
+    """
+    Incremental reader over a JSON document whose top level is an object.
+
+    Only a window of the file is held in memory: consumed text is dropped from
+    the buffer, and values are decoded one at a time with raw_decode, refilling
+    the buffer whenever a value is cut off at its end.
+    """
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size=None):
+        """Appends the next chunk (at least `size` characters) to the buffer; returns False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.f.read(max(self.chunk_size, size or 0))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """Skips whitespace and returns the next character ('' at end of file)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r}")
+        self.pos += 1
+
+    def read_value(self):
+        """Decodes the next complete JSON value."""
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Leading whitespace, or a value cut off at the end of the buffer
+                start = _WHITESPACE.match(self.buffer, self.pos).end()
+                if start != self.pos:
+                    self.pos = start
+                # Double the pending text each time so a large value is re-parsed O(log n) times
+                elif not self._fill(len(self.buffer) - self.pos):
+                    raise
+                continue
+            # A number ending at (or an exponent/fraction marker short of) the end of
+            # the buffer may continue in the next chunk
+            if end + 2 >= len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip_value(self):
+        """Skips the next JSON value without decoding it."""
+        if self._peek() not in "{[":
+            self.read_value()
+            return
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self._fill():
+                    raise ValueError("Unexpected end of file inside a value")
+                continue
+            char = match.group()
+            self.pos = match.end()
+            if char == '"':
+                self._skip_string()
+            elif char in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _skip_string(self):
+        while True:
+            match = _STRING_END.search(self.buffer, self.pos)
+            if match is None or match.end() == len(self.buffer):
+                # Need the character after an escape (or the closing quote) in the buffer
+                if match is None:
+                    self.pos = len(self.buffer)
+                if not self._fill():
+                    raise ValueError("Unexpected end of file inside a string")
+                continue
+            if match.group() == '"':
+                self.pos = match.end()
+                return
+            self.pos = match.end() + 1
+
+    def members(self):
+        """
+        Yields the key of each member of the object starting at the current position,
+        leaving the reader positioned at that member's value. The caller must
+        consume (read, skip or iterate) the value before asking for the next key.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            match = _MEMBER_KEY.match(self.buffer, self.pos)
+            if match is None or match.end() == len(self.buffer):
+                if self._fill():
+                    continue
+                if match is None:
+                    raise ValueError(f"Expected an object key at {self.buffer[self.pos:self.pos + 20]!r}")
+            key = match.group(1)
+            if "\\" in key:
+                key = json.loads(f'"{key}"')
+            self.pos = match.end()
+            yield key
+            while True:
+                match = _SEPARATOR.match(self.buffer, self.pos)
+                if match is not None or not self._fill():
+                    break
+            if match is None:
+                raise ValueError(f"Expected ',' or '}}' at {self.buffer[self.pos:self.pos + 20]!r}")
+            self.pos = match.end()
+            if match.group(1) == "}":
+                return
+
+    def entries(self):
+        """Yields (key, value) for each member of the object at the current position."""
+        for key in self.members():
+            yield key, self.read_value()
+
+    def is_object_next(self):
+        return self._peek() == "{"
+
+
+def iter_json_object(path, key=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields (key, value) for each entry of a JSON object file, one entry at a time.
+
+    With `key`, streams the entries of that top-level member instead, skipping
+    the other members without decoding them.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _JsonReader(f, chunk_size)
+        if key is None:
+            yield from reader.entries()
+            return
+        for member in reader.members():
+            if member == key:
+                yield from reader.entries()
+                return
+            reader.skip_value()
+
+
+def iter_json_sections(path, chunk_size=CHUNK_SIZE):
+    """
+    Yields (key, value) for each top-level member of a JSON object file. Members
+    that are objects are yielded as an iterator of their (key, value) entries,
+    which must be exhausted before moving on; other members are decoded whole.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _JsonReader(f, chunk_size)
+        for member in reader.members():
+            if reader.is_object_next():
+                entries = reader.entries()
+                yield member, entries
+                for _ in entries:
+                    pass
+            else:
+                yield member, reader.read_value()
+
+
+def _measure(function):
+    """Returns (result, wall time, peak traced memory); the timed run is not traced."""
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def compare_ingest(paths=('stellar_systems.json', 'stellar_constellations.json', 'stellar_regions.json',
+                          'stellar_labels.json', 'labels.json')):
+    """
+    Compares json.load against streaming ingest on the given source files,
+    reporting wall time and peak traced memory for each.
+    """
+    print(f"{'file':32} {'size':>9} {'entries':>8} {'load s':>8} {'load peak':>10} {'stream s':>9} {'stream peak':>12}")
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+
+        def load_all():
+            with open(path, 'r') as f:
+                return sum(1 for _ in json.load(f).items())
+
+        def stream_all():
+            return sum(1 for _ in iter_json_object(path))
+
+        count, load_time, load_peak = _measure(load_all)
+        streamed, stream_time, stream_peak = _measure(stream_all)
+        assert count == streamed, f"{path}: {count} entries loaded but {streamed} streamed"
+        print(f"{path:32} {os.path.getsize(path) / 1e6:8.1f}M {count:8} {load_time:8.3f} "
+              f"{load_peak / 1e6:9.1f}M {stream_time:9.3f} {stream_peak / 1e6:11.2f}M")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        compare_ingest(sys.argv[1:])
+    else:
+        compare_ingest()
@@ -0,0 +1,125 @@
+import sqlite3
+import struct
+from array import array
+
+from sectioned_file import SectionedFile, gate_csr, pack_sections
+
+# Sidecar file written next to map_data.db
+BUNDLE_FILE = "eve-frontier-map/public/map_bundle.bin"
+
+BUNDLE_MAGIC = b"EFMB"
+BUNDLE_VERSION = 1
+# magic, version, system count, gate target count, region count, constellation count, name bytes
+_HEADER = struct.Struct("<4sIIIIII")
+
+
+def _sections(systems, gate_targets, regions, constellations, name_bytes):
+    """
+    The sections of a bundle, in file order, as (name, typecode, count).
+    All values are little-endian; systems are sorted by id and referred to by
+    their index in that order.
+    """
+    return (
+        ('positions', 'f', systems * 3),           # x, y, z per system (ly, Y-up), interleaved
+        ('system_ids', 'I', systems),
+        ('region_index', 'H', systems),            # index into region_ids
+        ('constellation_index', 'H', systems),     # index into constellation_ids
+        ('hidden', 'B', systems),
+        ('gate_offsets', 'I', systems + 1),        # CSR: neighbours of i are gate_targets[offsets[i]:offsets[i + 1]]
+        ('gate_targets', 'I', gate_targets),
+        ('region_ids', 'I', regions),
+        ('constellation_ids', 'I', constellations),
+        ('name_offsets', 'I', systems + 1),        # name of i is names[offsets[i]:offsets[i + 1]], UTF-8
+        ('names', 'B', name_bytes),
+    )
+
+
+def build_map_bundle(db_file):
+    """Reads map_data.db and returns the bundle as bytes."""
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, name, region_id, constellation_id, position_x, position_y, position_z, hidden
+        FROM systems ORDER BY CAST(id AS INTEGER)
+    """)
+    systems = cursor.fetchall()
+    cursor.execute("SELECT source_system_id, destination_system_id FROM stargates")
+    gates = cursor.fetchall()
+    conn.close()
+
+    region_ids = sorted({int(row[2]) for row in systems})
+    constellation_ids = sorted({int(row[3]) for row in systems})
+    if max(len(region_ids), len(constellation_ids)) > 0xFFFF:
+        raise ValueError("Too many regions or constellations for 16-bit membership columns")
+    region_of = {region_id: i for i, region_id in enumerate(region_ids)}
+    constellation_of = {constellation_id: i for i, constellation_id in enumerate(constellation_ids)}
+    index_of = {int(row[0]): i for i, row in enumerate(systems)}
+
+    columns = {
+        'positions': array('f', (value for row in systems for value in row[4:7])),
+        'system_ids': array('I', (int(row[0]) for row in systems)),
+        'region_index': array('H', (region_of[int(row[2])] for row in systems)),
+        'constellation_index': array('H', (constellation_of[int(row[3])] for row in systems)),
+        'hidden': array('B', (1 if row[7] else 0 for row in systems)),
+        'region_ids': array('I', region_ids),
+        'constellation_ids': array('I', constellation_ids),
+    }
+    # Gates in both directions, without duplicates or gates to unknown systems
+    columns['gate_offsets'], columns['gate_targets'] = gate_csr(index_of, gates)
+
+    encoded = [(row[1] or '').encode('utf-8') for row in systems]
+    columns['names'] = array('B', b''.join(encoded))
+    columns['name_offsets'] = array('I', [0])
+    for name in encoded:
+        columns['name_offsets'].append(columns['name_offsets'][-1] + len(name))
+
+    counts = (len(systems), len(columns['gate_targets']), len(region_ids), len(constellation_ids),
+              len(columns['names']))
+    return pack_sections(_HEADER, (BUNDLE_MAGIC, BUNDLE_VERSION, *counts), _sections(*counts), columns)
+
+
+def export_map_bundle(db_file="eve-frontier-map/public/map_data.db", bundle_file=BUNDLE_FILE):
+    """Writes the binary map bundle for map_data.db to its sidecar file."""
+    print("Exporting binary map bundle...")
+    data = build_map_bundle(db_file)
+    with open(bundle_file, 'wb') as f:
+        f.write(data)
+    systems, gate_targets = _HEADER.unpack_from(data)[2:4]
+    print(f"Map bundle with {systems} systems and {gate_targets // 2} gate links "
+          f"({len(data) / 1e6:.2f} MB) saved to {bundle_file}")
+
+
+class MapBundle(SectionedFile):
+    """
+    Read-only view of a map bundle, memory-mapped with every section exposed
+    as a typed memoryview (see SectionedFile).
+    """
+
+    HEADER = _HEADER
+    MAGIC = BUNDLE_MAGIC
+    VERSION = BUNDLE_VERSION
+    KIND = "map bundle"
+    sections = staticmethod(_sections)
+
+    def __init__(self, path=BUNDLE_FILE):
+        super().__init__(path)
+
+    def position(self, i):
+        positions = self.positions
+        return positions[3 * i], positions[3 * i + 1], positions[3 * i + 2]
+
+    def name(self, i):
+        return bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]]).decode('utf-8')
+
+    def region_id(self, i):
+        return self.region_ids[self.region_index[i]]
+
+    def constellation_id(self, i):
+        return self.constellation_ids[self.constellation_index[i]]
+
+    def gate_neighbours(self, i):
+        return self.gate_targets[self.gate_offsets[i]:self.gate_offsets[i + 1]]
+
+
+if __name__ == "__main__":
+    export_map_bundle()
@@ -0,0 +1,245 @@
+import json
+import math
+import os
+import shutil
+import sqlite3
+
+# Output directory, next to map_data.db
+TILES_DIR = "eve-frontier-map/public/tiles"
+TILES_VERSION = 2
+
+# A node with more systems than this (still unassigned after its ancestors) is split into octants.
+MAX_TILE_SYSTEMS = 1024
+MAX_DEPTH = 8
+# Representative subset of an inner node: one system per occupied cell of a
+# SAMPLE_GRID^3 grid over the node, so the subset is spread evenly through it.
+SAMPLE_GRID = 6
+# Constellation labels live in the node at this depth (or shallower) containing their centre.
+CONSTELLATION_LABEL_DEPTH = 2
+# A tile is meant to be loaded once it spans about this many screen pixels, i.e. from zoom
+# log2(TILE_VIEW_PX / tile size in ly), with zoom levels as in process_labels.
+TILE_VIEW_PX = 1024
+# Decimal places kept for positions (ly) in tile files.
+POSITION_DECIMALS = 3
+
+
+class OctreeNode:
+    def __init__(self, key, low, size):
+        self.key = key  # "" for the root, then one octant digit (0-7) per level
+        self.low = low
+        self.size = size
+        self.systems = []  # indices of the systems stored in this tile
+        self.labels = []
+        self.gates = []
+        self.children = {}
+
+    @property
+    def depth(self):
+        return len(self.key)
+
+    def octant(self, point):
+        half = self.size / 2
+        return sum(1 << axis for axis in range(3) if point[axis] >= self.low[axis] + half)
+
+    def child(self, octant):
+        node = self.children.get(octant)
+        if node is None:
+            half = self.size / 2
+            low = tuple(self.low[axis] + (half if octant >> axis & 1 else 0) for axis in range(3))
+            node = self.children[octant] = OctreeNode(self.key + str(octant), low, half)
+        return node
+
+    def walk(self):
+        yield self
+        for octant in sorted(self.children):
+            yield from self.children[octant].walk()
+
+
+def sample_systems(node, members, positions):
+    """Picks the system closest to the centre of each occupied SAMPLE_GRID cell of the node."""
+    cell = node.size / SAMPLE_GRID
+    best = {}
+    for i in members:
+        point = positions[i]
+        coords = tuple(min(int((point[axis] - node.low[axis]) // cell), SAMPLE_GRID - 1) for axis in range(3))
+        centre = tuple(node.low[axis] + (coords[axis] + 0.5) * cell for axis in range(3))
+        d2 = sum((point[axis] - centre[axis]) ** 2 for axis in range(3))
+        if coords not in best or (d2, i) < best[coords]:
+            best[coords] = (d2, i)
+    return sorted(i for _, i in best.values())
+
+
+def build_octree(positions, max_tile_systems=MAX_TILE_SYSTEMS, max_depth=MAX_DEPTH):
+    """
+    Builds an additive LOD octree over system positions and returns (root, node_of).
+
+    Each inner node keeps a representative subset of the systems inside it and
+    passes the rest down to its octants; a leaf keeps everything left. Loading
+    a node and all its ancestors therefore gives every system of that region
+    of space at that level of detail, and no system is stored twice.
+    node_of[i] is the node holding system i.
+    """
+    lows = [min(p[axis] for p in positions) for axis in range(3)] if positions else [0.0] * 3
+    highs = [max(p[axis] for p in positions) for axis in range(3)] if positions else [0.0] * 3
+    size = max(max(h - l for l, h in zip(lows, highs)), 1e-9) * (1 + 1e-9)
+    root = OctreeNode("", tuple(lows), size)
+    node_of = [None] * len(positions)
+
+    pending = [(root, list(range(len(positions))))]
+    while pending:
+        node, members = pending.pop()
+        if len(members) <= max_tile_systems or node.depth >= max_depth:
+            node.systems = members
+        else:
+            node.systems = sample_systems(node, members, positions)
+            kept = set(node.systems)
+            octants = {}
+            for i in members:
+                if i not in kept:
+                    octants.setdefault(node.octant(positions[i]), []).append(i)
+            pending.extend((node.child(octant), rest) for octant, rest in octants.items())
+        for i in node.systems:
+            node_of[i] = node
+    return root, node_of
+
+
+def locate(root, point, max_depth):
+    """Returns the deepest existing node, at most `max_depth` deep, containing `point`."""
+    node = root
+    while node.depth < max_depth:
+        child = node.children.get(node.octant(point))
+        if child is None:
+            break
+        node = child
+    return node
+
+
+def tile_zoom(root, depth):
+    """Zoom from which the tiles `depth` levels below `root` are loaded (see TILE_VIEW_PX)."""
+    return math.log2(TILE_VIEW_PX * 2 ** depth / root.size)
+
+
+def label_depth(root, min_zoom):
+    """Deepest tile level already loaded at a label's min_zoom (0 for labels without one)."""
+    if min_zoom is None:
+        return 0
+    return max(0, math.floor(min_zoom - tile_zoom(root, 0)))
+
+
+def export_tiles(db_file="eve-frontier-map/public/map_data.db", tiles_dir=TILES_DIR,
+                 max_tile_systems=MAX_TILE_SYSTEMS, max_depth=MAX_DEPTH):
+    """
+    Writes an octree-tiled, level-of-detail copy of the visible map to `tiles_dir`.
+
+    Every tile file holds its systems (ids, names, interleaved positions), the
+    gates owned by the tile and the labels placed in it. A gate belongs to the
+    deeper tile of its two ends, so it arrives with the second of its systems.
+    Labels carry a position: system labels sit on their system, constellation
+    and region labels on the centre of their systems. Each label goes in the
+    tile containing its position at the deepest level already loaded at its
+    min_zoom (see label_depth), so coarse tiles only carry the labels shown at
+    their zoom; system labels go no shallower than their system's tile,
+    constellation labels no deeper than CONSTELLATION_LABEL_DEPTH and region
+    labels always in the root. manifest.json lists every tile with its
+    bounding box, depth, zoom, counts and children, so a client can fetch
+    only tiles in view at its zoom level.
+    """
+    print("Exporting octree tiles...")
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, name, constellation_id, region_id, position_x, position_y, position_z
+        FROM systems WHERE hidden = 0 ORDER BY CAST(id AS INTEGER)
+    """)
+    systems = cursor.fetchall()
+    cursor.execute("SELECT source_system_id, destination_system_id FROM stargates")
+    gates = cursor.fetchall()
+    labels = []
+    for table_name in ('region_labels', 'labels'):
+        cursor.execute(f"SELECT id, text, type, font_size, show_on_zoom, min_zoom FROM {table_name}")
+        labels.extend(cursor.fetchall())
+    conn.close()
+
+    positions = [tuple(row[4:7]) for row in systems]
+    root, node_of = build_octree(positions, max_tile_systems, max_depth)
+    index_of = {str(row[0]): i for i, row in enumerate(systems)}
+
+    links = set()
+    for source, destination in gates:
+        a, b = index_of.get(str(source)), index_of.get(str(destination))
+        if a is not None and b is not None and a != b:
+            links.add((min(a, b), max(a, b)))
+    for a, b in sorted(links):
+        owner = max(node_of[a], node_of[b], key=lambda node: (node.depth, node.key))
+        owner.gates.append((int(systems[a][0]), int(systems[b][0])))
+
+    # Label anchors: system positions, and the centres of constellations and regions
+    groups = {}
+    for row, position in zip(systems, positions):
+        for group in (('constellation', str(row[2])), ('region', str(row[3]))):
+            sums = groups.setdefault(group, [0.0, 0.0, 0.0, 0])
+            for axis in range(3):
+                sums[axis] += position[axis]
+            sums[3] += 1
+    centres = {group: tuple(total / sums[3] for total in sums[:3]) for group, sums in groups.items()}
+    for label_id, text, label_type, font_size, show_on_zoom, min_zoom in labels:
+        label_id = str(label_id)
+        if label_type == 'system':
+            if label_id not in index_of:
+                continue
+            position = positions[index_of[label_id]]
+            node = locate(root, position, max(node_of[index_of[label_id]].depth, label_depth(root, min_zoom)))
+        elif label_type == 'constellation':
+            position = centres.get(('constellation', label_id))
+            if position is None:
+                continue
+            node = locate(root, position, min(label_depth(root, min_zoom), CONSTELLATION_LABEL_DEPTH))
+        else:
+            position, node = centres.get(('region', label_id)), root
+        node.labels.append({
+            'id': label_id, 'text': text, 'type': label_type,
+            'position': [round(value, POSITION_DECIMALS) for value in position] if position else None,
+            'font_size': font_size, 'show_on_zoom': show_on_zoom, 'min_zoom': min_zoom,
+        })
+
+    if os.path.exists(tiles_dir):
+        shutil.rmtree(tiles_dir)
+    os.makedirs(tiles_dir)
+    manifest_tiles = []
+    total_bytes = 0
+    for node in root.walk():
+        members = node.systems
+        tile = {
+            'ids': [int(systems[i][0]) for i in members],
+            'names': [systems[i][1] for i in members],
+            'positions': [round(value, POSITION_DECIMALS) for i in members for value in positions[i]],
+            'gates': sorted(node.gates),
+            'labels': node.labels,
+        }
+        file_name = f"t{node.key}.json"
+        with open(os.path.join(tiles_dir, file_name), 'w', encoding='utf-8') as f:
+            json.dump(tile, f, ensure_ascii=False, separators=(',', ':'))
+            total_bytes += f.tell()
+        manifest_tiles.append({
+            'key': node.key,
+            'file': file_name,
+            'depth': node.depth,
+            'zoom': round(tile_zoom(root, node.depth), 3),
+            'bounds': [list(node.low), [value + node.size for value in node.low]],
+            'systems': len(members),
+            'gates': len(node.gates),
+            'labels': len(node.labels),
+            'children': [child.key for _, child in sorted(node.children.items())],
+        })
+
+    with open(os.path.join(tiles_dir, "manifest.json"), 'w') as f:
+        json.dump({'version': TILES_VERSION, 'max_tile_systems': max_tile_systems, 'tile_view_px': TILE_VIEW_PX,
+                   'tiles': manifest_tiles}, f, separators=(',', ':'))
+    root_tile = manifest_tiles[0]
+    print(f"Wrote {len(manifest_tiles)} tiles ({total_bytes / 1e6:.2f} MB, root tile "
+          f"{root_tile['systems']} systems) to {tiles_dir}")
+    return manifest_tiles
+
+
+if __name__ == "__main__":
+    export_tiles()
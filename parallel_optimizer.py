@@ -0,0 +1,170 @@
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# optimizer_core is served to the browser from the frontend's public folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "eve-frontier-map", "public"))
+import optimizer_core  # noqa: E402
+
+DB_FILE = os.path.join("eve-frontier-map", "public", "map_data.db")
+
+# Per-process state, set up once by _init_worker
+_worker_shm = None
+_worker_store = None
+
+
+def _init_worker(shm_name, size, matrix_max_systems):
+    """Attaches to the shared coordinate block and builds this worker's CoordStore once."""
+    global _worker_shm, _worker_store
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    coords = _worker_shm.buf.cast('d')
+    xs, ys, zs = coords[:size], coords[size:2 * size], coords[2 * size:3 * size]
+    _worker_store = optimizer_core.CoordStore(list(range(size)), xs, ys, zs, matrix_max_systems)
+
+
+def _run_chain_pass(tour, time_per_pass, seed):
+    """Advances one annealing chain by a single pass."""
+    rng = random.Random(seed)
+    start = time.time()
+    path, distance = optimizer_core.anneal_path(_worker_store, tour, time_per_pass, rng)
+    return path, distance, time.time() - start
+
+
+def run_parallel_annealing(systems_data, start_system, path=None, chains=None, passes=10,
+                           time_per_pass=1.0, exchange_every=2, seed=None, matrix_max_systems=None):
+    """
+    Runs independent simulated annealing chains across a process pool.
+
+    The coordinates are written once into shared memory which every worker
+    attaches to, so a pass only ships the chain's tour to and from the worker.
+    The champion (shortest tour over all chains) is tracked every pass, and
+    every `exchange_every` passes each chain restarts from it.
+
+    systems_data maps system name -> {'x', 'y', 'z'}. Returns the champion path
+    and distance plus per-chain and per-pass stats.
+    """
+    chains = chains or os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(2**32)
+    store = optimizer_core.build_coord_store(list(systems_data), systems_data, matrix_max_systems=0)
+    size = store.size
+
+    if path is None:
+        tour = optimizer_core.build_baseline_path(store, store.index[start_system])
+    else:
+        tour = store.to_indices(path)
+    champion, champion_dist = tour, store.path_length(tour)
+    print(f"Starting {chains} chains on {size} systems, initial distance {champion_dist:.2f}")
+
+    chain_stats = [
+        {'chain': c, 'best_distance': champion_dist, 'passes_won': 0, 'improvements': 0, 'time': 0.0}
+        for c in range(chains)
+    ]
+    pass_stats = []
+    tours = [tour] * chains
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 3 * size * 8))
+    try:
+        coords = shm.buf.cast('d')
+        coords[:size] = store.xs
+        coords[size:2 * size] = store.ys
+        coords[2 * size:3 * size] = store.zs
+        coords.release()
+
+        with ProcessPoolExecutor(max_workers=chains, initializer=_init_worker,
+                                 initargs=(shm.name, size, matrix_max_systems)) as executor:
+            for pass_index in range(passes):
+                futures = [
+                    executor.submit(_run_chain_pass, tours[c], time_per_pass, seed + pass_index * chains + c)
+                    for c in range(chains)
+                ]
+                results = [future.result() for future in futures]
+
+                winner = min(range(chains), key=lambda c: results[c][1])
+                for c, (chain_tour, chain_dist, elapsed) in enumerate(results):
+                    stats = chain_stats[c]
+                    stats['time'] += elapsed
+                    if chain_dist < stats['best_distance']:
+                        stats['best_distance'] = chain_dist
+                        stats['improvements'] += 1
+                    tours[c] = chain_tour
+                chain_stats[winner]['passes_won'] += 1
+
+                if results[winner][1] < champion_dist:
+                    champion, champion_dist = results[winner][0], results[winner][1]
+                pass_stats.append({'pass': pass_index, 'winner': winner, 'pass_best': results[winner][1],
+                                   'champion': champion_dist})
+                print(f"Pass {pass_index + 1}/{passes}: chain {winner} best {results[winner][1]:.2f}, "
+                      f"champion {champion_dist:.2f}")
+
+                # Exchange: every chain continues from the champion tour
+                if exchange_every and (pass_index + 1) % exchange_every == 0:
+                    tours = [champion] * chains
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return {
+        'path': store.to_names(champion),
+        'distance': champion_dist,
+        'seed': seed,
+        'chains': chain_stats,
+        'passes': pass_stats,
+    }
+
+
+def load_systems(db_file, region_id=None, start_system=None, radius=None):
+    """
+    Loads visible system positions (in ly) from map_data.db, keyed by system name.
+    Selects either a whole region or a bubble of `radius` ly around `start_system`.
+    """
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, region_id, position_x, position_y, position_z FROM systems WHERE hidden = 0")
+    rows = cursor.fetchall()
+    conn.close()
+
+    systems = {name: {'x': x, 'y': y, 'z': z} for name, row_region, x, y, z in rows
+               if region_id is None or str(row_region) == str(region_id)}
+    if radius is not None:
+        origin = systems[start_system]
+        systems = {name: p for name, p in systems.items()
+                   if math.dist((p['x'], p['y'], p['z']), (origin['x'], origin['y'], origin['z'])) <= radius}
+    return systems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-core simulated annealing for large bubble and region routes.")
+    parser.add_argument("start", help="Name of the start system")
+    parser.add_argument("--radius", type=float, help="Bubble radius in light-years")
+    parser.add_argument("--region", help="Route every visible system of this region id")
+    parser.add_argument("--chains", type=int, default=None, help="Number of chains (default: CPU count)")
+    parser.add_argument("--passes", type=int, default=10)
+    parser.add_argument("--time-per-pass", type=float, default=1.0)
+    parser.add_argument("--exchange-every", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--output", help="Write the result as JSON to this file")
+    args = parser.parse_args()
+
+    systems = load_systems(args.db, region_id=args.region, start_system=args.start, radius=args.radius)
+    result = run_parallel_annealing(systems, args.start, chains=args.chains, passes=args.passes,
+                                    time_per_pass=args.time_per_pass, exchange_every=args.exchange_every,
+                                    seed=args.seed)
+    print(f"Champion route: {len(result['path'])} systems, {result['distance']:.2f} ly")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f)
+        print(f"Result saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,121 @@
 import json
+import math
+import os
+
+from json_stream import iter_json_object
+
+# Meters per light-year (stellar_systems.json centres are in meters)
+SCALE_FACTOR = 9_460_730_472_580_800
+
+# Zoom levels are log2(screen pixels per light-year), measured on the top-down
+# (x, y) projection of the galactic plane. min_zoom is clamped to this range:
+# MIN_ZOOM means "always shown", MAX_ZOOM "only shown fully zoomed in".
+MIN_ZOOM = -8.0
+MAX_ZOOM = 8.0
+ZOOM_DECIMALS = 3
+
+# Approximate on-screen label box (pixels) at DEFAULT_FONT_SIZE
+CHAR_WIDTH_PX = 7
+LINE_HEIGHT_PX = 14
+LABEL_PADDING_PX = 4
+DEFAULT_FONT_SIZE = 12
+
+# Labels win collisions in this order, then larger font, then id
+LABEL_PRIORITY = {'region': 0, 'constellation': 1, 'system': 2}
+
+def label_anchors(labels, systems_file='stellar_systems.json'):
+    """
+    Returns {label_id: (x, y)} in ly for the labels that can be placed: system
+    labels on their system, constellation and region labels on the mean
+    position of their systems.
+    """
+    systems = {}
+    groups = {}
+    for system_id, system_data in iter_json_object(systems_file):
+        center = system_data.get('center')
+        if not center:
+            continue
+        point = (center[0] / SCALE_FACTOR, center[1] / SCALE_FACTOR)
+        systems[system_id] = point
+        for group in (('constellation', str(system_data.get('constellationId'))),
+                      ('region', str(system_data.get('regionId')))):
+            sums = groups.setdefault(group, [0.0, 0.0, 0])
+            sums[0] += point[0]
+            sums[1] += point[1]
+            sums[2] += 1
+
+    anchors = {}
+    for label_id, label in labels.items():
+        if label['type'] == 'system':
+            point = systems.get(label_id)
+        else:
+            sums = groups.get((label['type'], label_id))
+            point = (sums[0] / sums[2], sums[1] / sums[2]) if sums else None
+        if point is not None:
+            anchors[label_id] = point
+    return anchors
+
+def label_box(label):
+    """Half width and half height (pixels) of a label's screen box, padding included."""
+    scale = (label.get('font_size') or DEFAULT_FONT_SIZE) / DEFAULT_FONT_SIZE
+    text = label.get('text') if isinstance(label.get('text'), str) else ''
+    return ((len(text) * CHAR_WIDTH_PX * scale + LABEL_PADDING_PX) / 2,
+            (LINE_HEIGHT_PX * scale + LABEL_PADDING_PX) / 2)
+
+def compute_min_zooms(labels, anchors):
+    """
+    Returns {label_id: min_zoom}: the lowest zoom at which each label shows
+    without overlapping a label of higher priority (LABEL_PRIORITY) that is
+    itself shown at that zoom.
+
+    Labels are placed in priority order. Two boxes separated by (dx, dy) ly
+    stop overlapping once zoomed in to log2(min(w / |dx|, h / |dy|)), so a
+    placed neighbour already shown below that zoom raises the label's
+    min_zoom to it. Placed labels are kept in one grid per integer level of
+    their min_zoom, with cells the size of the largest box at that level, so
+    only the 3x3 cells around a label can hold a blocking neighbour.
+    Labels without an anchor are not placed and get MIN_ZOOM.
+    """
+    boxes = {label_id: label_box(labels[label_id]) for label_id in anchors}
+    max_width = max((box[0] for box in boxes.values()), default=0.0) * 2
+    max_height = max((box[1] for box in boxes.values()), default=0.0) * 2
+    levels = range(math.floor(MIN_ZOOM), math.ceil(MAX_ZOOM) + 1)
+    cell_sizes = {level: (max_width / 2 ** level, max_height / 2 ** level) for level in levels}
+    grids = {level: {} for level in levels}
+
+    def priority(label_id):
+        label = labels[label_id]
+        return (LABEL_PRIORITY.get(label['type'], len(LABEL_PRIORITY)), -(label.get('font_size') or 0), label_id)
+
+    min_zooms = {label_id: MIN_ZOOM for label_id in labels}
+    for label_id in sorted(anchors, key=priority):
+        x, y = anchors[label_id]
+        half_w, half_h = boxes[label_id]
+        zoom = MIN_ZOOM
+        for level, grid in grids.items():
+            if not grid:
+                continue
+            width, height = cell_sizes[level]
+            cx, cy = math.floor(x / width), math.floor(y / height)
+            for gx in (cx - 1, cx, cx + 1):
+                for gy in (cy - 1, cy, cy + 1):
+                    for other_x, other_y, other_w, other_h, other_zoom in grid.get((gx, gy), ()):
+                        dx, dy = abs(x - other_x), abs(y - other_y)
+                        scale = min((half_w + other_w) / dx if dx else math.inf,
+                                     (half_h + other_h) / dy if dy else math.inf)
+                        clear_zoom = math.log2(scale) if scale < math.inf else math.inf
+                        if clear_zoom > max(other_zoom, zoom):
+                            zoom = clear_zoom
+        zoom = min(zoom, MAX_ZOOM)
+        min_zooms[label_id] = round(zoom, ZOOM_DECIMALS)
+
+        # A label only shown at MAX_ZOOM cannot push another label any further
+        if zoom < MAX_ZOOM:
+            level = math.floor(zoom)
+            width, height = cell_sizes[level]
+            grids[level].setdefault((math.floor(x / width), math.floor(y / height)), []).append(
+                (x, y, half_w, half_h, zoom))
+    return min_zooms
 
 def process_labels():
     """
@@ -48,6 +165,17 @@ def process_labels():
                 'type': 'region'
             }
 
+    # Declutter levels: the zoom from which each label can be drawn
+    if os.path.exists('stellar_systems.json'):
+        print("Computing label declutter levels...")
+        min_zooms = compute_min_zooms(labels, label_anchors(labels))
+        for label_id, min_zoom in min_zooms.items():
+            labels[label_id]['min_zoom'] = min_zoom
+        always_shown = sum(1 for min_zoom in min_zooms.values() if min_zoom <= MIN_ZOOM)
+        print(f"{always_shown} of {len(labels)} labels are shown at every zoom level")
+    else:
+        print("stellar_systems.json not found; skipping label declutter levels.")
+
     # Save the new labels file
     with open('labels.json', 'w') as f:
         json.dump(labels, f, indent=2)
@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# optimizer_core is served to the browser from the frontend's public folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "eve-frontier-map", "public"))
+import optimizer_core  # noqa: E402
+
+DB_FILE = os.path.join("eve-frontier-map", "public", "map_data.db")
+
+# Below this many systems the constellation sub-tours are solved in-process;
+# forking workers costs more than it saves.
+PARALLEL_MIN_SYSTEMS = 2000
+
+
+def load_regions(db_file, region_ids):
+    """
+    Loads the visible systems of the given regions from map_data.db as
+    ({name: {'x', 'y', 'z'}}, {name: constellation id}).
+    """
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT name, region_id, constellation_id, position_x, position_y, position_z
+        FROM systems WHERE hidden = 0 ORDER BY CAST(id AS INTEGER)
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+
+    wanted = {str(region_id) for region_id in region_ids}
+    systems, constellation_of = {}, {}
+    for name, region_id, constellation_id, x, y, z in rows:
+        if str(region_id) in wanted:
+            systems[name] = {'x': x, 'y': y, 'z': z}
+            constellation_of[name] = str(constellation_id)
+    return systems, constellation_of
+
+
+def _store_from_points(points):
+    xs = array('d', (p[0] for p in points))
+    ys = array('d', (p[1] for p in points))
+    zs = array('d', (p[2] for p in points))
+    return optimizer_core.CoordStore(list(range(len(points))), xs, ys, zs)
+
+
+def _improve_cycle(store, tour):
+    """
+    2-opt and Or-opt over a closed tour, including the edge from its last
+    node back to its first. Every pair of edges and every re-insertion is
+    tried, so this is meant for constellation-sized tours.
+    """
+    dist = store.dist
+    tour = list(tour)
+    m = len(tour)
+    eps = 1e-9 * sum(dist(tour[k], tour[(k + 1) % m]) for k in range(m)) / m
+    improved = True
+    while improved:
+        improved = False
+        # 2-opt: replace edges (a, b) and (c, d) with (a, c) and (b, d)
+        for i in range(m - 2):
+            for j in range(i + 2, m if i else m - 1):
+                a, b, c, d = tour[i], tour[i + 1], tour[j], tour[(j + 1) % m]
+                if dist(a, c) + dist(b, d) - dist(a, b) - dist(c, d) < -eps:
+                    tour[i + 1:j + 1] = tour[j:i:-1]
+                    improved = True
+        # Or-opt: move a run of up to OR_OPT_MAX_SEGMENT nodes between two others, either way round
+        for seg_len in range(1, min(optimizer_core.OR_OPT_MAX_SEGMENT, m - 3) + 1):
+            s = 0
+            while s < m:
+                segment = [tour[(s + k) % m] for k in range(seg_len)]
+                prev, nxt = tour[s - 1], tour[(s + seg_len) % m]
+                gain = dist(prev, segment[0]) + dist(segment[-1], nxt) - dist(prev, nxt)
+                rest = [tour[(s + seg_len + k) % m] for k in range(m - seg_len)]
+                best = None
+                for q in range(len(rest) - 1):
+                    u, w = rest[q], rest[q + 1]
+                    for flipped in (False, True):
+                        first, last = (segment[-1], segment[0]) if flipped else (segment[0], segment[-1])
+                        delta = dist(u, first) + dist(last, w) - dist(u, w) - gain
+                        if delta < -eps and (best is None or delta < best[0]):
+                            best = (delta, q, flipped)
+                if best is not None:
+                    _, q, flipped = best
+                    tour = rest[:q + 1] + (segment[::-1] if flipped else segment) + rest[q + 1:]
+                    improved = True
+                s += 1
+    return tour
+
+
+def _solve_cycle(points):
+    """
+    Returns a short closed tour over `points` as a list of their indices: a
+    nearest-neighbour/2-opt path from the first point, then improved as a
+    cycle (see _improve_cycle), since stitch may cut it at any edge.
+    """
+    if len(points) < 4:
+        return list(range(len(points)))
+    store = _store_from_points(points)
+    return _improve_cycle(store, optimizer_core.build_baseline_path(store, 0))
+
+
+def constellation_order(groups, store, start):
+    """Orders the constellations by an open tour over their centres, from the start system's constellation."""
+    keys = list(groups)
+    centres = []
+    for key in keys:
+        members = groups[key]
+        centres.append(tuple(sum(axis[i] for i in members) / len(members) for axis in (store.xs, store.ys, store.zs)))
+    first = next(k for k, key in enumerate(keys) if start in groups[key])
+    order = optimizer_core.build_baseline_path(_store_from_points(centres), first)
+    return [keys[k] for k in order]
+
+
+def _cut_options(cycle, dist):
+    """
+    Every way to open a closed sub-tour into a path: (entry, exit, path, length),
+    cutting each edge of the cycle in both directions.
+    """
+    m = len(cycle)
+    if m == 1:
+        return [(cycle[0], cycle[0], cycle, 0.0)]
+    cycle_length = sum(dist(cycle[k], cycle[(k + 1) % m]) for k in range(m))
+    options = []
+    for k in range(m if m > 2 else 1):
+        a, b = cycle[k], cycle[(k + 1) % m]
+        length = cycle_length - dist(a, b)
+        forward = cycle[k + 1:] + cycle[:k + 1]  # b ... a
+        options.append((b, a, forward, length))
+        options.append((a, b, forward[::-1], length))
+    return options
+
+
+def stitch(store, cycles, start):
+    """
+    Joins the constellation sub-tours, in order, into one open route from `start`.
+
+    Each sub-tour is opened by cutting one of its edges (in either direction),
+    and a dynamic programme over the sequence picks the cuts that minimise the
+    sub-tour lengths plus the links between consecutive exits and entries.
+    """
+    dist = store.dist
+    layers = [_cut_options(cycle, dist) for cycle in cycles]
+    layers[0] = [option for option in layers[0] if option[0] == start]
+    costs = [option[3] for option in layers[0]]
+    back = [[None] * len(layers[0])]
+    for depth in range(1, len(layers)):
+        previous, options = layers[depth - 1], layers[depth]
+        # Cheapest way to arrive at each distinct exit of the previous layer
+        best_exit = {}
+        for p, option in enumerate(previous):
+            exit_node = option[1]
+            if exit_node not in best_exit or costs[p] < costs[best_exit[exit_node]]:
+                best_exit[exit_node] = p
+        layer_costs, layer_back = [], []
+        for entry, _, _, length in options:
+            p = min(best_exit.values(), key=lambda p: costs[p] + dist(previous[p][1], entry))
+            layer_costs.append(costs[p] + dist(previous[p][1], entry) + length)
+            layer_back.append(p)
+        costs = layer_costs
+        back.append(layer_back)
+
+    choice = min(range(len(costs)), key=costs.__getitem__)
+    pieces = []
+    for depth in range(len(layers) - 1, -1, -1):
+        pieces.append(layers[depth][choice][2])
+        choice = back[depth][choice]
+    return [node for piece in reversed(pieces) for node in piece]
+
+
+def solve_region(systems, constellation_of, start, workers=None, polish=True, polish_time=0.0):
+    """
+    Cluster-first route over every system in `systems`, starting at `start`.
+
+    1. Orders the constellations by a tour over their centres.
+    2. Solves each constellation's closed sub-tour (in worker processes for
+       large inputs).
+    3. Stitches the sub-tours at the cheapest entry/exit cuts (see stitch).
+    4. Polishes the whole route with neighbour-list 2-opt/Or-opt, and
+       optionally `polish_time` seconds of annealing.
+
+    Returns {'path', 'distance'} plus the time spent in each phase.
+    """
+    timings = {}
+    started = time.perf_counter()
+    store = optimizer_core.build_coord_store(list(systems), systems, matrix_max_systems=0)
+    start_index = store.index[start]
+    groups = {}
+    for i, name in enumerate(store.names):
+        groups.setdefault(constellation_of[name], []).append(i)
+    order = constellation_order(groups, store, start_index)
+    timings['order'] = time.perf_counter() - started
+
+    phase = time.perf_counter()
+    point_sets = [[(store.xs[i], store.ys[i], store.zs[i]) for i in groups[key]] for key in order]
+    if workers != 1 and store.size >= PARALLEL_MIN_SYSTEMS:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            local_cycles = list(executor.map(_solve_cycle, point_sets, chunksize=8))
+    else:
+        local_cycles = [_solve_cycle(points) for points in point_sets]
+    cycles = [[groups[key][k] for k in cycle] for key, cycle in zip(order, local_cycles)]
+    timings['sub_tours'] = time.perf_counter() - phase
+
+    phase = time.perf_counter()
+    path = stitch(store, cycles, start_index)
+    timings['stitch'] = time.perf_counter() - phase
+    stitched_distance = store.path_length(path)
+
+    if polish:
+        phase = time.perf_counter()
+        neighbours = optimizer_core.build_neighbour_lists(store)
+        path = optimizer_core.improve_path(store, path, neighbours)
+        if polish_time > 0:
+            annealed, annealed_distance = optimizer_core.anneal_path(store, path, polish_time)
+            if annealed_distance < store.path_length(path):
+                path = annealed
+        timings['polish'] = time.perf_counter() - phase
+    timings['total'] = time.perf_counter() - started
+
+    return {
+        'path': store.to_names(path),
+        'distance': store.path_length(path),
+        'stitched_distance': stitched_distance,
+        'constellations': len(order),
+        'timings': timings,
+    }
+
+
+def solve_flat(systems, start, anneal_time=0.0):
+    """The flat solver for comparison: NN + 2-opt/Or-opt over all systems, then optional annealing."""
+    started = time.perf_counter()
+    store = optimizer_core.build_coord_store(list(systems), systems, matrix_max_systems=0)
+    path = optimizer_core.build_baseline_path(store, store.index[start])
+    if anneal_time > 0:
+        annealed, annealed_distance = optimizer_core.anneal_path(store, path, anneal_time)
+        if annealed_distance < store.path_length(path):
+            path = annealed
+    return {'path': store.to_names(path), 'distance': store.path_length(path),
+            'timings': {'total': time.perf_counter() - started}}
+
+
+def compare_with_flat(systems, constellation_of, start, workers=None, polish_time=0.0, flat_anneal_time=0.0):
+    """Solves the same route both ways and reports distance and time of each."""
+    clustered = solve_region(systems, constellation_of, start, workers, polish_time=polish_time)
+    flat = solve_flat(systems, start, flat_anneal_time)
+    gap = clustered['distance'] / flat['distance'] - 1 if flat['distance'] else 0.0
+    print(f"{'solver':12} {'distance':>12} {'time s':>8}")
+    print(f"{'clustered':12} {clustered['distance']:12.2f} {clustered['timings']['total']:8.3f}")
+    print(f"{'flat':12} {flat['distance']:12.2f} {flat['timings']['total']:8.3f}")
+    print(f"Clustered route is {gap:+.2%} against the flat solver")
+    return {'clustered': clustered, 'flat': flat, 'gap': gap}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster-first exploration route over whole regions.")
+    parser.add_argument("regions", nargs="+", help="Region ids to route (their systems are toured together)")
+    parser.add_argument("--start", help="Name of the start system (default: the first system of the regions)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for the sub-tours (1 to stay in-process)")
+    parser.add_argument("--no-polish", action="store_true", help="Skip the local search over the stitched route")
+    parser.add_argument("--polish-time", type=float, default=0.0, help="Seconds of annealing after the polish")
+    parser.add_argument("--compare", action="store_true", help="Also run the flat solver and report the gap")
+    parser.add_argument("--flat-anneal-time", type=float, default=0.0,
+                        help="Seconds of annealing for the flat solver in --compare")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--output", help="Write the result as JSON to this file")
+    args = parser.parse_args()
+
+    systems, constellation_of = load_regions(args.db, args.regions)
+    if not systems:
+        print(f"No visible systems in region(s) {', '.join(args.regions)}")
+        return
+    start = args.start or next(iter(systems))
+    print(f"Routing {len(systems)} systems in {len(set(constellation_of.values()))} constellations from {start}")
+
+    if args.compare:
+        result = compare_with_flat(systems, constellation_of, start, args.workers, args.polish_time,
+                                   args.flat_anneal_time)
+        route = result['clustered']
+    else:
+        result = route = solve_region(systems, constellation_of, start, args.workers, not args.no_polish,
+                                      args.polish_time)
+    timings = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in route['timings'].items())
+    print(f"Region route: {len(route['path'])} systems, {route['distance']:.2f} ly "
+          f"(stitched {route['stitched_distance']:.2f} ly; {timings})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f)
+        print(f"Result saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
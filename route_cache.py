@@ -0,0 +1,369 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+
+from create_map_data import file_sha256
+import region_solver
+
+# optimizer_core is served to the browser from the frontend's public folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "eve-frontier-map", "public"))
+import optimizer_core  # noqa: E402
+
+DB_FILE = os.path.join("eve-frontier-map", "public", "map_data.db")
+CACHE_FILE = os.path.join("eve-frontier-map", "public", "route_cache.db")
+# Bumped when the key or the stored route format changes; older entries are dropped
+CACHE_VERSION = 2
+
+# The least recently used routes are evicted beyond either limit (bytes count the stored paths).
+MAX_ENTRIES = 1000
+MAX_BYTES = 64 * 1024 * 1024
+
+# A cached route seeds a new query when the two system sets overlap at least this much (Jaccard).
+WARM_START_MIN_OVERLAP = 0.9
+# Cached routes examined for a warm start (same start system first, then most recently used)
+WARM_START_CANDIDATES = 16
+# Algorithms that search on from a given path. The baseline and the region solver
+# build their own, so a seeded run would be a different algorithm under the same key.
+WARM_START_ALGORITHMS = ('anneal', 'local_search')
+
+ALGORITHMS = ('baseline', 'anneal', 'local_search', 'region')
+DEFAULT_PARAMS = {
+    'baseline': {},
+    'anneal': {'passes': 4, 'time_per_pass': 0.5, 'seed': None},
+    'local_search': {'passes': 1, 'time_per_pass': 2.0, 'seed': None},
+    'region': {'polish': True, 'polish_time': 0.0},
+}
+
+
+def route_key(systems, start, algorithm, params):
+    """Canonical hash of a query: the same systems, start, algorithm and parameters in any order give the same key."""
+    query = {
+        'version': CACHE_VERSION,
+        'systems': sorted(systems),
+        'start': start,
+        'algorithm': algorithm,
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(query, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def query_params(algorithm, params=None):
+    """The algorithm's DEFAULT_PARAMS overridden by `params`, so omitted defaults and explicit ones share a key."""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+    merged = dict(DEFAULT_PARAMS[algorithm])
+    for name, value in (params or {}).items():
+        if name not in merged:
+            raise ValueError(f"Unknown parameter for {algorithm}: {name}")
+        merged[name] = value
+    return merged
+
+
+class RouteCache:
+    """
+    Routes already computed, kept in a SQLite file next to map_data.db.
+
+    Entries carry the hash of the map_data.db they were computed on; opening
+    the cache against a different map drops them all. Each route records
+    whether it was computed from scratch ('cold') or seeded from another
+    cached route ('warm'). Every hit refreshes an entry's last use, and
+    store() evicts the least recently used entries past `max_entries` or
+    `max_bytes` of stored paths.
+    """
+
+    def __init__(self, path=CACHE_FILE, db_file=DB_FILE, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path)
+        cursor = self.conn.cursor()
+        cursor.execute("CREATE TABLE IF NOT EXISTS cache_info (key TEXT PRIMARY KEY, value TEXT)")
+
+        self.map_hash = file_sha256(db_file) if os.path.exists(db_file) else None
+        cursor.execute("SELECT key, value FROM cache_info")
+        info = dict(cursor.fetchall())
+        if info.get('map_hash') != self.map_hash or info.get('version') != str(CACHE_VERSION):
+            if info:
+                print("Map data or cache format changed since the routes were cached; clearing the route cache.")
+            # Dropped rather than emptied, so an older table layout is rebuilt too
+            cursor.execute("DROP TABLE IF EXISTS routes")
+            cursor.executemany("INSERT OR REPLACE INTO cache_info (key, value) VALUES (?, ?)",
+                               (('map_hash', self.map_hash), ('version', str(CACHE_VERSION))))
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS routes (
+                key TEXT PRIMARY KEY,
+                algorithm TEXT,
+                start TEXT,
+                system_count INTEGER,
+                params TEXT,
+                path TEXT,
+                distance REAL,
+                source TEXT,
+                size INTEGER,
+                created REAL,
+                last_used REAL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_routes_last_used ON routes (last_used)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_routes_system_count ON routes (system_count)")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def lookup(self, key):
+        """Returns the cached {'path', 'distance', 'computed'} for a key, or None, and marks it as just used."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT path, distance, source FROM routes WHERE key = ?", (key,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute("UPDATE routes SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return {'path': json.loads(row[0]), 'distance': row[1], 'computed': row[2]}
+
+    def closest(self, systems, start, min_overlap=WARM_START_MIN_OVERLAP):
+        """
+        The cached path whose system set overlaps `systems` the most, as
+        (overlap, path), if that overlap reaches `min_overlap`; otherwise None.
+        Only routes of a size that could reach the overlap are examined. A
+        route over exactly these systems from `start` is never returned: it
+        answers the same query under another algorithm or parameters, not a
+        nearby one.
+        """
+        wanted = set(systems)
+        n = len(wanted)
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT key, path FROM routes WHERE system_count BETWEEN ? AND ?
+            ORDER BY start = ? DESC, last_used DESC LIMIT ?
+        """, (math.ceil(n * min_overlap), math.floor(n / min_overlap), start, WARM_START_CANDIDATES))
+        best = None
+        for key, path_json in cursor.fetchall():
+            path = json.loads(path_json)
+            if path[:1] == [start] and len(path) == n and wanted.issuperset(path):
+                continue
+            shared = len(wanted.intersection(path))
+            overlap = shared / (n + len(path) - shared)
+            if overlap >= min_overlap and (best is None or overlap > best[0]):
+                best = (overlap, path, key)
+        if best is None:
+            return None
+        cursor.execute("UPDATE routes SET last_used = ? WHERE key = ?", (time.time(), best[2]))
+        self.conn.commit()
+        return best[:2]
+
+    def store(self, key, start, algorithm, params, path, distance, source='cold'):
+        """Caches a route under `key` with its source ('cold' or 'warm'), then evicts down to the size limits."""
+        path_json = json.dumps(path, separators=(',', ':'))
+        now = time.time()
+        self.conn.execute("""
+            INSERT OR REPLACE INTO routes
+                (key, algorithm, start, system_count, params, path, distance, source, size, created, last_used, hits)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+        """, (key, algorithm, start, len(path), json.dumps(params, sort_keys=True), path_json, distance, source,
+              len(path_json), now, now))
+        self.evict()
+        self.conn.commit()
+
+    def evict(self):
+        """Deletes the least recently used routes until both MAX_ENTRIES and MAX_BYTES hold. Returns how many went."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM routes")
+        count, total = cursor.fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return 0
+        cursor.execute("SELECT key, size FROM routes ORDER BY last_used")
+        doomed = []
+        for key, size in cursor.fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        cursor.executemany("DELETE FROM routes WHERE key = ?", doomed)
+        return len(doomed)
+
+    def clear(self):
+        self.conn.execute("DELETE FROM routes")
+        self.conn.commit()
+
+    def stats(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM routes")
+        count, total, hits = cursor.fetchone()
+        cursor.execute("SELECT algorithm, COUNT(*) FROM routes GROUP BY algorithm ORDER BY algorithm")
+        by_algorithm = dict(cursor.fetchall())
+        cursor.execute("SELECT source, COUNT(*) FROM routes GROUP BY source ORDER BY source")
+        return {'entries': count, 'bytes': total, 'hits': hits, 'by_algorithm': by_algorithm,
+                'by_source': dict(cursor.fetchall()), 'max_entries': self.max_entries, 'max_bytes': self.max_bytes}
+
+
+def seed_path(store, cached_path, start):
+    """
+    Adapts a cached route to the systems of `store`: drops the systems it no
+    longer needs, puts `start` first, inserts the missing ones at their
+    cheapest position and runs 2-opt/Or-opt over the result.
+    """
+    path = [store.index[name] for name in cached_path if name in store.index and store.index[name] != start]
+    path.insert(0, start)
+    dist = store.dist
+    placed = set(path)
+    for node in range(store.size):
+        if node in placed:
+            continue
+        # Between two stops, or appended after the last one
+        best_cost, best_at = dist(path[-1], node), len(path)
+        for k in range(len(path) - 1):
+            a, b = path[k], path[k + 1]
+            cost = dist(a, node) + dist(node, b) - dist(a, b)
+            if cost < best_cost:
+                best_cost, best_at = cost, k + 1
+        path.insert(best_at, node)
+    return optimizer_core.improve_path(store, path, store.neighbour_lists())
+
+
+def compute_route(systems, start, algorithm, params, seed=None, constellation_of=None):
+    """
+    Runs `algorithm` on `systems` (name -> {x, y, z}) from `start`, from the
+    cached route `seed` (names) when given; only WARM_START_ALGORITHMS take a
+    seed. 'region' needs `constellation_of`. Returns (path names, distance).
+    """
+    if seed is not None and algorithm not in WARM_START_ALGORITHMS:
+        raise ValueError(f"The {algorithm} algorithm cannot be warm-started")
+    if algorithm == 'region':
+        if constellation_of is None:
+            raise ValueError("The region algorithm needs constellation_of")
+        result = region_solver.solve_region(systems, constellation_of, start, polish=params['polish'],
+                                            polish_time=params['polish_time'])
+        return result['path'], result['distance']
+
+    store = optimizer_core.build_coord_store(list(systems), systems)
+    start_index = store.index[start]
+    if seed is not None:
+        path = seed_path(store, seed, start_index)
+    else:
+        path = optimizer_core.build_baseline_path(store, start_index)
+    distance = store.path_length(path)
+
+    if algorithm in ('anneal', 'local_search'):
+        rng = random.Random(params['seed'])
+        for _ in range(params['passes']):
+            candidate, candidate_distance = optimizer_core.search_path(store, path, params['time_per_pass'],
+                                                                       algorithm, rng)
+            if candidate_distance < distance:
+                path, distance = candidate, candidate_distance
+    return store.to_names(path), distance
+
+
+def cached_route(cache, systems, start, algorithm='anneal', params=None, constellation_of=None, warm_start=True):
+    """
+    The route for a query, from `cache` when it has been computed before.
+
+    On a miss, a cached route over a closely overlapping system set (see
+    RouteCache.closest) seeds the search when `warm_start` is on and the
+    algorithm is one of WARM_START_ALGORITHMS; otherwise the algorithm runs
+    from scratch. The new route is cached either way, with how it was computed.
+    `constellation_of` (name -> constellation id) is needed by 'region'.
+    Returns {'path', 'distance', 'source', 'computed'}, where source is 'hit',
+    'warm' or 'cold' for this call and computed is 'warm' or 'cold' for the
+    run that produced the route.
+    """
+    params = query_params(algorithm, params)
+    if start not in systems:
+        raise ValueError(f"Start system {start} is not in the system set")
+    if algorithm == 'region' and constellation_of is None:
+        raise ValueError("The region algorithm needs constellation_of")
+    key = route_key(systems, start, algorithm, params)
+    hit = cache.lookup(key)
+    if hit is not None:
+        return dict(hit, source='hit')
+
+    seed = None
+    if warm_start and algorithm in WARM_START_ALGORITHMS:
+        closest = cache.closest(systems, start)
+        if closest is not None:
+            seed = closest[1]
+    source = 'warm' if seed is not None else 'cold'
+    path, distance = compute_route(systems, start, algorithm, params, seed, constellation_of)
+    cache.store(key, start, algorithm, params, path, distance, source)
+    return {'path': path, 'distance': distance, 'source': source, 'computed': source}
+
+
+def load_bubble(db_file, start, radius):
+    """
+    The visible systems within `radius` ly of the system named `start`, as
+    ({name: {'x', 'y', 'z'}}, {name: constellation id}), from map_data.db.
+    """
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT name, constellation_id, position_x, position_y, position_z
+        FROM systems WHERE hidden = 0 ORDER BY CAST(id AS INTEGER)
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    origin = next((row[2:] for row in rows if row[0] == start), None)
+    if origin is None:
+        raise ValueError(f"Unknown system: {start}")
+    systems, constellation_of = {}, {}
+    for name, constellation_id, x, y, z in rows:
+        if math.dist((x, y, z), origin) <= radius:
+            systems[name] = {'x': x, 'y': y, 'z': z}
+            constellation_of[name] = str(constellation_id)
+    return systems, constellation_of
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached exploration routes over the systems around a start system.")
+    parser.add_argument("start", nargs="?", help="Name of the start system")
+    parser.add_argument("--radius", type=float, default=50.0, help="Bubble radius in ly around the start system")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default='anneal')
+    parser.add_argument("--params", type=json.loads, default=None,
+                        help="Algorithm parameters as JSON, e.g. '{\"passes\": 8}'")
+    parser.add_argument("--no-warm-start", action="store_true", help="Never seed from an overlapping cached route")
+    parser.add_argument("--stats", action="store_true", help="Print cache statistics")
+    parser.add_argument("--clear", action="store_true", help="Empty the cache")
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES)
+    parser.add_argument("--max-bytes", type=int, default=MAX_BYTES)
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--output", help="Write the route as JSON to this file")
+    args = parser.parse_args()
+
+    with RouteCache(args.cache, args.db, args.max_entries, args.max_bytes) as cache:
+        if args.clear:
+            cache.clear()
+            print(f"Cleared {args.cache}")
+        if args.start:
+            systems, constellation_of = load_bubble(args.db, args.start, args.radius)
+            started = time.perf_counter()
+            result = cached_route(cache, systems, args.start, args.algorithm, args.params, constellation_of,
+                                  not args.no_warm_start)
+            print(f"{args.algorithm} route over {len(systems)} systems: {result['distance']:.2f} ly "
+                  f"({result['source']}, {time.perf_counter() - started:.3f}s)")
+            if args.output:
+                with open(args.output, 'w') as f:
+                    json.dump(result, f)
+                print(f"Result saved to {args.output}")
+        if args.stats:
+            stats = cache.stats()
+            print(f"{stats['entries']} cached routes ({stats['bytes'] / 1e6:.2f} MB of "
+                  f"{stats['max_bytes'] / 1e6:.2f} MB, {stats['max_entries']} entries max), "
+                  f"{stats['hits']} hits; by algorithm: {stats['by_algorithm']}; by source: {stats['by_source']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import mmap
+import sys
+from array import array
+from bisect import bisect_left
+
+# Every section starts on this boundary so it can be viewed in place as a typed array.
+SECTION_ALIGNMENT = 8
+
+
+def section_layout(header, sections):
+    """
+    Returns {section: (typecode, count, byte offset)} and the total file size
+    for `sections` ((name, typecode, count) in file order) after `header`.
+    """
+    layout = {}
+    offset = header.size
+    for name, typecode, count in sections:
+        offset = -(-offset // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+        layout[name] = (typecode, count, offset)
+        offset += array(typecode).itemsize * count
+    return layout, offset
+
+
+def pack_sections(header, header_values, sections, columns):
+    """Returns the file as bytes: the packed header, then each column of `columns` little-endian at its offset."""
+    layout, size = section_layout(header, sections)
+    data = bytearray(size)
+    header.pack_into(data, 0, *header_values)
+    for name, (typecode, count, offset) in layout.items():
+        column = columns[name]
+        if sys.byteorder != "little":
+            column = array(typecode, column)
+            column.byteswap()
+        data[offset:offset + column.itemsize * count] = column.tobytes()
+    return bytes(data)
+
+
+def gate_csr(index_of, gates):
+    """
+    CSR adjacency (offsets, targets) over the indices of `index_of` (system id
+    -> index) from (source id, destination id) gate rows: gates in both
+    directions, without duplicates, self-loops or gates to unknown systems,
+    each node's targets sorted.
+    """
+    neighbours = [set() for _ in range(len(index_of))]
+    for source, destination in gates:
+        a, b = index_of.get(int(source)), index_of.get(int(destination))
+        if a is not None and b is not None and a != b:
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+    offsets = array('I', [0])
+    targets = array('I')
+    for found in neighbours:
+        targets.extend(sorted(found))
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+class SectionedFile:
+    """
+    Read-only view of a file written by pack_sections. The file is
+    memory-mapped and every section is exposed as an attribute holding a typed
+    memoryview over the mapping, so opening it parses nothing but the header
+    and allocates nothing per system. Subclasses set HEADER, MAGIC, VERSION,
+    KIND (for error messages) and sections(*counts); the header is magic,
+    version, then the counts, whose first is the number of systems.
+    """
+
+    HEADER = None
+    MAGIC = None
+    VERSION = None
+    KIND = "file"
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        magic, version, *counts = self.HEADER.unpack_from(self._mmap)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise ValueError(f"Unsupported {self.KIND} (magic {magic!r}, version {version})")
+        self.counts = counts
+        self.size = counts[0]
+        layout, _ = section_layout(self.HEADER, self.sections(*counts))
+        buffer = memoryview(self._mmap)
+        self._views.append(buffer)
+        for name, (typecode, count, offset) in layout.items():
+            raw = buffer[offset:offset + array(typecode).itemsize * count]
+            if sys.byteorder == "little":
+                column = raw.cast(typecode)
+                self._views.extend((raw, column))
+            else:
+                column = array(typecode, raw.tobytes())
+                column.byteswap()
+            setattr(self, name, column)
+
+    @staticmethod
+    def sections(*counts):
+        raise NotImplementedError
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Unmaps the file. Slices taken from the columns (e.g. gate_neighbours) must be released first."""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+        self._file.close()
+
+    def index_of(self, system_id):
+        """Returns the index of a system id (binary search over the sorted system_ids column)."""
+        i = bisect_left(self.system_ids, system_id)
+        if i == self.size or self.system_ids[i] != system_id:
+            raise KeyError(system_id)
+        return i
@@ -0,0 +1,212 @@
+import math
+import sqlite3
+import struct
+import sys
+from array import array
+
+# Sidecar file written next to map_data.db
+INDEX_FILE = "eve-frontier-map/public/system_index.bin"
+
+INDEX_MAGIC = b"EFSI"
+INDEX_VERSION = 1
+# magic, version, system count, cell count, cells per axis (x, y, z), cell size, origin (x, y, z)
+_HEADER = struct.Struct("<4sIIIIIIdddd")
+
+# Average number of systems per grid cell when no cell size is given.
+DEFAULT_SYSTEMS_PER_CELL = 8
+
+
+class SpatialIndex:
+    """
+    Uniform grid over system positions (light-years, Y-up as stored in map_data.db).
+
+    Systems are stored sorted by cell in flat arrays, so a cell is a contiguous
+    run [start, end) of the id and coordinate arrays. This keeps the index
+    compact and lets it be written to / read from disk as raw arrays.
+    """
+
+    def __init__(self, ids, xs, ys, zs, cell_size=None):
+        n = len(ids)
+        if n:
+            origin = (min(xs), min(ys), min(zs))
+            extents = (max(xs) - origin[0], max(ys) - origin[1], max(zs) - origin[2])
+        else:
+            origin, extents = (0.0, 0.0, 0.0), (0.0, 0.0, 0.0)
+        if cell_size is None:
+            largest = max(extents)
+            volume = 1.0
+            for extent in extents:
+                volume *= max(extent, largest * 1e-3, 1e-9)
+            cell_size = (volume * DEFAULT_SYSTEMS_PER_CELL / max(n, 1)) ** (1 / 3)
+        self.cell_size = cell_size
+        self.origin = origin
+        self.dims = tuple(int(extent // cell_size) + 1 for extent in extents)
+
+        keys = [self._cell_key(*self._cell_of(xs[i], ys[i], zs[i])) for i in range(n)]
+        order = sorted(range(n), key=keys.__getitem__)
+        self.ids = array('q', (ids[i] for i in order))
+        self.xs = array('d', (xs[i] for i in order))
+        self.ys = array('d', (ys[i] for i in order))
+        self.zs = array('d', (zs[i] for i in order))
+
+        cell_keys = array('q')
+        cell_starts = array('I')
+        previous = None
+        for position, i in enumerate(order):
+            if keys[i] != previous:
+                previous = keys[i]
+                cell_keys.append(previous)
+                cell_starts.append(position)
+        cell_starts.append(n)
+        self._set_cells(cell_keys, cell_starts)
+
+    def _set_cells(self, cell_keys, cell_starts):
+        self.cell_keys = cell_keys
+        self.cell_starts = cell_starts
+        self.cells = {key: (cell_starts[c], cell_starts[c + 1]) for c, key in enumerate(cell_keys)}
+        self.slot_of = {system_id: slot for slot, system_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell_of(self, x, y, z):
+        size = self.cell_size
+        ox, oy, oz = self.origin
+        return int((x - ox) // size), int((y - oy) // size), int((z - oz) // size)
+
+    def _cell_key(self, cx, cy, cz):
+        _, dim_y, dim_z = self.dims
+        return (cx * dim_y + cy) * dim_z + cz
+
+    def _cells_in_box(self, low, high):
+        """Yields the (start, end) runs of every occupied cell overlapping the box."""
+        lo = self._cell_of(*low)
+        hi = self._cell_of(*high)
+        dim_x, dim_y, dim_z = self.dims
+        cells = self.cells
+        for cx in range(max(lo[0], 0), min(hi[0], dim_x - 1) + 1):
+            for cy in range(max(lo[1], 0), min(hi[1], dim_y - 1) + 1):
+                base = (cx * dim_y + cy) * dim_z
+                for cz in range(max(lo[2], 0), min(hi[2], dim_z - 1) + 1):
+                    run = cells.get(base + cz)
+                    if run:
+                        yield run
+
+    def position(self, system_id):
+        slot = self.slot_of[system_id]
+        return self.xs[slot], self.ys[slot], self.zs[slot]
+
+    def query_bbox(self, low, high):
+        """Returns the ids of all systems inside the axis-aligned box [low, high]."""
+        (lx, ly, lz), (hx, hy, hz) = low, high
+        xs, ys, zs, ids = self.xs, self.ys, self.zs, self.ids
+        result = []
+        for start, end in self._cells_in_box(low, high):
+            for slot in range(start, end):
+                if lx <= xs[slot] <= hx and ly <= ys[slot] <= hy and lz <= zs[slot] <= hz:
+                    result.append(ids[slot])
+        return result
+
+    def query_radius(self, point, radius, sort=True):
+        """Returns (distance, id) for all systems within `radius` of `point`, closest first unless `sort` is off."""
+        px, py, pz = point
+        xs, ys, zs, ids = self.xs, self.ys, self.zs, self.ids
+        limit = radius * radius
+        result = []
+        low = (px - radius, py - radius, pz - radius)
+        high = (px + radius, py + radius, pz + radius)
+        for start, end in self._cells_in_box(low, high):
+            for slot in range(start, end):
+                d2 = (xs[slot] - px)**2 + (ys[slot] - py)**2 + (zs[slot] - pz)**2
+                if d2 <= limit:
+                    result.append((math.sqrt(d2), ids[slot]))
+        if sort:
+            result.sort()
+        return result
+
+    def query_knn(self, point, k):
+        """Returns (distance, id) of the k systems nearest to `point`, closest first."""
+        k = min(k, len(self.ids))
+        if k <= 0:
+            return []
+        # Grow a cube around the point until the k-th hit is provably inside it
+        radius = self.cell_size
+        while True:
+            found = self.query_radius(point, radius)
+            if len(found) >= k:
+                return found[:k]
+            radius *= 2
+
+    def system_bubble(self, system_id, radius):
+        """Returns (distance, id) for every system within `radius` ly of a system, itself included."""
+        return self.query_radius(self.position(system_id), radius)
+
+    @classmethod
+    def from_database(cls, db_file, cell_size=None):
+        """Builds the index from the positions in map_data.db."""
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, position_x, position_y, position_z FROM systems")
+        rows = cursor.fetchall()
+        conn.close()
+        ids = [int(row[0]) for row in rows]
+        xs = [row[1] for row in rows]
+        ys = [row[2] for row in rows]
+        zs = [row[3] for row in rows]
+        return cls(ids, xs, ys, zs, cell_size)
+
+    def to_bytes(self):
+        header = _HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(self.ids), len(self.cell_keys),
+                              *self.dims, self.cell_size, *self.origin)
+        parts = [header]
+        for column in (self.ids, self.xs, self.ys, self.zs, self.cell_keys, self.cell_starts):
+            column = array(column.typecode, column)
+            if sys.byteorder != "little":
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, n, num_cells, dim_x, dim_y, dim_z, cell_size, ox, oy, oz = _HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Unsupported spatial index (magic {magic!r}, version {version})")
+        index = cls.__new__(cls)
+        index.cell_size = cell_size
+        index.origin = (ox, oy, oz)
+        index.dims = (dim_x, dim_y, dim_z)
+        offset = _HEADER.size
+        columns = []
+        for typecode, count in (('q', n), ('d', n), ('d', n), ('d', n), ('q', num_cells), ('I', num_cells + 1)):
+            column = array(typecode)
+            size = column.itemsize * count
+            column.frombytes(data[offset:offset + size])
+            if sys.byteorder != "little":
+                column.byteswap()
+            columns.append(column)
+            offset += size
+        index.ids, index.xs, index.ys, index.zs, cell_keys, cell_starts = columns
+        index._set_cells(cell_keys, cell_starts)
+        return index
+
+    def save(self, path=INDEX_FILE):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def build_spatial_index(db_file="eve-frontier-map/public/map_data.db", index_file=INDEX_FILE):
+    """Builds the system spatial index from map_data.db and writes it to its sidecar file."""
+    print("Building system spatial index...")
+    index = SpatialIndex.from_database(db_file)
+    index.save(index_file)
+    print(f"Spatial index with {len(index)} systems in {len(index.cell_keys)} cells saved to {index_file}")
+    return index
+
+
+if __name__ == "__main__":
+    build_spatial_index()
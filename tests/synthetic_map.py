@@ -0,0 +1,67 @@
+import sqlite3
+
+FIRST_SYSTEM_ID = 30000001
+FIRST_CONSTELLATION_ID = 20000001
+FIRST_REGION_ID = 10000001
+# Systems per constellation; every gate component is its own region
+CONSTELLATION_SIZE = 20
+
+
+def build_map(rng, component_sizes, extra_gates=0.3, step=4.0, hidden=(), spread=5000.0):
+    """
+    A random map as (systems, gates). Each component of `component_sizes` is a
+    random tree of gates, each system placed up to `step` ly from the one it
+    hangs off, plus `extra_gates` times as many gates between random members.
+    Each component starts at a random point up to `spread` ly from the origin
+    on every axis. Systems are (id, name, constellation id, region id, x, y,
+    z, hidden), with the systems at the indices in `hidden` hidden.
+    """
+    systems, gates = [], []
+    for c, size in enumerate(component_sizes):
+        first = len(systems)
+        centre = [rng.uniform(-spread, spread) for _ in range(3)]
+        for k in range(size):
+            if k:
+                parent = systems[first + rng.randrange(k)]
+                position = [parent[4 + axis] + rng.uniform(-step, step) for axis in range(3)]
+                gates.append((parent[0], FIRST_SYSTEM_ID + len(systems)))
+            else:
+                position = centre
+            system_id = FIRST_SYSTEM_ID + len(systems)
+            constellation_id = FIRST_CONSTELLATION_ID + 100 * c + k // CONSTELLATION_SIZE
+            systems.append((system_id, f"S{system_id}", constellation_id, FIRST_REGION_ID + c, *position,
+                            1 if len(systems) in hidden else 0))
+        for _ in range(int(size * extra_gates)):
+            a, b = rng.randrange(size), rng.randrange(size)
+            if a != b:
+                gates.append((systems[first + a][0], systems[first + b][0]))
+    return systems, gates
+
+
+def write_map_db(path, systems, gates):
+    """Writes the systems and stargates tables of a map_data.db with just the columns the tools read."""
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE systems (
+            id TEXT PRIMARY KEY, name TEXT, constellation_id TEXT, region_id TEXT,
+            position_x REAL, position_y REAL, position_z REAL, hidden BOOLEAN
+        )
+    """)
+    conn.execute("CREATE TABLE stargates (id INTEGER PRIMARY KEY, source_system_id TEXT, destination_system_id TEXT)")
+    conn.executemany("INSERT INTO systems VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     [(str(row[0]), row[1], str(row[2]), str(row[3]), *row[4:]) for row in systems])
+    conn.executemany("INSERT INTO stargates (source_system_id, destination_system_id) VALUES (?, ?)",
+                     [(str(a), str(b)) for a, b in gates])
+    conn.commit()
+    conn.close()
+
+
+def gate_neighbours(systems, gates):
+    """{system id: set of gate neighbour ids} over the visible systems, built directly from the rows."""
+    visible = {row[0] for row in systems if not row[7]}
+    neighbours = {system_id: set() for system_id in visible}
+    for a, b in gates:
+        if a in visible and b in visible and a != b:
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+    return neighbours
@@ -0,0 +1,100 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gate_hops  # noqa: E402
+from synthetic_map import build_map, gate_neighbours, write_map_db  # noqa: E402
+
+
+def bfs(neighbours, source, max_hops=None):
+    hops = {source: 0}
+    frontier = deque([source])
+    while frontier:
+        node = frontier.popleft()
+        if max_hops is not None and hops[node] == max_hops:
+            continue
+        for target in neighbours[node]:
+            if target not in hops:
+                hops[target] = hops[node] + 1
+                frontier.append(target)
+    return hops
+
+
+class GateHopsTest(unittest.TestCase):
+    """Exact hops, landmark estimates and within() against BFS over the gate rows of a synthetic map."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rng = random.Random(7)
+        # A full-table component, one larger than FULL_TABLE_MAX_SYSTEMS (landmarks), a pair and a lone system;
+        # the hidden system cuts the large component's gates through it
+        sizes = (120, gate_hops.FULL_TABLE_MAX_SYSTEMS + 200, 2, 1)
+        cls.systems, cls.gates = build_map(cls.rng, sizes, hidden={300})
+        cls.neighbours = gate_neighbours(cls.systems, cls.gates)
+        cls.ids = sorted(cls.neighbours)
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_file = os.path.join(cls.tmp.name, 'map_data.db')
+        cls.hops_file = os.path.join(cls.tmp.name, 'gate_hops.bin')
+        write_map_db(cls.db_file, cls.systems, cls.gates)
+        gate_hops.export_gate_hops(cls.db_file, cls.hops_file)
+        cls.table = gate_hops.GateHops(cls.hops_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.table.close()
+        cls.tmp.cleanup()
+
+    def test_layout(self):
+        self.assertEqual(list(self.table.system_ids), self.ids)
+        sizes = sorted(self.table.component_size(c) for c in range(self.table.components))
+        self.assertGreater(sizes[-1], gate_hops.FULL_TABLE_MAX_SYSTEMS)
+        self.assertLessEqual(sizes[-2], gate_hops.FULL_TABLE_MAX_SYSTEMS)
+        tables = [self.table.table_offsets[c] != gate_hops.NO_TABLE for c in range(self.table.components)]
+        self.assertIn(True, tables)
+        self.assertIn(False, tables)
+
+    def test_hops_and_estimates_match_bfs(self):
+        rng = random.Random(11)
+        for source in rng.sample(self.ids, 30):
+            truth = bfs(self.neighbours, source)
+            reachable = list(truth)
+            for k in range(30):
+                target = rng.choice(reachable) if k % 2 else rng.choice(self.ids)
+                expected = truth.get(target)
+                self.assertEqual(self.table.hops(source, target), expected, (source, target))
+                bounds = self.table.estimate(source, target)
+                if expected is None:
+                    self.assertIsNone(bounds)
+                    self.assertFalse(self.table.connected(source, target))
+                else:
+                    self.assertLessEqual(bounds[0], expected)
+                    self.assertGreaterEqual(bounds[1], expected)
+
+    def test_disconnected_pairs(self):
+        lone = self.systems[-1][0]
+        self.assertEqual(self.table.hops(lone, lone), 0)
+        for other in self.rng.sample(self.ids, 10):
+            if other != lone:
+                self.assertIsNone(self.table.hops(lone, other))
+                self.assertIsNone(self.table.estimate(other, lone))
+
+    def test_within_matches_depth_limited_bfs(self):
+        rng = random.Random(13)
+        for source in rng.sample(self.ids, 20):
+            max_hops = rng.randrange(0, 6)
+            self.assertEqual(self.table.within(source, max_hops), bfs(self.neighbours, source, max_hops))
+
+    def test_hidden_system_is_left_out(self):
+        with self.assertRaises(KeyError):
+            self.table.index_of(self.systems[300][0])
+
+    def test_validate_passes(self):
+        self.assertEqual(gate_hops.validate_gate_hops(self.db_file, self.hops_file, samples=200), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,283 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import get_systems  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every GET through the `respond` callable of its server, recording each request."""
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        offset = int(query['offset'][0])
+        self.server.requests.append((offset, dict(self.headers)))
+        status, headers, body = self.server.respond(offset, self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServerTestCase(unittest.TestCase):
+    """Runs a local HTTP server whose answers come from self.respond(offset, headers)."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = []
+        self.server.respond = self.respond
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v2/solarsystems"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def respond(self, offset, headers):
+        raise NotImplementedError
+
+    def fetcher(self, **kwargs):
+        options = {'limit': 2, 'workers': 2, 'rate': 1000.0, 'retries': 3, 'backoff': 0.0, 'timeout': 5.0}
+        options.update(kwargs)
+        return get_systems.PageFetcher(self.url, **options)
+
+
+def json_body(data):
+    return json.dumps(data).encode()
+
+
+class PageFetcherTest(StubServerTestCase):
+
+    def respond(self, offset, headers):
+        return self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+
+    def test_retries_transient_status(self):
+        page = {'data': [{'id': 1}]}
+        self.responses = [(503, {'Retry-After': '0'}, b''), (503, {}, b''), (200, {}, json_body(page))]
+        self.assertEqual(self.fetcher().fetch_page(0), page)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_retries_truncated_body(self):
+        page = {'data': [{'id': 1}]}
+        self.responses = [(200, {}, b'{"data": [{"id"'), (200, {}, json_body(page))]
+        self.assertEqual(self.fetcher().fetch_page(0), page)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_gives_up_after_retries(self):
+        self.responses = [(503, {}, b'')]
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.fetcher(retries=2).fetch_page(0)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_other_errors_are_not_retried(self):
+        self.responses = [(404, {}, b'')]
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.fetcher().fetch_page(0)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_not_modified_is_returned(self):
+        self.responses = [(304, {'ETag': '"v1"'}, b'')]
+        response = self.fetcher().request_page(4, {'If-None-Match': '"v1"'})
+        self.assertEqual(response.status_code, 304)
+        offset, headers = self.server.requests[0]
+        self.assertEqual(offset, 4)
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+
+
+class SyncSolarSystemsTest(StubServerTestCase):
+    """Pages of self.systems (two per page) with an ETag and Last-Modified each, honouring conditional requests."""
+
+    def setUp(self):
+        super().setUp()
+        self.systems = [{'id': i, 'name': f"S{i}"} for i in range(5)]
+        self.versions = {}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshot = os.path.join(self.tmp.name, 'systems.ndjson')
+        self.delta_file = os.path.join(self.tmp.name, 'delta.json')
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp.cleanup()
+
+    def respond(self, offset, headers):
+        page = self.systems[offset:offset + 2]
+        body = json_body({'data': page})
+        # A page's version only moves when its content does
+        version = self.versions.setdefault(body, len(self.versions) + 1)
+        validators = {'ETag': f'"{offset}-{version}"',
+                      'Last-Modified': formatdate(1700000000 + version, usegmt=True)}
+        if headers.get('If-None-Match') == validators['ETag']:
+            return 304, validators, b''
+        return 200, validators, body
+
+    def sync(self):
+        self.server.requests.clear()
+        delta = get_systems.sync_solar_systems(self.snapshot, self.delta_file, self.fetcher())
+        with open(self.delta_file) as f:
+            self.assertEqual(json.load(f), delta)
+        return delta
+
+    def snapshot_systems(self):
+        with open(self.snapshot) as f:
+            return [json.loads(line) for line in f]
+
+    def test_first_sync_adds_everything(self):
+        delta = self.sync()
+        self.assertEqual(delta, {'added': self.systems, 'removed': [], 'changed': []})
+        self.assertEqual(self.snapshot_systems(), self.systems)
+        self.assertEqual(sorted(offset for offset, _ in self.server.requests), [0, 2, 4])
+
+    def test_unchanged_pages_are_not_modified(self):
+        self.sync()
+        with open(self.snapshot, 'rb') as f:
+            before = f.read()
+        delta = self.sync()
+        self.assertEqual(delta, {'added': [], 'removed': [], 'changed': []})
+        with open(self.snapshot, 'rb') as f:
+            self.assertEqual(f.read(), before)
+        # Every page was asked for conditionally, with the validators it was last served with
+        self.assertEqual(len(self.server.requests), 3)
+        for offset, headers in self.server.requests:
+            self.assertTrue(headers['If-None-Match'].startswith(f'"{offset}-'))
+            self.assertIn('If-Modified-Since', headers)
+
+    def test_delta_covers_changed_added_and_removed(self):
+        self.sync()
+        self.systems[3] = {'id': 3, 'name': "Renamed"}
+        self.systems.append({'id': 5, 'name': "S5"})
+        delta = self.sync()
+        self.assertEqual(delta['added'], [{'id': 5, 'name': "S5"}])
+        self.assertEqual(delta['removed'], [])
+        self.assertEqual(delta['changed'], [{'id': 3, 'fields': {'name': {'old': "S3", 'new': "Renamed"}}}])
+        self.assertEqual(self.snapshot_systems(), self.systems)
+        # Page 4 became full, so the page after it is requested too
+        self.assertEqual(sorted(offset for offset, _ in self.server.requests), [0, 2, 4, 6])
+
+        del self.systems[4:]
+        delta = self.sync()
+        self.assertEqual(delta, {'added': [], 'removed': [4, 5], 'changed': []})
+        self.assertEqual(self.snapshot_systems(), self.systems)
+
+    def test_failed_request_leaves_snapshot(self):
+        self.sync()
+        with open(self.snapshot, 'rb') as f:
+            before = f.read()
+        self.systems[0] = {'id': 0, 'name': "Renamed"}
+        self.respond = lambda offset, headers: (404, {}, b'')
+        self.server.respond = self.respond
+        os.remove(self.delta_file)
+        self.assertIsNone(get_systems.sync_solar_systems(self.snapshot, self.delta_file, self.fetcher()))
+        self.assertFalse(os.path.exists(self.delta_file))
+        with open(self.snapshot, 'rb') as f:
+            self.assertEqual(f.read(), before)
+
+
+class FetchAllSolarSystemsTest(StubServerTestCase):
+    """Pages of self.systems (two per page); offsets in self.failing answer 404, and self.total goes in the metadata."""
+
+    def setUp(self):
+        super().setUp()
+        self.systems = [{'id': i, 'name': f"S{i}"} for i in range(7)]
+        self.failing = set()
+        self.total = None
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, 'systems.ndjson')
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp.cleanup()
+
+    def respond(self, offset, headers):
+        if offset in self.failing:
+            return 404, {}, b''
+        page = {'data': self.systems[offset:offset + 2]}
+        if self.total is not None:
+            page['metadata'] = {'total': self.total}
+        return 200, {}, json_body(page)
+
+    def fetch(self, workers=1, keep_checkpoint=False):
+        self.server.requests.clear()
+        return get_systems.fetch_all_solar_systems(self.output, self.fetcher(workers=workers), keep_checkpoint)
+
+    def requested(self):
+        return sorted(offset for offset, _ in self.server.requests)
+
+    def output_systems(self):
+        with open(self.output) as f:
+            return [json.loads(line) for line in f]
+
+    def test_writes_pages_in_offset_order(self):
+        self.assertEqual(self.fetch(workers=3), len(self.systems))
+        self.assertEqual(self.output_systems(), self.systems)
+        self.assertFalse(os.path.exists(self.output + '.pages'))
+        # Every page up to the short one at 6, and at most one round of workers past it
+        requested = self.requested()
+        self.assertEqual(requested[:4], [0, 2, 4, 6])
+        self.assertLessEqual(requested[-1], 6 + 3 * 2)
+
+    def test_stops_at_first_short_page(self):
+        self.assertEqual(self.fetch(), 7)
+        self.assertEqual(self.requested(), [0, 2, 4, 6])
+
+    def test_stops_at_metadata_total(self):
+        # A whole number of pages: without the total, only an empty page would show the end
+        del self.systems[6:]
+        self.assertEqual(self.fetch(), 6)
+        self.assertEqual(self.requested(), [0, 2, 4, 6])
+        self.total = 6
+        self.assertEqual(self.fetch(), 6)
+        self.assertEqual(self.requested(), [0, 2, 4])
+        self.assertEqual(self.output_systems(), self.systems)
+
+    def test_resumes_from_checkpoint(self):
+        self.failing = {4}
+        self.assertIsNone(self.fetch())
+        self.assertFalse(os.path.exists(self.output))
+        pages = self.output + '.pages'
+        self.assertEqual(sorted(os.listdir(pages)), ['offset-00000000.ndjson', 'offset-00000002.ndjson'])
+
+        self.failing = set()
+        self.assertEqual(self.fetch(), 7)
+        self.assertEqual(self.requested(), [4, 6])
+        self.assertEqual(self.output_systems(), self.systems)
+        self.assertFalse(os.path.exists(pages))
+
+    def test_keeps_checkpoint_on_request(self):
+        self.assertEqual(self.fetch(keep_checkpoint=True), 7)
+        self.assertEqual(len(os.listdir(self.output + '.pages')), 4)
+        # A rerun finds every page on disk and fetches nothing
+        self.assertEqual(self.fetch(), 7)
+        self.assertEqual(self.requested(), [])
+        self.assertEqual(self.output_systems(), self.systems)
+        self.assertFalse(os.path.exists(self.output + '.pages'))
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_limits_rate_after_burst(self):
+        bucket = get_systems.TokenBucket(rate=50.0, capacity=2)
+        started = time.monotonic()
+        for _ in range(7):
+            bucket.acquire()
+        # Two tokens are available at once, the other five come 1/50 s apart
+        self.assertGreaterEqual(time.monotonic() - started, 5 / 50 - 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
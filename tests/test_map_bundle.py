@@ -0,0 +1,86 @@
+import os
+import random
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import map_bundle  # noqa: E402
+from synthetic_map import build_map, write_map_db  # noqa: E402
+
+
+class MapBundleTest(unittest.TestCase):
+    """A bundle exported from a synthetic map_data.db, read back through MapBundle."""
+
+    @classmethod
+    def setUpClass(cls):
+        systems, gates = build_map(random.Random(17), (60, 30, 1), hidden={5, 70})
+        # A non-ASCII name, a duplicate and reversed gate, a self-loop and a gate to an unknown system
+        systems[3] = (*systems[3][:1], "Ærø–7", *systems[3][2:])
+        gates += [gates[0], gates[1][::-1], (systems[2][0], systems[2][0]), (systems[4][0], 1)]
+        # Rows in reverse order, so the bundle has to sort them by id
+        cls.systems = systems[::-1]
+        cls.gates = gates
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_file = os.path.join(cls.tmp.name, 'map_data.db')
+        cls.bundle_file = os.path.join(cls.tmp.name, 'map_bundle.bin')
+        write_map_db(cls.db_file, cls.systems, cls.gates)
+        map_bundle.export_map_bundle(cls.db_file, cls.bundle_file)
+        cls.bundle = map_bundle.MapBundle(cls.bundle_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.bundle.close()
+        cls.tmp.cleanup()
+
+    def test_systems_round_trip(self):
+        bundle = self.bundle
+        rows = sorted(self.systems)
+        self.assertEqual(len(bundle), len(rows))
+        self.assertEqual(list(bundle.system_ids), [row[0] for row in rows])
+        for row in rows:
+            i = bundle.index_of(row[0])
+            self.assertEqual(bundle.name(i), row[1])
+            self.assertEqual(bundle.constellation_id(i), row[2])
+            self.assertEqual(bundle.region_id(i), row[3])
+            for value, expected in zip(bundle.position(i), row[4:7]):
+                # Positions are stored as float32
+                self.assertAlmostEqual(value, expected, delta=abs(expected) * 1e-6 + 1e-6)
+            self.assertEqual(bundle.hidden[i], row[7])
+
+    def test_gate_neighbours_are_symmetric_and_sorted(self):
+        bundle = self.bundle
+        ids = {row[0] for row in self.systems}
+        expected = {system_id: set() for system_id in ids}
+        # Hidden systems keep their gates in the bundle
+        for a, b in self.gates:
+            if a in ids and b in ids and a != b:
+                expected[a].add(b)
+                expected[b].add(a)
+        self.assertEqual(len(bundle.gate_targets), sum(len(found) for found in expected.values()))
+        for i in range(len(bundle)):
+            neighbours = list(bundle.gate_neighbours(i))
+            self.assertEqual(neighbours, sorted(set(neighbours)))
+            self.assertEqual({bundle.system_ids[j] for j in neighbours}, expected[bundle.system_ids[i]])
+            for j in neighbours:
+                self.assertIn(i, list(bundle.gate_neighbours(j)))
+
+    def test_index_of_unknown_system(self):
+        for system_id in (0, min(self.bundle.system_ids) - 1, max(self.bundle.system_ids) + 1):
+            with self.assertRaises(KeyError):
+                self.bundle.index_of(system_id)
+
+    def test_rejects_other_files(self):
+        other = os.path.join(self.tmp.name, 'other.bin')
+        with open(self.bundle_file, 'rb') as f:
+            data = bytearray(f.read())
+        struct.pack_into("<I", data, 4, map_bundle.BUNDLE_VERSION + 1)
+        with open(other, 'wb') as f:
+            f.write(data)
+        with self.assertRaises(ValueError):
+            map_bundle.MapBundle(other)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import itertools
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "eve-frontier-map", "public"))
+import optimizer_core  # noqa: E402
+
+
+def random_store(rng, size):
+    names = [f"S{i}" for i in range(size)]
+    systems = {name: {'x': rng.uniform(0, 100), 'y': rng.uniform(0, 100), 'z': rng.uniform(0, 100)}
+               for name in names}
+    return optimizer_core.build_coord_store(names, systems)
+
+
+class AnnealPathTest(unittest.TestCase):
+
+    def anneal(self, store, seed, batches, telemetry=None):
+        """anneal_path over exactly `batches` proposal batches, on a clock that ticks once per check."""
+        ticks = itertools.count()
+        with mock.patch.object(optimizer_core.time, 'time', lambda: next(ticks)):
+            return optimizer_core.anneal_path(store, list(range(len(store.names))), batches + 1,
+                                              random.Random(seed), telemetry)
+
+    def test_instrumented_loop_matches_plain_loop(self):
+        for size in (5, 60, 300):
+            store = random_store(random.Random(size), size)
+            for seed in (1, 2):
+                telemetry = optimizer_core.AnnealTelemetry()
+                plain = self.anneal(store, seed, 8)
+                instrumented = self.anneal(store, seed, 8, telemetry)
+                self.assertEqual(plain, instrumented, (size, seed))
+                self.assertEqual(telemetry.total_proposals, 8 * optimizer_core.ANNEAL_BATCH_SIZE)
+
+    def test_result_is_a_permutation_no_longer_than_reported(self):
+        store = random_store(random.Random(4), 80)
+        path, distance = self.anneal(store, 3, 20)
+        self.assertEqual(path[0], 0)
+        self.assertEqual(sorted(path), list(range(80)))
+        self.assertAlmostEqual(distance, store.path_length(path))
+
+    def test_tiny_paths_are_left_alone(self):
+        store = random_store(random.Random(5), 3)
+        self.assertEqual(self.anneal(store, 1, 2)[0], [0, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
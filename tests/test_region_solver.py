@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import region_solver  # noqa: E402
+from synthetic_map import build_map, write_map_db  # noqa: E402
+
+
+class SolveRegionTest(unittest.TestCase):
+    """solve_region over two synthetic regions, with constellations of 20 systems down to a single one."""
+
+    @classmethod
+    def setUpClass(cls):
+        rows, gates = build_map(random.Random(21), (65, 23, 1, 40), spread=60.0, hidden={7})
+        cls.rows = rows
+        cls.tmp = tempfile.TemporaryDirectory()
+        db_file = os.path.join(cls.tmp.name, 'map_data.db')
+        write_map_db(db_file, rows, gates)
+        cls.regions = (rows[0][3], rows[65][3], rows[88][3])
+        cls.systems, cls.constellation_of = region_solver.load_regions(db_file, cls.regions)
+        cls.start = rows[30][1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def check_route(self, result):
+        path = result['path']
+        self.assertEqual(path[0], self.start)
+        self.assertEqual(sorted(path), sorted(self.systems))
+        self.assertLessEqual(result['distance'], result['stitched_distance'] + 1e-9)
+        self.assertEqual(result['constellations'], len(set(self.constellation_of.values())))
+
+    def test_loads_visible_systems_of_the_regions(self):
+        expected = {row[1] for row in self.rows if row[3] in self.regions and not row[7]}
+        self.assertEqual(set(self.systems), expected)
+        self.assertNotIn(self.rows[7][1], self.systems)
+        self.assertEqual(self.constellation_of[self.start], str(self.rows[30][2]))
+
+    def test_polished_route_is_a_permutation_no_longer_than_stitched(self):
+        self.check_route(region_solver.solve_region(self.systems, self.constellation_of, self.start))
+
+    def test_annealing_polish(self):
+        result = region_solver.solve_region(self.systems, self.constellation_of, self.start, polish_time=0.05)
+        self.check_route(result)
+        self.assertIn('polish', result['timings'])
+
+    def test_unpolished_route_is_the_stitched_route(self):
+        result = region_solver.solve_region(self.systems, self.constellation_of, self.start, polish=False)
+        self.check_route(result)
+        self.assertEqual(result['distance'], result['stitched_distance'])
+        # Each constellation is toured in one run
+        runs = [self.constellation_of[name] for k, name in enumerate(result['path'])
+                if k == 0 or self.constellation_of[name] != self.constellation_of[result['path'][k - 1]]]
+        self.assertEqual(len(runs), len(set(runs)))
+
+    def test_worker_processes_match_in_process(self):
+        in_process = region_solver.solve_region(self.systems, self.constellation_of, self.start, workers=1)
+        with mock.patch.object(region_solver, 'PARALLEL_MIN_SYSTEMS', 0):
+            pooled = region_solver.solve_region(self.systems, self.constellation_of, self.start, workers=2)
+        self.assertEqual(pooled['path'], in_process['path'])
+
+
+if __name__ == '__main__':
+    unittest.main()
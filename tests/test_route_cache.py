@@ -0,0 +1,179 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+from itertools import count
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import route_cache  # noqa: E402
+from synthetic_map import build_map, write_map_db  # noqa: E402
+
+FAST_ANNEAL = {'passes': 1, 'time_per_pass': 0.01, 'seed': 1}
+
+
+def bubble(systems_rows):
+    """({name: {'x', 'y', 'z'}}, {name: constellation id}) for synthetic system rows."""
+    systems = {row[1]: {'x': row[4], 'y': row[5], 'z': row[6]} for row in systems_rows}
+    return systems, {row[1]: str(row[2]) for row in systems_rows}
+
+
+class RouteCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp.name, 'map_data.db')
+        self.cache_file = os.path.join(self.tmp.name, 'route_cache.db')
+        rows, gates = build_map(random.Random(2), (40, 25), spread=30.0)
+        write_map_db(self.db_file, rows, gates)
+        self.systems, self.constellation_of = bubble(rows)
+        self.start = rows[0][1]
+        # Strictly increasing clock, so last-use order never ties
+        clock = count(1000.0)
+        patcher = mock.patch.object(route_cache.time, 'time', lambda: next(clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open_cache(self, **kwargs):
+        return route_cache.RouteCache(self.cache_file, self.db_file, **kwargs)
+
+    def without(self, *names):
+        return {name: point for name, point in self.systems.items() if name not in names}
+
+
+class RouteKeyTest(unittest.TestCase):
+
+    def test_key_ignores_system_order(self):
+        params = route_cache.query_params('anneal')
+        self.assertEqual(route_cache.route_key(['b', 'a', 'c'], 'a', 'anneal', params),
+                         route_cache.route_key(['c', 'a', 'b'], 'a', 'anneal', params))
+
+    def test_defaulted_and_explicit_params_share_a_key(self):
+        explicit = dict(route_cache.DEFAULT_PARAMS['anneal'])
+        self.assertEqual(route_cache.route_key(['a', 'b'], 'a', 'anneal', route_cache.query_params('anneal')),
+                         route_cache.route_key(['a', 'b'], 'a', 'anneal',
+                                               route_cache.query_params('anneal', explicit)))
+
+    def test_key_depends_on_start_algorithm_and_params(self):
+        params = route_cache.query_params('anneal')
+        key = route_cache.route_key(['a', 'b'], 'a', 'anneal', params)
+        self.assertNotEqual(key, route_cache.route_key(['a', 'b'], 'b', 'anneal', params))
+        self.assertNotEqual(key, route_cache.route_key(['a', 'b'], 'a', 'local_search', params))
+        self.assertNotEqual(key, route_cache.route_key(['a', 'b'], 'a', 'anneal',
+                                                       route_cache.query_params('anneal', {'passes': 9})))
+
+    def test_unknown_algorithm_or_param(self):
+        with self.assertRaises(ValueError):
+            route_cache.query_params('dijkstra')
+        with self.assertRaises(ValueError):
+            route_cache.query_params('anneal', {'depth': 3})
+
+
+class EvictionTest(RouteCacheTestCase):
+
+    def store(self, cache, name, path):
+        cache.store(name, 'a', 'baseline', {}, path, 1.0)
+
+    def keys(self, cache):
+        return sorted(row[0] for row in cache.conn.execute("SELECT key FROM routes"))
+
+    def test_max_entries_evicts_least_recently_used(self):
+        with self.open_cache(max_entries=2) as cache:
+            self.store(cache, 'k1', ['a', 'b'])
+            self.store(cache, 'k2', ['a', 'c'])
+            self.assertIsNotNone(cache.lookup('k1'))
+            self.store(cache, 'k3', ['a', 'd'])
+            self.assertEqual(self.keys(cache), ['k1', 'k3'])
+            self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_max_bytes_evicts_least_recently_used(self):
+        path = ['system'] * 10  # 91 bytes of JSON
+        with self.open_cache(max_bytes=200) as cache:
+            for key in ('k1', 'k2', 'k3'):
+                self.store(cache, key, path)
+            self.assertEqual(self.keys(cache), ['k2', 'k3'])
+            self.assertLessEqual(cache.stats()['bytes'], 200)
+
+
+class InvalidationTest(RouteCacheTestCase):
+
+    def test_entries_survive_reopening_on_the_same_map(self):
+        with self.open_cache() as cache:
+            cache.store('k1', 'a', 'baseline', {}, ['a', 'b'], 1.0)
+        with self.open_cache() as cache:
+            self.assertEqual(cache.lookup('k1')['path'], ['a', 'b'])
+
+    def test_changed_map_clears_the_cache(self):
+        with self.open_cache() as cache:
+            cache.store('k1', 'a', 'baseline', {}, ['a', 'b'], 1.0)
+        with open(self.db_file, 'ab') as f:
+            f.write(b'\0')
+        with self.open_cache() as cache:
+            self.assertIsNone(cache.lookup('k1'))
+            self.assertEqual(cache.stats()['entries'], 0)
+
+
+class CachedRouteTest(RouteCacheTestCase):
+
+    def route(self, cache, systems, algorithm='anneal', params=FAST_ANNEAL, **kwargs):
+        return route_cache.cached_route(cache, systems, self.start, algorithm, params, **kwargs)
+
+    def test_hit_returns_the_stored_route(self):
+        with self.open_cache() as cache:
+            first = self.route(cache, self.systems)
+            self.assertEqual((first['source'], first['computed']), ('cold', 'cold'))
+            self.assertEqual(sorted(first['path']), sorted(self.systems))
+            self.assertEqual(first['path'][0], self.start)
+            again = self.route(cache, dict(reversed(list(self.systems.items()))))
+            self.assertEqual(again['source'], 'hit')
+            self.assertEqual(again['path'], first['path'])
+
+    def test_overlapping_set_is_warm_started(self):
+        with self.open_cache() as cache:
+            self.route(cache, self.systems)
+            near = self.without(next(name for name in self.systems if name != self.start))
+            result = self.route(cache, near)
+            self.assertEqual((result['source'], result['computed']), ('warm', 'warm'))
+            self.assertEqual(sorted(result['path']), sorted(near))
+            self.assertEqual(self.route(cache, near)['computed'], 'warm')
+            self.assertEqual(cache.stats()['by_source'], {'cold': 1, 'warm': 1})
+
+    def test_exact_set_under_other_params_is_not_a_seed(self):
+        with self.open_cache() as cache:
+            self.route(cache, self.systems)
+            self.assertIsNone(cache.closest(self.systems, self.start))
+            result = self.route(cache, self.systems, 'local_search', {'passes': 1, 'time_per_pass': 0.01})
+            self.assertEqual(result['source'], 'cold')
+
+    def test_non_search_algorithms_are_never_seeded(self):
+        near = self.without(next(name for name in self.systems if name != self.start))
+        with self.open_cache() as cache:
+            self.route(cache, self.systems)
+            self.assertIsNotNone(cache.closest(near, self.start))
+            self.assertEqual(self.route(cache, near, 'baseline', None)['source'], 'cold')
+            result = self.route(cache, near, 'region', None, constellation_of=self.constellation_of)
+            self.assertEqual(result['source'], 'cold')
+            self.assertEqual(sorted(result['path']), sorted(near))
+
+    def test_warm_start_can_be_turned_off(self):
+        with self.open_cache() as cache:
+            self.route(cache, self.systems)
+            near = self.without(next(name for name in self.systems if name != self.start))
+            self.assertEqual(self.route(cache, near, warm_start=False)['source'], 'cold')
+
+    def test_invalid_queries(self):
+        with self.open_cache() as cache:
+            with self.assertRaises(ValueError):
+                self.route(cache, self.systems, 'region', None)
+            with self.assertRaises(ValueError):
+                self.route(cache, self.without(self.start))
+        with self.assertRaises(ValueError):
+            route_cache.compute_route(self.systems, self.start, 'baseline', {}, seed=list(self.systems))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import heapq
+import math
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import route_planner  # noqa: E402
+from synthetic_map import build_map, write_map_db  # noqa: E402
+
+JUMP_RANGES = (0.0, 3.0, 12.0, 40.0)
+
+
+def dijkstra(graph, start, goal, jump_range):
+    """Plain Dijkstra cost between two nodes over gate_neighbours and jump_neighbours, or None."""
+    best = {start: 0.0}
+    heap = [(0.0, start)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if node == goal:
+            return cost
+        if cost > best[node]:
+            continue
+        legs = [(route_planner.GATE_HOP_COST + route_planner.GATE_DISTANCE_COST * graph.distance(node, target),
+                 target) for target in graph.gate_neighbours(node)]
+        if jump_range > 0:
+            legs += [(route_planner.JUMP_HOP_COST + route_planner.JUMP_DISTANCE_COST * length, target)
+                     for length, target in graph.jump_neighbours(node, jump_range)]
+        for leg, target in legs:
+            if cost + leg < best.get(target, math.inf):
+                best[target] = cost + leg
+                heapq.heappush(heap, (cost + leg, target))
+    return None
+
+
+class FindRouteTest(unittest.TestCase):
+    """find_route against plain Dijkstra on a synthetic map of several gate components a few jumps apart."""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(3)
+        cls.systems, gates = build_map(rng, (300, 150, 80, 40, 3, 1), spread=40.0, hidden={10, 200})
+        cls.tmp = tempfile.TemporaryDirectory()
+        db_file = os.path.join(cls.tmp.name, 'map_data.db')
+        write_map_db(db_file, cls.systems, gates)
+        cls.graph = route_planner.RouteGraph(db_file, jump_ranges=JUMP_RANGES[1:2])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def check_route(self, route, jump_range):
+        """The legs are real gates or jumps in range, and add up to the reported cost."""
+        graph = self.graph
+        nodes = [graph.node_of[system_id] for system_id in route['path']]
+        cost = 0.0
+        for a, b, leg in zip(nodes, nodes[1:], route['legs']):
+            length = graph.distance(a, b)
+            if leg == 'gate':
+                self.assertIn(b, graph.gate_neighbours(a))
+                cost += route_planner.GATE_HOP_COST + route_planner.GATE_DISTANCE_COST * length
+            else:
+                self.assertLessEqual(length, jump_range)
+                cost += route_planner.JUMP_HOP_COST + route_planner.JUMP_DISTANCE_COST * length
+        self.assertAlmostEqual(cost, route['cost'], places=6)
+
+    def test_costs_match_dijkstra(self):
+        rng = random.Random(5)
+        ids = list(self.graph.system_ids)
+        found = unreachable = 0
+        for jump_range in JUMP_RANGES:
+            for _ in range(25):
+                a, b = rng.choice(ids), rng.choice(ids)
+                route = route_planner.find_route(self.graph, a, b, jump_range)
+                expected = dijkstra(self.graph, self.graph.node_of[a], self.graph.node_of[b], jump_range)
+                if expected is None:
+                    self.assertIsNone(route['path'], (a, b, jump_range))
+                    unreachable += 1
+                    continue
+                self.assertAlmostEqual(route['cost'], expected, places=6, msg=(a, b, jump_range))
+                self.assertEqual((route['path'][0], route['path'][-1]), (a, b))
+                self.check_route(route, jump_range)
+                found += 1
+        self.assertGreater(found, 0)
+        self.assertGreater(unreachable, 0)
+
+    def test_gates_only_between_components_is_unreachable(self):
+        lone = self.systems[-1][0]
+        route = route_planner.find_route(self.graph, self.systems[0][0], lone)
+        self.assertIsNone(route['path'])
+        self.assertEqual(route['expanded'], 0)
+
+    def test_same_system(self):
+        system_id = self.systems[0][0]
+        route = route_planner.find_route(self.graph, system_id, system_id, 12.0)
+        self.assertEqual(route['path'], [system_id])
+        self.assertEqual(route['cost'], 0.0)
+
+    def test_jump_neighbours_match_brute_force(self):
+        graph = self.graph
+        rng = random.Random(9)
+        for jump_range in JUMP_RANGES[1:]:
+            for node in rng.sample(range(len(graph)), 20):
+                expected = sorted(other for other in range(len(graph))
+                                  if other != node and graph.distance(node, other) <= jump_range)
+                found = graph.jump_neighbours(node, jump_range)
+                self.assertEqual(sorted(other for _, other in found), expected)
+                for length, other in found:
+                    self.assertAlmostEqual(length, graph.distance(node, other))
+
+
+if __name__ == '__main__':
+    unittest.main()
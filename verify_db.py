@@ -8,7 +8,7 @@ def verify_database():
         cursor = conn.cursor()
 
         # Verify tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
         tables = [row[0] for row in cursor.fetchall()]
         expected_tables = ['regions', 'constellations', 'systems', 'stargates', 'labels', 'region_labels']
         print(f"Tables found: {tables}")